@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# co-purchase pairs expanded per block of accounts, bounds the working memory
+# whatever the number of accounts and products per account
+CHUNK_PAIRS = 1 << 22
+
+# suggestions kept per account
+TOP_SUGGESTIONS = 3
+
+# strongest rules per product used to score suggestions; keeps the sparse
+# product near-linear in the purchases for large catalogs
+RULES_PER_PRODUCT = 50
+
+
+# ----------------------------
+# SPARSE INCIDENCE
+# ----------------------------
+class Incidence:
+    """
+    Account x product incidence in compressed sparse row form: the products
+    of account i are indices[indptr[i]:indptr[i + 1]], sorted and distinct.
+    """
+
+    def __init__(self, accounts, products):
+        a_codes, self.accounts = pd.factorize(pd.Series(accounts), sort=True)
+        p_codes, self.products = pd.factorize(pd.Series(products), sort=True)
+        keep = (a_codes >= 0) & (p_codes >= 0)
+        pairs = np.unique(a_codes[keep].astype(np.int64) * len(self.products) + p_codes[keep])
+        rows, self.indices = np.divmod(pairs, len(self.products))
+        self.indptr = np.r_[0, np.cumsum(np.bincount(rows, minlength=len(self.accounts)))]
+
+    @property
+    def shape(self):
+        return len(self.accounts), len(self.products)
+
+    def blocks(self, cost):
+        # (first account, end account) runs whose summed `cost` fits CHUNK_PAIRS
+        total = np.cumsum(np.asarray(cost, dtype=np.int64))
+        start = 0
+        while start < len(total):
+            base = total[start - 1] if start else 0
+            end = max(int(np.searchsorted(total, base + CHUNK_PAIRS, side="right")), start + 1)
+            yield start, end
+            start = end
+
+    def gram(self):
+        """Aᵀ A as COO (row product, column product, accounts with both); the diagonal counts buyers."""
+        n = len(self.products)
+        degree = np.diff(self.indptr)
+        keys, counts = [], []
+        for start, end in self.blocks(degree ** 2):
+            # entry j of an account pairs with every entry of the same account
+            d = degree[start:end]
+            left = np.repeat(np.arange(self.indptr[start], self.indptr[end]), np.repeat(d, d))
+            pair = np.arange(len(left)) - np.repeat(np.cumsum(d * d) - d * d, d * d)
+            right = np.repeat(self.indptr[start:end], d * d) + pair % np.repeat(d, d * d)
+            block_keys, block_counts = np.unique(self.indices[left] * n + self.indices[right], return_counts=True)
+            keys.append(block_keys)
+            counts.append(block_counts)
+        keys, inverse = np.unique(np.concatenate(keys or [np.zeros(0, np.int64)]), return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate(counts or [np.zeros(0)])).astype(np.int64)
+        rows, cols = np.divmod(keys, n)
+        return rows, cols, counts
+
+
+# ----------------------------
+# CROSS-SELL
+# ----------------------------
+class ProductAffinity:
+    """
+    Co-purchase counts, confidence and lift between products bought by the
+    same accounts, and next-product suggestions per account.
+
+    confidence(A → B) = accounts with A and B / accounts with A
+    lift(A → B)       = confidence(A → B) / share of accounts with B
+    """
+
+    def __init__(self, accounts, products):
+        self.incidence = Incidence(accounts, products)
+        rows, cols, counts = self.incidence.gram()
+        n_accounts, _ = self.incidence.shape
+        buyers = np.zeros(len(self.incidence.products), dtype=np.int64)
+        buyers[rows[rows == cols]] = counts[rows == cols]
+        self.buyers = buyers
+
+        off = rows != cols
+        self.rules = pd.DataFrame({
+            "antecedent": np.asarray(self.incidence.products)[rows[off]],
+            "consequent": np.asarray(self.incidence.products)[cols[off]],
+            "accounts": counts[off],
+            "support": counts[off] / max(n_accounts, 1),
+            "confidence": counts[off] / buyers[rows[off]],
+            "lift": counts[off] / buyers[rows[off]] / (buyers[cols[off]] / max(n_accounts, 1)),
+        }).sort_values(["lift", "accounts"], ascending=False).reset_index(drop=True)
+        self._confidence = (rows[off], cols[off], counts[off] / buyers[rows[off]])
+        self.next_products = self.suggestions()
+
+    def matrix(self, measure="accounts"):
+        """Product x product frame of a rule measure; the diagonal holds buyer counts for "accounts"."""
+        products = list(self.incidence.products)
+        out = self.rules.pivot(index="antecedent", columns="consequent", values=measure)
+        out = out.reindex(index=products, columns=products)
+        if measure == "accounts":
+            out = out.fillna(0)
+            out.values[np.diag_indices(len(products))] = self.buyers
+        return out
+
+    def suggestions(self, k=TOP_SUGGESTIONS):
+        """
+        Top `k` products each account has not bought, scored by the summed
+        confidence of the (RULES_PER_PRODUCT strongest) rules from the
+        products it has. This is the sparse
+        product A · confidence: every (account, product) entry is expanded
+        into that product's rules and the results are summed per (account,
+        product), one block of accounts at a time.
+        """
+        inc = self.incidence
+        n = len(inc.products)
+        antecedent, consequent, confidence = self._confidence
+        order = np.lexsort((-confidence, antecedent))
+        antecedent, consequent, confidence = antecedent[order], consequent[order], confidence[order]
+        strongest = np.arange(len(antecedent)) - np.searchsorted(antecedent, antecedent) < RULES_PER_PRODUCT
+        antecedent, consequent, confidence = antecedent[strongest], consequent[strongest], confidence[strongest]
+        rule_ptr = np.r_[0, np.cumsum(np.bincount(antecedent, minlength=n))]
+        rule_count = np.diff(rule_ptr)
+
+        entry_cost = rule_count[inc.indices]
+        account_cost = np.add.reduceat(entry_cost, inc.indptr[:-1]) if len(entry_cost) else np.zeros(0, np.int64)
+        account_cost[np.diff(inc.indptr) == 0] = 0
+
+        frames = []
+        for start, end in inc.blocks(account_cost):
+            lo, hi = inc.indptr[start], inc.indptr[end]
+            account = np.repeat(np.arange(start, end), np.diff(inc.indptr[start:end + 1]))
+            product = inc.indices[lo:hi]
+            counts = rule_count[product]
+            rule = np.repeat(rule_ptr[product], counts) + (
+                np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+            keys = np.repeat(account, counts) * n + consequent[rule]
+            keys, inverse = np.unique(keys, return_inverse=True)
+            scores = np.bincount(inverse, weights=confidence[rule])
+
+            # drop products already bought, then keep the best k per account
+            fresh = ~np.isin(keys, account * n + product)
+            keys, scores = keys[fresh], scores[fresh]
+            owner, target = np.divmod(keys, n)
+            order = np.lexsort((-scores, owner))
+            owner, target, scores = owner[order], target[order], scores[order]
+            rank = np.arange(len(owner)) - np.searchsorted(owner, owner, side="left")
+            top = rank < k
+            frames.append(pd.DataFrame({
+                "account": np.asarray(inc.accounts)[owner[top]],
+                "rank": rank[top] + 1,
+                "product": np.asarray(inc.products)[target[top]],
+                "score": scores[top],
+            }))
+        if not frames:
+            return pd.DataFrame(columns=["account", "rank", "product", "score"])
+        return pd.concat(frames, ignore_index=True)
+
+
+def build_affinity(pipeline):
+    # co-purchases are counted over won deals only
+    won = pipeline[pipeline["deal_stage"] == "Won"]
+    return ProductAffinity(won["account"].to_numpy(), won["product"].to_numpy())
@@ -0,0 +1,430 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Process
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+import pandas as pd
+
+import data_model
+import date_index
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# directory of worker-*.sock files; when set, pages aggregate through the
+# local scatter-gather service instead of in process
+SOCKET_DIR = os.environ.get("CRM_AGG_SOCKETS", "")
+AUTHKEY = os.environ.get("CRM_AGG_AUTHKEY", "crm-dashboard").encode()
+
+# seconds between two data version checks in a worker
+RELOAD_INTERVAL = float(os.environ.get("CRM_RELOAD_INTERVAL", "5"))
+
+OPS = ("sum", "count", "min", "max", "mean", "nunique")
+
+
+# ----------------------------
+# QUERIES
+# ----------------------------
+# a query is a plain dict so it pickles cheaply over a socket:
+#   table     "enriched" (inner join on accounts) or "pipeline" (every deal)
+#   filters   column -> allowed values, None means all, or a
+#             date_index.date_range value for date columns
+#   by        group-by columns, [] for a single total row
+#   measures  name -> (column, op, where); `where` is an optional filter
+#             dict restricting the rows the measure looks at
+def make_query(table, by=(), measures=None, filters=None):
+    measures = {name: tuple(m) + (None,) * (3 - len(m)) for name, m in (measures or {}).items()}
+    for name, (_, op, _) in measures.items():
+        if op not in OPS:
+            raise ValueError(f"unknown aggregate '{op}' for measure '{name}'")
+    return {"table": table, "by": list(by), "measures": measures, "filters": dict(filters or {})}
+
+
+def _mask(df, filters, index=None):
+    filters = filters or {}
+    rows = date_index.range_rows(filters, index) if index is not None else None
+    if rows is not None:
+        # candidate rows of the date ranges; the other filters only look at those
+        for col, vals in filters.items():
+            if vals is not None and not date_index.is_range(vals):
+                rows = rows[df[col].take(rows).isin(vals).to_numpy()]
+        mask = np.zeros(len(df), dtype=bool)
+        mask[rows] = True
+        return mask
+    mask = np.ones(len(df), dtype=bool)
+    for col, vals in filters.items():
+        if date_index.is_range(vals):
+            mask &= date_index.range_mask(df, col, vals)
+        elif vals is not None:
+            mask &= df[col].isin(vals).to_numpy()
+    return mask
+
+
+# ----------------------------
+# MERGEABLE PARTIALS
+# ----------------------------
+def partial(df, query, index=None):
+    """
+    Partial aggregate of one partition: sums, counts, minima and maxima per
+    group, plus the distinct (group, value) pairs of nunique measures.
+    Partials of disjoint partitions merge into the exact result. `index` is
+    the partition's date_index.TableIndex for range filters.
+    """
+    by = query["by"]
+    rows = df[_mask(df, query["filters"], index)]
+    keys = [rows[c] for c in by] if by else [pd.Series(0, index=rows.index)]
+    groups = {}
+    distinct = {}
+
+    for name, (col, op, where) in query["measures"].items():
+        keep = _mask(rows, where) & rows[col].notna().to_numpy()
+        values = rows[col].where(keep)
+        if op == "nunique":
+            pairs = rows.loc[keep, by + [col]].drop_duplicates()
+            distinct[name] = pairs.rename(columns={col: "__value"})
+            continue
+        if op in ("sum", "mean"):
+            groups[f"{name}__sum"] = values.astype("float64").groupby(keys).sum()
+        if op in ("count", "mean"):
+            groups[f"{name}__count"] = pd.Series(keep, index=rows.index).groupby(keys).sum()
+        if op in ("min", "max"):
+            groups[f"{name}__{op}"] = getattr(values.groupby(keys), op)()
+
+    frame = pd.DataFrame(groups)
+    if by:
+        frame = frame.reset_index()
+        frame.columns = by + list(groups)
+    else:
+        frame = frame.reset_index(drop=True)
+    return {"groups": frame, "distinct": distinct}
+
+
+def merge(partials, query):
+    """Combine partition partials into the final grouped result."""
+    by = query["by"]
+    frames = [p["groups"] for p in partials if len(p["groups"])]
+    how = {}
+    for name, (_, op, _) in query["measures"].items():
+        if op in ("sum", "mean"):
+            how[f"{name}__sum"] = "sum"
+        if op in ("count", "mean"):
+            how[f"{name}__count"] = "sum"
+        if op in ("min", "max"):
+            how[f"{name}__{op}"] = op
+
+    if by and not frames and not any(len(d) for p in partials for d in p["distinct"].values()):
+        # the filters matched no rows: no groups, but the columns pages expect
+        return pd.DataFrame({
+            **{col: pd.Series(dtype=object) for col in by},
+            **{name: pd.Series(dtype="int64" if op in ("count", "nunique") else "float64")
+               for name, (_, op, _) in query["measures"].items()},
+        })
+
+    if frames and how:
+        stacked = pd.concat(frames, ignore_index=True)
+        merged = stacked.groupby(by).agg(how) if by else stacked.agg(how).to_frame().T.infer_objects()
+    else:
+        merged = pd.DataFrame(columns=list(how))
+
+    out = pd.DataFrame(index=merged.index)
+    for name, (_, op, _) in query["measures"].items():
+        if op in ("sum", "count"):
+            out[name] = merged[f"{name}__{op}"]
+        elif op in ("min", "max"):
+            out[name] = merged[f"{name}__{op}"]
+        elif op == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out[name] = merged[f"{name}__sum"] / merged[f"{name}__count"].replace(0, np.nan)
+        else:
+            pairs = pd.concat([p["distinct"][name] for p in partials], ignore_index=True).drop_duplicates()
+            counts = pairs.groupby(by).size() if by else pd.Series([len(pairs)])
+            out = out.join(counts.rename(name), how="outer") if by else out.assign(**{name: counts.iloc[0]})
+
+    if by:
+        out = out.reset_index()
+        out = out.sort_values(by).reset_index(drop=True)
+    elif out.empty:
+        out = pd.DataFrame({name: [0 if op in ("sum", "count", "nunique") else np.nan]
+                            for name, (_, op, _) in query["measures"].items()})
+    for name, (_, op, _) in query["measures"].items():
+        if op in ("count", "nunique"):
+            out[name] = out[name].fillna(0).astype("int64")
+    return out
+
+
+# ----------------------------
+# PARTITIONS
+# ----------------------------
+def engine_tables(tables):
+    # fact tables an engine aggregates over
+    pipeline = data_model.add_calendar_columns(tables["sales_pipeline"].copy())
+    return {"enriched": tables["enriched"], "pipeline": pipeline}
+
+
+def partition(tables, n, by="account"):
+    """
+    Split every fact table into `n` disjoint parts by account hash or by
+    engage month. Returns a list of n table dicts.
+    """
+    parts = [{} for _ in range(n)]
+    for name, df in tables.items():
+        if by == "account":
+            bucket = pd.util.hash_array(df["account"].to_numpy(dtype=object)) % n
+        elif by == "month":
+            bucket = df["engage_date"].dt.month.fillna(0).to_numpy().astype(np.int64) % n
+        else:
+            raise ValueError(f"unknown partition key '{by}'")
+        for i in range(n):
+            parts[i][name] = df[bucket == i].reset_index(drop=True)
+    return parts
+
+
+# ----------------------------
+# ENGINES
+# ----------------------------
+class LocalEngine:
+    """In-process engine: the same partial / merge path over local partitions."""
+
+    local = True
+
+    def __init__(self, partitions, version=None):
+        self.partitions = partitions
+        self.version = version
+        self.indexes = [{name: date_index.TableIndex(df) for name, df in p.items()} for p in partitions]
+
+    def query(self, query):
+        table = query["table"]
+        return merge([partial(p[table], query, i[table]) for p, i in zip(self.partitions, self.indexes)], query)
+
+
+class ScatterGatherEngine:
+    """
+    Coordinator of the local aggregation service. Each query is sent to
+    every worker socket in parallel and the partials are merged here, so
+    pages get exactly what LocalEngine.query would return.
+    """
+
+    local = False
+
+    def __init__(self, addresses, authkey=AUTHKEY, timeout=30.0):
+        self.addresses = list(addresses)
+        self.authkey = authkey
+        self.timeout = timeout
+        self.version = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.addresses)), thread_name_prefix="scatter")
+        self._tables = {}
+
+    def _ask(self, address, request):
+        with Client(address, family="AF_UNIX", authkey=self.authkey) as conn:
+            conn.send(request)
+            if not conn.poll(self.timeout):
+                raise TimeoutError(f"aggregation worker {address} did not answer")
+            status, payload = conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"aggregation worker {address}: {payload}")
+        return payload
+
+    def query(self, query):
+        answers = list(self._pool.map(lambda a: self._ask(a, query), self.addresses))
+        versions = {version for version, _ in answers}
+        if len(versions) > 1:
+            # a reload is rolling through the workers, ask again once
+            time.sleep(0.5)
+            answers = list(self._pool.map(lambda a: self._ask(a, query), self.addresses))
+            versions = {version for version, _ in answers}
+            if len(versions) > 1:
+                raise RuntimeError(f"aggregation workers disagree on the data version: {sorted(versions)}")
+        self.version = versions.pop()
+        return merge([p for _, p in answers], query)
+
+    def cached(self, name, build):
+        # per data version results that are expensive to rebuild, e.g. 360 tables
+        key = (self.version, name)
+        if key not in self._tables:
+            value = build()
+            self._tables = {(self.version, name): value, **{k: v for k, v in self._tables.items()
+                                                            if k[0] == self.version}}
+        return self._tables[(self.version, name)]
+
+
+def socket_addresses(socket_dir=SOCKET_DIR):
+    return sorted(
+        os.path.join(socket_dir, name) for name in os.listdir(socket_dir)
+        if name.startswith("worker-") and name.endswith(".sock")
+    )
+
+
+_remote = None
+_remote_lock = threading.Lock()
+
+
+def get_engine(snapshot):
+    """The scatter-gather engine when CRM_AGG_SOCKETS is set, else the in-process one."""
+    global _remote
+    if not SOCKET_DIR:
+        return snapshot.get("local_engine")
+    with _remote_lock:
+        if _remote is None:
+            _remote = ScatterGatherEngine(socket_addresses(SOCKET_DIR))
+    return _remote
+
+
+# ----------------------------
+# 360 TABLES FROM THE PIPELINE
+# ----------------------------
+ENTITY_MEASURES = {
+    "total_opportunities": ("opportunity_id", "count"),
+    "won_opportunities": ("opportunity_id", "count", {"deal_stage": ["Won"]}),
+    "lost_opportunities": ("opportunity_id", "count", {"deal_stage": ["Lost"]}),
+    "open_opportunities": ("opportunity_id", "count", {"deal_stage": data_model.OPEN_STAGES}),
+    "revenue_won": ("close_value", "sum", {"deal_stage": ["Won"]}),
+    "avg_win_deal_value": ("close_value", "mean", {"deal_stage": ["Won"]}),
+    "first_engage_date": ("engage_date", "min"),
+    "last_close_date": ("close_date", "max"),
+    "avg_sales_cycle_days": ("sales_cycle_days", "mean", {"deal_stage": ["Won"]}),
+}
+
+# table -> (key, dimension table, dimension columns, renames, extra measures)
+ENTITY_TABLES = {
+    "account_360": ("account", "accounts", data_model.ACCOUNT_COLUMNS, {"revenue": "account_annual_revenue"},
+                    {"distinct_products_sold": ("product", "count", {"deal_stage": ["Won"]})}),
+    "product_360": ("product", "products", data_model.PRODUCT_COLUMNS, {},
+                    {"distinct_accounts": ("account", "nunique")}),
+    "sales_agent_360": ("sales_agent", "sales_agent", data_model.AGENT_COLUMNS, {},
+                        {"distinct_accounts": ("account", "nunique"), "distinct_products": ("product", "nunique")}),
+}
+
+# column order of the shipped 360 csv files
+ENTITY_COLUMNS = [
+    "total_opportunities", "won_opportunities", "lost_opportunities", "open_opportunities",
+    "revenue_won", "avg_win_deal_value", "win_rate",
+]
+
+
+def entity_table(engine, name, tables):
+    """account_360 / product_360 / sales_agent_360 aggregated from the pipeline."""
+    key, dim_name, dim_columns, renames, extra = ENTITY_TABLES[name]
+    stats = engine.query(make_query("pipeline", [key], {**ENTITY_MEASURES, **extra}))
+
+    dims = tables[dim_name][[key] + dim_columns].rename(columns=renames)
+    df = dims.merge(stats, on=key, how="left")
+    for col in ENTITY_COLUMNS[:5] + list(extra):
+        df[col] = df[col].fillna(0).astype("int64")
+    df["avg_win_deal_value"] = np.floor(df["avg_win_deal_value"])
+    df["avg_sales_cycle_days"] = np.floor(df["avg_sales_cycle_days"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df["win_rate"] = df["won_opportunities"] / (df["won_opportunities"] + df["lost_opportunities"])
+    for col in ["avg_win_deal_value", "avg_sales_cycle_days"]:
+        if df[col].notna().all():
+            df[col] = df[col].astype("int64")
+
+    columns = list(dims.columns) + ENTITY_COLUMNS + list(extra) + [
+        "first_engage_date", "last_close_date", "avg_sales_cycle_days"]
+    # rows follow the dimension table, entities without deals keep zero counts
+    return data_model.add_360_columns(df[columns].reset_index(drop=True))
+
+
+# ----------------------------
+# WORKER PROCESSES
+# ----------------------------
+class PartitionWorker:
+    """Owns partition `index` of `count`; reloads it when Resources/ changes."""
+
+    def __init__(self, index, count, by="account", resource_dir=data_model.RESOURCE_DIR):
+        self.index = index
+        self.count = count
+        self.by = by
+        self.resource_dir = resource_dir
+        self.version = None
+        self.tables = None
+        self.indexes = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        version = data_model.data_version(self.resource_dir)
+        if version == self.version:
+            return
+        tables = data_model.load_all_tables(self.resource_dir)
+        part = partition(engine_tables(tables), self.count, self.by)[self.index]
+        indexes = {name: date_index.TableIndex(df) for name, df in part.items()}
+        with self._lock:
+            self.version, self.tables, self.indexes = version, part, indexes
+
+    def answer(self, query):
+        with self._lock:
+            version, tables, indexes = self.version, self.tables, self.indexes
+        table = query["table"]
+        return version, partial(tables[table], query, indexes[table])
+
+
+def serve(address, index, count, by="account", resource_dir=data_model.RESOURCE_DIR, authkey=AUTHKEY):
+    """Run one worker: answer partial aggregates on a Unix socket until killed."""
+    worker = PartitionWorker(index, count, by, resource_dir)
+
+    def watch():
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            try:
+                worker.reload()
+            except Exception:
+                pass  # keep serving the previous version
+
+    def handle(conn):
+        with conn:
+            try:
+                conn.send(("ok", worker.answer(conn.recv())))
+            except Exception as exc:
+                conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+    if RELOAD_INTERVAL > 0:
+        threading.Thread(target=watch, daemon=True).start()
+    if os.path.exists(address):
+        os.unlink(address)
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception:
+                continue  # failed handshake
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+def start_workers(socket_dir, count, by="account", resource_dir=data_model.RESOURCE_DIR):
+    """Spawn `count` worker processes; returns them once every socket accepts."""
+    os.makedirs(socket_dir, exist_ok=True)
+    processes = []
+    for i in range(count):
+        address = os.path.join(socket_dir, f"worker-{i}.sock")
+        proc = Process(target=serve, args=(address, i, count, by, resource_dir), daemon=True)
+        proc.start()
+        processes.append(proc)
+    for i in range(count):
+        address = os.path.join(socket_dir, f"worker-{i}.sock")
+        while not os.path.exists(address):
+            time.sleep(0.05)
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local scatter-gather aggregation service.")
+    parser.add_argument("--socket-dir", default=SOCKET_DIR or "/tmp/crm-agg")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--by", choices=["account", "month"], default="account")
+    parser.add_argument("--resources", default=data_model.RESOURCE_DIR)
+    args = parser.parse_args()
+
+    processes = start_workers(args.socket_dir, args.workers, args.by, args.resources)
+    print(f"{args.workers} workers partitioned by {args.by} on {args.socket_dir}", flush=True)
+    print(f"start the dashboard with CRM_AGG_SOCKETS={args.socket_dir}", flush=True)
+    for proc in processes:
+        proc.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import os
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# flag a period when its robust z-score is beyond this many deviations
+ALERT_THRESHOLD = float(os.environ.get("CRM_ALERT_THRESHOLD", "3.5"))
+
+# EWMA weight of the newest period per grain (a half-life of ~2 weeks / ~5 weeks)
+ALPHAS = {"day": 0.05, "week": 0.15}
+GRAINS = {"day": "D", "week": "W-SUN"}
+
+# periods a series observes before it may raise alerts
+WARMUP = 14
+
+# residuals are clipped to this many deviations before they move the
+# baseline, so one outlier does not hide the next
+HUBER_CLIP = 2.0
+
+# win rates of periods with fewer closed deals are not scored
+MIN_CLOSED = 5
+
+# revenue and won deals are scored once a series expects this many wins per
+# period; sparser series (most regions by day) are mostly zeros
+MIN_EXPECTED_WON = 1.0
+
+# alert scopes: column -> label; None is the whole pipeline
+SCOPES = {None: "All", "office_location": "Region", "product": "Product"}
+METRICS = ["revenue", "won", "win_rate"]
+
+MAX_ALERTS = 500
+
+# alerts the executive page lists, counted back from the last close date
+RECENT_DAYS = 90
+
+
+# ----------------------------
+# DETECTOR BANK
+# ----------------------------
+class DetectorBank:
+    """
+    One robust EWMA detector per series, updated together in O(1) per series.
+
+    Each detector tracks an exponentially weighted mean and mean absolute
+    deviation. A new value is scored against them before it is learned,
+    z = (x - mean) / (1.2533 * mad), which is a standard score for normal
+    data. The update then uses the residual clipped to HUBER_CLIP
+    deviations, so the baseline follows level shifts without being dragged
+    by single spikes. `floor` bounds the scale from below where the
+    deviation of a quiet series says less than its sampling noise.
+    """
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.mean = np.zeros(0)
+        self.mad = np.zeros(0)
+        self.count = np.zeros(0, dtype=np.int64)
+
+    def grow(self, size):
+        extra = size - len(self.mean)
+        if extra > 0:
+            self.mean = np.r_[self.mean, np.zeros(extra)]
+            self.mad = np.r_[self.mad, np.zeros(extra)]
+            self.count = np.r_[self.count, np.zeros(extra, dtype=np.int64)]
+
+    def update(self, values, valid, floor=0.0, score=True):
+        """
+        z-scores of `values` (NaN where not scored), then learn them; invalid
+        entries are skipped, entries outside `score` are learned only.
+        """
+        values = np.where(valid, values, 0.0)
+        first = valid & (self.count == 0)
+        self.mean[first] = values[first]
+
+        scale = np.fmax(1.2533 * self.mad, floor)
+        scored = valid & score & (self.count >= WARMUP) & (scale > 0)
+        resid = values - self.mean
+        z = np.full(len(values), np.nan)
+        z[scored] = resid[scored] / scale[scored]
+
+        # during warm-up there is no scale yet to clip against
+        warm = self.count >= WARMUP
+        step = np.where(warm, np.clip(resid, -HUBER_CLIP * scale, HUBER_CLIP * scale), resid)
+        learn = valid & ~first
+        self.mean[learn] += self.alpha * step[learn]
+        self.mad[learn] += self.alpha * (np.abs(step[learn]) - self.mad[learn])
+        self.count[valid] += 1
+        return z
+
+
+# ----------------------------
+# STREAMING MONITOR
+# ----------------------------
+def period_values(closed, grain):
+    """
+    revenue / won / lost per (period start, scope, key) of closed deals;
+    scope None aggregates every deal under the key "All".
+    """
+    period = closed["close_date"].dt.to_period(GRAINS[grain]).dt.start_time
+    won = closed["deal_stage"].eq("Won")
+    base = pd.DataFrame({
+        "period": period,
+        "revenue": closed["close_value"].where(won, 0).fillna(0),
+        "won": won.astype(int),
+        "lost": closed["deal_stage"].eq("Lost").astype(int),
+    })
+    frames = []
+    for scope in SCOPES:
+        keys = "All" if scope is None else closed[scope]
+        frame = base.assign(scope=SCOPES[scope], key=keys).dropna(subset=["key"])
+        frames.append(frame.groupby(["period", "scope", "key"])[["revenue", "won", "lost"]].sum())
+    return pd.concat(frames)
+
+
+class AlertMonitor:
+    """
+    Streaming anomaly detection on revenue, won deals and win rate per
+    period, overall and per region and product.
+
+    `ingest` scores only the periods closed since the last call. Rows
+    closing after the last scored period are aggregated, and each complete
+    period advances every detector once. Days or weeks without a closed
+    deal count as zero revenue. The newest period stays pending because
+    its rows may still be arriving. Rows that arrive late for periods
+    already scored are not re-scored. A series starts at its first closed
+    deal, so one ingest of all rows and a stream of growing exports learn
+    the same state.
+    """
+
+    def __init__(self):
+        self.series = {}                       # (grain, scope, key, metric) -> detector position
+        self.banks = {grain: DetectorBank(alpha) for grain, alpha in ALPHAS.items()}
+        self.scored_through = {grain: None for grain in GRAINS}
+        self.keys = {}                         # grain -> {(scope, key): first period with a close}
+        self.alerts = deque(maxlen=MAX_ALERTS)
+        self.versions = set()
+        self._lock = threading.Lock()
+
+    def _positions(self, grain, index):
+        # detector position of every (scope, key, metric), new series appended
+        bank = self.banks[grain]
+        size = len(bank.mean)
+        positions = []
+        for scope, key in index:
+            for metric in METRICS:
+                name = (grain, scope, key, metric)
+                if name not in self.series:
+                    self.series[name] = size
+                    size += 1
+                positions.append(self.series[name])
+        bank.grow(size)
+        return np.array(positions, dtype=np.intp)
+
+    def ingest(self, df, version=None):
+        """Score the periods completed by the closed deals of `df`; returns the number of new alerts."""
+        with self._lock:
+            if version is not None and version in self.versions:
+                return 0
+            before = len(self.alerts)
+            closed = df[df["close_date"].notna() & df["deal_stage"].isin(["Won", "Lost"])]
+            for grain in GRAINS:
+                self._advance(grain, closed)
+            if version is not None:
+                self.versions.add(version)
+            return len(self.alerts) - before
+
+    def _advance(self, grain, closed):
+        last = self.scored_through[grain]
+        if last is not None:
+            closed = closed[closed["close_date"] > last]
+        if closed.empty:
+            return
+        first = closed["close_date"].min() if last is None else last + pd.Timedelta(days=1)
+        periods = pd.period_range(first, closed["close_date"].max(), freq=GRAINS[grain])
+        starts = periods.start_time[:-1]                   # the newest period is still open
+        if not len(starts):
+            return
+
+        # every series seen so far gets a value from its first close on, zero
+        # when it had no closes
+        values = period_values(closed, grain)
+        known = self.keys.setdefault(grain, {})
+        for (scope, key), first_close in values.reset_index().groupby(["scope", "key"])["period"].min().items():
+            known.setdefault((scope, key), first_close)
+        index = sorted(known)
+        born = np.array([known[series] for series in index], dtype="datetime64[ns]")
+        positions = self._positions(grain, index)
+        grid = values.reindex(pd.MultiIndex.from_tuples(
+            [(start, scope, key) for start in starts for scope, key in index], names=["period", "scope", "key"]
+        ), fill_value=0)
+        revenue, won, lost = (grid[col].to_numpy(dtype="float64").reshape(len(starts), len(index))
+                              for col in ["revenue", "won", "lost"])
+        closes = won + lost
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = won / closes * 100
+
+        bank = self.banks[grain]
+        for t, start in enumerate(starts):
+            metrics = np.column_stack([revenue[t], won[t], rate[t]])
+            live = born <= start.to_datetime64()
+            valid = np.column_stack([live, live, live & (closes[t] >= MIN_CLOSED)])
+            expected = bank.mean[positions].reshape(len(index), len(METRICS))
+
+            # sampling-noise floors: Poisson wins at the expected deal size, binomial win rate
+            wins = expected[:, 1]
+            floor = np.column_stack([
+                expected[:, 0] / np.sqrt(np.fmax(wins, 1)),
+                np.sqrt(wins),
+                np.sqrt(expected[:, 2] * (100 - expected[:, 2]) / np.fmax(closes[t], 1)),
+            ])
+            active = np.column_stack([wins >= MIN_EXPECTED_WON, wins >= MIN_EXPECTED_WON, np.ones(len(index), bool)])
+
+            metrics, valid, expected = metrics.ravel(), valid.ravel(), expected.ravel()
+            z = bank.update(
+                self._scatter(bank, positions, metrics),
+                self._scatter(bank, positions, valid),
+                self._scatter(bank, positions, floor.ravel()),
+                self._scatter(bank, positions, active.ravel()),
+            )[positions]
+            for i in np.flatnonzero(np.abs(np.nan_to_num(z)) > ALERT_THRESHOLD):
+                scope, key = index[i // len(METRICS)]
+                self.alerts.append({
+                    "period": start, "grain": grain, "scope": scope, "key": key,
+                    "metric": METRICS[i % len(METRICS)], "value": metrics[i],
+                    "expected": expected[i], "z": z[i],
+                })
+        self.scored_through[grain] = periods[-2].end_time.normalize()
+
+    @staticmethod
+    def _scatter(bank, positions, values):
+        out = np.zeros(len(bank.mean), dtype=np.asarray(values).dtype)
+        out[positions] = values
+        return out
+
+    def recent(self, since=None, filters=None):
+        """Alerts from `since` on, newest first, limited to the selected regions / products."""
+        with self._lock:
+            out = pd.DataFrame(list(self.alerts), columns=["period", "grain", "scope", "key", "metric",
+                                                             "value", "expected", "z"])
+        if since is not None:
+            out = out[out["period"] >= pd.Timestamp(since)]
+        for col, vals in (filters or {}).items():
+            if vals is not None and col in SCOPES:
+                out = out[(out["scope"] != SCOPES[col]) | out["key"].isin(vals)]
+        out = out.sort_values("z", key=np.abs, ascending=False)
+        return out.sort_values("period", ascending=False, kind="stable").reset_index(drop=True)
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor():
+    # one monitor per server process; detector state carries over data versions
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = AlertMonitor()
+    return _monitor
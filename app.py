@@ -3,6 +3,9 @@ import yaml
 from yaml.loader import SafeLoader
 import streamlit_authenticator as stauth
 
+import memo
+import scheduler
+
 st.set_page_config(page_title="CRM Dashboard", layout="wide")
 
 # LOAD CONFIG
@@ -89,3 +92,19 @@ elif auth_status is True:
     st.markdown("# 📊 CRM Analytics Dashboard")
     st.write("### Welcome to CRM Streamlit App 🚀")
     st.success("✔ Use the left sidebar to open dashboards")
+
+    # CACHE STATISTICS
+    with st.expander("⚙️ Cache statistics"):
+        stats = memo.get_memo().stats()
+        st.write(
+            f"Filter results: {stats['entries']} entries · {stats['mb']:.1f} MB · "
+            f"hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits / {stats['misses']} misses) · "
+            f"{stats['evictions']} evictions"
+        )
+        load = scheduler.get_scheduler().stats()
+        st.write(
+            f"Scheduler: {load['running']} running · {load['queued']} queued · "
+            f"{load['coalesced']} coalesced · interactive wait {load['interactive_wait_ms']:.0f} ms "
+            f"(p95 {load['interactive_p95_ms']:.0f} ms) · bulk wait {load['bulk_wait_ms']:.0f} ms "
+            f"(p95 {load['bulk_p95_ms']:.0f} ms)"
+        )
@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+import aggregate
+import data_model
+import data_store
+import disk_cache
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+BUILD_DIR = os.environ.get("CRM_BUILD_DIR", os.path.join(".cache", "build"))
+STATE_FILE = "state.json"
+
+# the 360 csv files the build writes back into Resources/
+ENTITY_CSVS = ["account_360", "product_360", "sales_agent_360"]
+
+
+# ----------------------------
+# CONTENT HASHES
+# ----------------------------
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def value_hash(value):
+    # stable hash of a frame / array / dict of them, used as the output hash
+    digest = hashlib.sha1()
+
+    def feed(v):
+        if isinstance(v, pd.DataFrame):
+            digest.update(json.dumps([list(map(str, v.columns)), list(map(str, v.dtypes))]).encode())
+            digest.update(pd.util.hash_pandas_object(v, index=False).to_numpy().tobytes())
+        elif isinstance(v, np.ndarray) and v.dtype != object:
+            digest.update(str(v.dtype).encode() + str(v.shape).encode())
+            digest.update(np.ascontiguousarray(v).tobytes())
+        elif isinstance(v, dict):
+            for key in sorted(v, key=str):
+                digest.update(str(key).encode())
+                feed(v[key])
+        else:
+            digest.update(json.dumps(v, default=str, sort_keys=True).encode())
+
+    feed(value)
+    return digest.hexdigest()
+
+
+# ----------------------------
+# BUILD STEPS
+# ----------------------------
+# every step works on bundles (flat dicts of frames / arrays / json values),
+# so its output can be stored in and reloaded from the artifact cache
+def _snapshot(bundle):
+    # stand-in for data_store.Snapshot, the derived builders only read .tables
+    return SimpleNamespace(tables=bundle)
+
+
+def _persisted(name):
+    # a data_store.DERIVED aggregate stored with its data_store.PERSISTED codec
+    encode = data_store.PERSISTED[name][0]
+    return lambda inputs: encode(data_store.DERIVED[name](_snapshot(inputs["enriched"])))
+
+
+def _raw(inputs, resource_dir):
+    return data_model.load_raw_tables(resource_dir)
+
+
+def _enriched(inputs):
+    enriched, dropped = data_model.build_enriched_pipeline(inputs["raw"])
+    return {"enriched": enriched, "dropped": dropped}
+
+
+def _entity(name):
+    def run(inputs, resource_dir):
+        # the shipped 360 tables count every pipeline row, not just the joined ones
+        pipeline = data_model.add_calendar_columns(inputs["raw"]["sales_pipeline"].copy())
+        engine = aggregate.LocalEngine([{"pipeline": pipeline}])
+        table = aggregate.entity_table(engine, name, inputs["raw"])
+        write_entity_csv(table, os.path.join(resource_dir, f"{name}.csv"))
+        return {"frame": table}
+    return run
+
+
+def _cohort(inputs, resource_dir):
+    return {"frame": data_model.load_cohort(resource_dir)}
+
+
+def _retention(inputs):
+    encode = data_store.PERSISTED["retention_matrix"][0]
+    return encode(data_store.DERIVED["retention_matrix"](_snapshot({"cohort": inputs["cohort"]["frame"]})))
+
+
+def write_entity_csv(table, path):
+    """360 table in the shipped csv layout; the file is only replaced when its rows change."""
+    out = table.drop(columns=["month_num", "month_name", "month_year"]).copy()
+    for col in ["first_engage_date", "last_close_date"]:
+        out[col] = out[col].dt.strftime(data_model.DATE_FORMAT)
+    for col in ["avg_win_deal_value", "avg_sales_cycle_days"]:
+        out[col] = out[col].astype("Int64")
+    out["win_rate"] = out["win_rate"].round(9)
+
+    text = out.to_csv(index=False, float_format="%.10g")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8-sig", newline="") as file:
+            if sorted(file.read().splitlines()) == sorted(text.splitlines()):
+                return False  # same rows, the row order carries no meaning
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as file:
+        file.write(text)
+    os.replace(tmp, path)
+    return True
+
+
+class Step:
+    """One DAG node: `run(inputs[, resource_dir])` over the outputs of `deps` and the `files` it reads."""
+
+    def __init__(self, name, run, deps=(), files=(), needs_resources=False):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.files = list(files)
+        self.needs_resources = needs_resources
+
+
+def default_steps():
+    """
+    Raw and enriched tables, the 360 csv files, the cohort table and every
+    data_store.PERSISTED aggregate, the artifacts a restarted replica reads
+    back from the disk cache. The other data_store.DERIVED objects (rollups,
+    date indexes, typeahead, intervals, affinity, funnel, pipeline model,
+    samplers, leaderboards, local engine) are left out on purpose: they have
+    no disk codec and Snapshot.warm rebuilds all of them from the cached
+    tables in about 0.2 s.
+    """
+    base = ["sales_pipeline.csv", "accounts.csv", "sales_agent.csv", "products.csv"]
+    steps = [
+        Step("raw", _raw, files=base, needs_resources=True),
+        Step("enriched", _enriched, ["raw"]),
+        Step("cohort", _cohort, files=["cohort_raw.csv"], needs_resources=True),
+        Step("retention_matrix", _retention, ["cohort"]),
+    ]
+    steps += [Step(name, _entity(name), ["raw"], needs_resources=True) for name in ENTITY_CSVS]
+    steps += [Step(name, _persisted(name), ["enriched"]) for name in data_store.PERSISTED if name != "retention_matrix"]
+    return steps
+
+
+# ----------------------------
+# DAG RUNNER
+# ----------------------------
+class Build:
+    """
+    Runs the steps as a DAG on a thread pool. A step's key hashes its code
+    version, its input files and the output hashes of its dependencies; a
+    step whose key is unchanged is skipped and its output reloaded from the
+    artifact cache only when a rebuilt step needs it.
+    """
+
+    def __init__(self, steps, resource_dir=data_model.RESOURCE_DIR, root=BUILD_DIR, jobs=None, force=False):
+        self.steps = {step.name: step for step in steps}
+        self.resource_dir = resource_dir
+        self.cache = disk_cache.DiskCache(root, max_bytes=float("inf"))
+        self.state_path = os.path.join(root, STATE_FILE)
+        self.jobs = jobs or os.cpu_count() or 2
+        self.force = force
+        self.report = {}
+        self._outputs = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.state_path) as file:
+                self.state = json.load(file)
+        except (OSError, ValueError):
+            self.state = {}
+
+    def _key(self, step):
+        digest = hashlib.sha1(f"{step.name}:{disk_cache.CODE_VERSION}".encode())
+        for name in step.files:
+            digest.update(file_hash(os.path.join(self.resource_dir, name)).encode())
+        for dep in step.deps:
+            digest.update(self.state[dep]["output"].encode())
+        return digest.hexdigest()[:16]
+
+    def _output(self, name):
+        # output of a finished step, loaded from the artifact cache if it was skipped
+        with self._lock:
+            if name in self._outputs:
+                return self._outputs[name]
+        value = self.cache.load(name, self.state[name]["key"])
+        if value is None:
+            raise RuntimeError(f"artifact '{name}' is missing from {self.cache.root}, rerun with --force")
+        with self._lock:
+            self._outputs[name] = value
+        return value
+
+    def _run_step(self, step):
+        start = time.perf_counter()
+        key = self._key(step)
+        previous = self.state.get(step.name, {})
+        if not self.force and previous.get("key") == key and self.cache.exists(step.name, key):
+            self.report[step.name] = ("cached", time.perf_counter() - start)
+            return previous
+
+        inputs = {dep: self._output(dep) for dep in step.deps}
+        value = step.run(inputs, self.resource_dir) if step.needs_resources else step.run(inputs)
+        self.cache.store(step.name, key, value)
+        with self._lock:
+            self._outputs[step.name] = value
+        self.report[step.name] = ("built", time.perf_counter() - start)
+        return {"key": key, "output": value_hash(value)}
+
+    def run(self):
+        pending = dict(self.steps)
+        running = {}
+        done = set()
+        with ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="build") as pool:
+            while pending or running:
+                ready = [s for s in pending.values() if all(d in done for d in s.deps)]
+                for step in ready:
+                    running[pool.submit(self._run_step, step)] = step.name
+                    del pending[step.name]
+                if not running:
+                    raise RuntimeError(f"unsatisfiable dependencies: {sorted(pending)}")
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    self.state[name] = future.result()
+                    done.add(name)
+                    self._save_state()
+        return self.report
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w") as file:
+            json.dump(self.state, file, indent=1)
+        os.replace(tmp, self.state_path)
+
+    def publish(self):
+        """Store the artifacts under the current data version in the dashboard disk cache."""
+        cache = disk_cache.get_cache()
+        if cache is None:
+            return None
+        version = data_model.data_version(self.resource_dir)
+        tables = dict(self._output("raw"))
+        tables.update(self._output("enriched"))
+        for name in ENTITY_CSVS:
+            # read back so the cached tables match what the dashboard parses
+            tables[name] = data_model.load_360_table(name, self.resource_dir)
+        tables["cohort"] = self._output("cohort")["frame"]
+        cache.store("tables", version, tables)
+        for name in data_store.PERSISTED:
+            cache.store(name, version, self._output(name))
+        return version
+
+
+def format_report(report, total):
+    width = max(len(name) for name in report)
+    lines = [f"{'step':<{width}}  status   seconds"]
+    for name, (status, seconds) in sorted(report.items(), key=lambda kv: -kv[1][1]):
+        lines.append(f"{name:<{width}}  {status:<7}  {seconds:7.3f}")
+    built = sum(1 for status, _ in report.values() if status == "built")
+    lines.append(f"{built}/{len(report)} steps rebuilt in {total:.2f}s")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build every derived dashboard artifact from the raw tables.")
+    parser.add_argument("--resources", default=data_model.RESOURCE_DIR)
+    parser.add_argument("--root", default=BUILD_DIR)
+    parser.add_argument("--jobs", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="rebuild every step")
+    parser.add_argument("--no-publish", action="store_true", help="do not warm the dashboard disk cache")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build = Build(default_steps(), args.resources, args.root, args.jobs, args.force)
+    report = build.run()
+    if not args.no_publish:
+        version = build.publish()
+        if version:
+            print(f"published data version {version} to the dashboard cache")
+    print(format_report(report, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
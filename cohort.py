@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# cell labels are only drawn on small matrices, large ones stay a plain
+# colour grid so the browser render cost does not grow with the cell count
+MAX_LABELLED_CELLS = 2500
+
+
+# ----------------------------
+# DENSE RETENTION MATRIX
+# ----------------------------
+def retention_matrix(df, index="cohort_month", columns="month_since_acquisition",
+                     values="retention_by_month"):
+    """
+    Dense (cohorts x periods) float matrix, NaN where a cohort has no value.
+    Duplicate cells keep their max, like pivot_table(aggfunc='max').
+    Returns (matrix, row_keys, col_keys) with both key arrays sorted.
+    """
+    row_codes, row_keys = pd.factorize(df[index], sort=True)
+    col_codes, col_keys = pd.factorize(df[columns], sort=True)
+    vals = df[values].to_numpy(dtype="float64")
+
+    valid = (row_codes >= 0) & (col_codes >= 0) & ~np.isnan(vals)
+    matrix = np.full((len(row_keys), len(col_keys)), np.nan)
+    np.fmax.at(matrix.reshape(-1), row_codes[valid] * len(col_keys) + col_codes[valid], vals[valid])
+    return matrix, np.asarray(row_keys), np.asarray(col_keys)
+
+
+def heatmap_trace_args(matrix, row_labels, col_labels, decimals=2):
+    # keyword arguments for a single go.Heatmap trace
+    args = dict(
+        z=np.round(matrix, decimals),
+        x=[str(c) for c in col_labels],
+        y=list(row_labels),
+        colorscale="Greens",
+        zmin=0,
+        zmax=np.nanmax(matrix) if np.isfinite(matrix).any() else 1,
+        hoverongaps=False,
+        hovertemplate="Cohort %{y}<br>Month %{x}<br>Retention %{z:.2f}<extra></extra>",
+    )
+    if matrix.size <= MAX_LABELLED_CELLS:
+        args["texttemplate"] = f"%{{z:.{decimals}f}}"
+    return args
@@ -0,0 +1,183 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# CONSTANTS
+# ----------------------------
+RESOURCE_DIR = "Resources"
+DATE_FORMAT = "%d-%m-%Y"
+
+OPEN_STAGES = ["Prospecting", "Engaging"]
+STAGE_ORDER = ["Prospecting", "Engaging", "Lost", "Won"]
+
+# month slicer labels, e.g. "Mar 2017"; the year keeps March 2016 and
+# March 2017 apart
+MONTH_YEAR_FORMAT = "%b %Y"
+
+
+# ----------------------------
+# DATA VERSION
+# ----------------------------
+def data_version(resource_dir=RESOURCE_DIR):
+    """Content hash of every csv in the resource folder (12 hex chars)."""
+    digest = hashlib.sha1()
+    for name in sorted(os.listdir(resource_dir)):
+        if not name.endswith(".csv"):
+            continue
+        digest.update(name.encode())
+        with open(os.path.join(resource_dir, name), "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+# ----------------------------
+# RAW TABLES
+# ----------------------------
+def read_sales_pipeline(path):
+    """One sales_pipeline.csv export with its dates parsed."""
+    sales_pipeline = pd.read_csv(path)
+    sales_pipeline["engage_date"] = pd.to_datetime(sales_pipeline["engage_date"], format=DATE_FORMAT, errors="coerce")
+    sales_pipeline["close_date"] = pd.to_datetime(sales_pipeline["close_date"], format=DATE_FORMAT, errors="coerce")
+    return sales_pipeline
+
+
+def load_raw_tables(resource_dir=RESOURCE_DIR):
+    """Read the four base tables with pipeline dates already parsed."""
+    def path(name):
+        return os.path.join(resource_dir, name)
+
+    return {
+        "sales_pipeline": read_sales_pipeline(path("sales_pipeline.csv")),
+        "accounts": pd.read_csv(path("accounts.csv")),
+        "sales_agent": pd.read_csv(path("sales_agent.csv")),
+        "products": pd.read_csv(path("products.csv")),
+    }
+
+
+def add_360_columns(df):
+    # page slicer columns of the 360 tables
+    df["month_num"] = df["first_engage_date"].dt.month
+    df["month_name"] = df["first_engage_date"].dt.month_name()
+    df["month_year"] = df["first_engage_date"].dt.strftime(MONTH_YEAR_FORMAT)
+    return df
+
+
+def month_year_options(dates):
+    """Distinct month_year labels of a date column, oldest first."""
+    months = pd.Series(dates).dropna().dt.to_period("M").drop_duplicates().sort_values()
+    return months.dt.strftime(MONTH_YEAR_FORMAT).tolist()
+
+
+def load_360_table(name, resource_dir=RESOURCE_DIR):
+    # account_360 / product_360 / sales_agent_360 with the page slicer columns
+    df = pd.read_csv(os.path.join(resource_dir, f"{name}.csv"))
+    df["first_engage_date"] = pd.to_datetime(df["first_engage_date"], format=DATE_FORMAT)
+    df["last_close_date"] = pd.to_datetime(df["last_close_date"], format=DATE_FORMAT)
+    return add_360_columns(df)
+
+
+def load_cohort(resource_dir=RESOURCE_DIR):
+    cr = pd.read_csv(os.path.join(resource_dir, "cohort_raw.csv"))
+    cr["cohort_month"] = pd.to_datetime(cr["cohort_month"], format=DATE_FORMAT)
+    cr = cr.sort_values("cohort_month", ascending=True).reset_index(drop=True)
+    cr["month_num"] = cr["cohort_month"].dt.month
+    cr["month_name"] = cr["cohort_month"].dt.month_name()
+    cr["month_year"] = cr["cohort_month"].dt.strftime(MONTH_YEAR_FORMAT)
+    return cr
+
+
+def load_all_tables(resource_dir=RESOURCE_DIR):
+    """Raw tables, the enriched pipeline and the pre-aggregated page tables."""
+    tables = load_raw_tables(resource_dir)
+    tables["enriched"], tables["dropped"] = build_enriched_pipeline(tables)
+    for name in ["account_360", "product_360", "sales_agent_360"]:
+        tables[name] = load_360_table(name, resource_dir)
+    tables["cohort"] = load_cohort(resource_dir)
+    return tables
+
+
+# ----------------------------
+# CODE-INDEXED LOOKUP JOIN
+# ----------------------------
+def lookup_codes(fact_keys, dim_keys):
+    # position of every fact key inside the dimension table, -1 when missing
+    dim_index = pd.Index(dim_keys)
+    if not dim_index.is_unique:
+        raise ValueError(f"lookup key '{dim_index.name}' is not unique in the dimension table")
+    return dim_index.get_indexer(fact_keys)
+
+
+def lookup_join(fact, dim, key, columns, how="left"):
+    # gather dimension columns by row position instead of a hash merge;
+    # returns the joined frame and the boolean mask of matched fact rows
+    codes = lookup_codes(fact[key], dim[key])
+    matched = codes >= 0
+
+    joined = fact[matched].copy() if how == "inner" else fact.copy()
+    codes = codes[matched] if how == "inner" else codes
+    all_matched = bool((codes >= 0).all())
+    safe_codes = np.where(codes >= 0, codes, 0)
+
+    for col in columns:
+        values = dim[col].to_numpy()
+        if all_matched:
+            joined[col] = values[codes]
+        elif len(values) == 0:
+            joined[col] = np.nan
+        else:
+            joined[col] = pd.Series(values[safe_codes], index=joined.index).where(codes >= 0)
+    return joined, matched
+
+
+# ----------------------------
+# ENRICHED PIPELINE
+# ----------------------------
+ACCOUNT_COLUMNS = ["sector", "year_established", "revenue", "employees", "office_location", "subsidiary_of"]
+AGENT_COLUMNS = ["manager", "regional_office"]
+PRODUCT_COLUMNS = ["series", "sales_price"]
+
+
+def add_calendar_columns(df):
+    close = df["close_date"]
+    df["month_num"] = close.dt.month
+    df["month_name"] = close.dt.month_name()
+    df["month_year"] = close.dt.strftime(MONTH_YEAR_FORMAT)
+    df["close_year"] = close.dt.year.astype("Int64")
+    df["close_quarter"] = close.dt.quarter.astype("Int64")
+    df["close_week"] = close.dt.isocalendar().week.astype("Int64")
+    df["close_month_start"] = close.dt.to_period("M").dt.to_timestamp()
+    df["engage_month_start"] = df["engage_date"].dt.to_period("M").dt.to_timestamp()
+    df["sales_cycle_days"] = (close - df["engage_date"]).dt.days.astype("Int64")
+    return df
+
+
+def build_enriched_pipeline(tables):
+    """
+    Denormalized fact table: pipeline + account, agent and product attributes
+    + calendar columns. Returns (enriched, dropped) where `dropped` holds the
+    pipeline rows removed by the inner join on accounts.
+    """
+    pipeline = tables["sales_pipeline"]
+
+    df, matched = lookup_join(pipeline, tables["accounts"], "account", ACCOUNT_COLUMNS, how="inner")
+    dropped = pipeline[~matched]
+
+    # agent and product lookups keep every row, unmatched attributes stay NaN
+    df, _ = lookup_join(df, tables["sales_agent"], "sales_agent", AGENT_COLUMNS)
+    df, _ = lookup_join(df, tables["products"], "product", PRODUCT_COLUMNS)
+
+    df = add_calendar_columns(df.reset_index(drop=True))
+    return df, dropped.reset_index(drop=True)
+
+
+def dropped_summary(dropped):
+    # one line per deal stage, e.g. "Engaging: 1,088"
+    if dropped.empty:
+        return ""
+    counts = dropped["deal_stage"].value_counts()
+    return ", ".join(f"{stage}: {count:,}" for stage, count in counts.items())
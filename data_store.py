@@ -0,0 +1,283 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import affinity
+import aggregate
+import cohort
+import data_model
+import date_index
+import disk_cache
+import forecast
+import funnel
+import hierarchy
+import history
+import intervals
+import memo
+import quantiles
+import rollup
+import sampling
+import search
+import shared_data
+import sketches
+import topk
+import usage
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# seconds between two looks at Resources/, CRM_RELOAD_INTERVAL=0 disables hot reload
+POLL_INTERVAL = float(os.environ.get("CRM_RELOAD_INTERVAL", "5"))
+
+
+# ----------------------------
+# DERIVED AGGREGATES
+# ----------------------------
+# name -> builder(snapshot); every entry is built in the background before a
+# new data version is swapped in, so the first rerun after a swap is warm
+def _distinct_cubes(snapshot):
+    # one HyperLogLog per (month, product, region) cell, merged per filter
+    df = snapshot.tables["enriched"]
+    dims = ["month_year", "product", "office_location"]
+    return {
+        "opportunity_id": sketches.DistinctCube.from_frame(df, dims, "opportunity_id"),
+        "account": sketches.DistinctCube.from_frame(df, dims, "account"),
+    }
+
+
+def _quantile_cubes(snapshot):
+    # deal sizes of won deals and cycles of closed deals, one sketch per cell
+    # of the executive cube and per product / agent for the 360 pages
+    df = snapshot.tables["enriched"]
+    won = df[df["deal_stage"] == "Won"]
+    cubes = {}
+    for prefix, dims in [("", ["month_year", "product", "office_location"]),
+                         ("product_", ["product"]), ("agent_", ["sales_agent"])]:
+        cubes[prefix + "close_value"] = quantiles.QuantileCube.from_frame(won, dims, "close_value")
+        cubes[prefix + "sales_cycle_days"] = quantiles.QuantileCube.from_frame(df, dims, "sales_cycle_days")
+    return cubes
+
+
+# date columns behind the range slicers, sorted once per data version
+DATE_INDEXED = {
+    "enriched": ["engage_date", "close_date"],
+    "account_360": ["first_engage_date", "last_close_date"],
+    "product_360": ["first_engage_date", "last_close_date"],
+    "sales_agent_360": ["first_engage_date", "last_close_date"],
+}
+
+
+DERIVED = {
+    "distinct_cubes": _distinct_cubes,
+    "quantile_cubes": _quantile_cubes,
+    "retention_matrix": lambda snap: cohort.retention_matrix(snap.tables["cohort"]),
+    "won_deals": lambda snap: snap.tables["enriched"].query("deal_stage == 'Won'").reset_index(drop=True),
+    "account_leaderboards": lambda snap: topk.LeaderboardIndex("account", "close_value", k=10),
+    "enriched_sampler": lambda snap: sampling.ProgressiveSampler(snap.tables["enriched"]),
+    "pipeline_sampler": lambda snap: sampling.ProgressiveSampler(snap.tables["sales_pipeline"]),
+    "product_account_sketches": lambda snap: sketches.DistinctCube.from_frame(
+        snap.tables["enriched"], ["product"], "account"),
+    "agent_account_sketches": lambda snap: sketches.DistinctCube.from_frame(
+        snap.tables["enriched"], ["sales_agent"], "account"),
+    "calendar_rollups": lambda snap: rollup.build_rollups(snap.tables),
+    "hierarchies": lambda snap: hierarchy.build_hierarchies(snap.tables),
+    "typeahead": lambda snap: search.build_indexes(snap.tables),
+    "pipeline_intervals": lambda snap: intervals.PipelineIntervals(snap.tables["enriched"]),
+    "product_affinity": lambda snap: affinity.build_affinity(snap.tables["sales_pipeline"]),
+    "stage_funnel": lambda snap: funnel.StageFunnel(snap.tables["enriched"], transitions=history.load_transitions()),
+    "pipeline_model": lambda snap: forecast.PipelineModel(snap.tables["enriched"]),
+    "date_indexes": lambda snap: {
+        name: date_index.TableIndex(snap.tables[name], columns)
+        for name, columns in DATE_INDEXED.items()
+    },
+    "local_engine": lambda snap: aggregate.LocalEngine([aggregate.engine_tables(snap.tables)], snap.version),
+}
+
+
+# derived aggregates that survive restarts: name -> (encode, decode) between
+# the in-memory object and a flat bundle of frames / arrays
+PERSISTED = {
+    "distinct_cubes": (
+        lambda cubes: disk_cache.flatten({key: cube.to_bundle() for key, cube in cubes.items()}),
+        lambda flat: {key: sketches.DistinctCube.from_bundle(b) for key, b in disk_cache.unflatten(flat).items()},
+    ),
+    "quantile_cubes": (
+        lambda cubes: disk_cache.flatten({key: cube.to_bundle() for key, cube in cubes.items()}),
+        lambda flat: {key: quantiles.QuantileCube.from_bundle(b) for key, b in disk_cache.unflatten(flat).items()},
+    ),
+    "retention_matrix": (
+        lambda m: {"matrix": m[0], "rows": m[1], "cols": m[2]},
+        lambda b: (b["matrix"], b["rows"], b["cols"]),
+    ),
+    "won_deals": (lambda df: {"frame": df}, lambda b: b["frame"]),
+    "product_account_sketches": (lambda cube: cube.to_bundle(), sketches.DistinctCube.from_bundle),
+    "agent_account_sketches": (lambda cube: cube.to_bundle(), sketches.DistinctCube.from_bundle),
+}
+
+
+# ----------------------------
+# SNAPSHOT
+# ----------------------------
+class Snapshot:
+    """
+    One immutable data version: parsed tables plus lazily built derived
+    aggregates. Pages must treat every table as read-only.
+    """
+
+    def __init__(self, version, tables, shared=False):
+        self.version = version
+        self.tables = tables
+        self.shared = shared
+        self.loaded_at = datetime.now()
+        self._derived = {}
+        self._locks = {name: threading.Lock() for name in DERIVED}
+
+    def get(self, name):
+        if name in self._derived:
+            return self._derived[name]
+        with self._locks[name]:
+            if name not in self._derived:
+                self._derived[name] = self._build(name)
+        return self._derived[name]
+
+    def _build(self, name):
+        if self.shared and name in PERSISTED:
+            bundle = shared_data.attach_derived(self.version, name)
+            if bundle is not None:
+                return PERSISTED[name][1](bundle)
+        cache = disk_cache.get_cache()
+        if cache is None or name not in PERSISTED:
+            return DERIVED[name](self)
+        encode, decode = PERSISTED[name]
+        return cache.get_or_build(name, self.version, lambda: DERIVED[name](self), encode, decode)
+
+    def carry_over(self, previous):
+        # cached leaderboards follow the won deals that changed since `previous`
+        self._derived["account_leaderboards"] = previous.get("account_leaderboards").advance(
+            previous.get("won_deals"), self.get("won_deals"))
+        return self
+
+    def warm(self):
+        for name in DERIVED:
+            self.get(name)
+        return self
+
+    @property
+    def label(self):
+        return f"{self.version} · {self.loaded_at:%d %b %H:%M:%S}"
+
+
+def build_snapshot(resource_dir=data_model.RESOURCE_DIR, version=None):
+    # attach to the dataset published by the loader process when there is one
+    if shared_data.SHARED_ENABLED:
+        shared_version = version or shared_data.current_version()
+        if shared_version is not None:
+            try:
+                return Snapshot(shared_version, shared_data.attach(shared_version), shared=True).warm()
+            except (OSError, ValueError, KeyError):
+                pass  # not (fully) published, parse Resources/ locally
+        # the local parse is versioned by its own content, never by the
+        # manifest: two datasets must not share a version and memo keys
+        version = None
+
+    # a restarted replica reads every table and persisted aggregate from disk
+    version = version or data_model.data_version(resource_dir)
+    cache = disk_cache.get_cache()
+    if cache is None:
+        tables = data_model.load_all_tables(resource_dir)
+    else:
+        tables = cache.get_or_build("tables", version, lambda: data_model.load_all_tables(resource_dir), dict, dict)
+    # record the export before warming so the funnel sees today's stage moves
+    if history.HISTORY_ENABLED:
+        try:
+            history.record_export(tables["sales_pipeline"])
+        except (OSError, ValueError):
+            pass  # a read-only disk or a malformed export must not stop the dashboard
+    return Snapshot(version, tables).warm()
+
+
+# ----------------------------
+# DATA STORE (STALE-WHILE-REVALIDATE)
+# ----------------------------
+class DataStore:
+    """
+    Serves the current Snapshot while a daemon thread polls Resources/.
+    A changed content hash triggers a rebuild in that thread; sessions keep
+    reading the previous snapshot until the new one is swapped in atomically.
+    A failed rebuild keeps the old version and is reported in `last_error`.
+    """
+
+    def __init__(self, resource_dir=data_model.RESOURCE_DIR, poll_interval=POLL_INTERVAL):
+        self.resource_dir = resource_dir
+        self.poll_interval = poll_interval
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._signature = self._file_signature()
+        self._snapshot = build_snapshot(resource_dir)
+        usage.schedule_precompute(self._snapshot)
+        self._thread = None
+        if poll_interval > 0:
+            self._thread = threading.Thread(target=self._watch, name="data-store-watcher", daemon=True)
+            self._thread.start()
+
+    def current(self):
+        with self._lock:
+            return self._snapshot
+
+    def _file_signature(self):
+        # with a loader process the manifest names the version to serve
+        if shared_data.SHARED_ENABLED:
+            return shared_data.current_version()
+        # cheap change detector, the content hash decides if data really changed
+        entries = []
+        for name in sorted(os.listdir(self.resource_dir)):
+            if name.endswith(".csv"):
+                stat = os.stat(os.path.join(self.resource_dir, name))
+                entries.append((name, stat.st_size, stat.st_mtime_ns))
+        return tuple(entries)
+
+    def refresh(self):
+        """Rebuild if the resource files changed; returns True when swapped."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return False
+        if shared_data.SHARED_ENABLED:
+            version = signature
+        else:
+            version = data_model.data_version(self.resource_dir)
+        if version is None or version == self.current().version:
+            self._signature = signature
+            return False
+
+        snapshot = build_snapshot(self.resource_dir, version).carry_over(self.current())
+        with self._lock:
+            self._snapshot = snapshot
+        self._signature = signature
+        memo.get_memo().drop_version(version)
+        usage.schedule_precompute(snapshot)
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as exc:  # keep serving the previous version
+                self.last_error = f"{type(exc).__name__}: {exc}"
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # one store per server process, shared by every session
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DataStore()
+    return _store
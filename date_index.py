@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# RANGE FILTERS
+# ----------------------------
+# a date range travels in a filter dict as a plain, hashable tuple so it
+# works as a memo key, pickles to the aggregation workers and survives the
+# usage file: (RANGE, "2017-01-01", "2017-06-30"), either bound may be None
+RANGE = "__range__"
+
+
+def date_range(start=None, end=None):
+    """Inclusive range filter value; None leaves that side open."""
+    def iso(date):
+        return None if date is None else pd.Timestamp(date).strftime("%Y-%m-%d")
+    return (RANGE, iso(start), iso(end))
+
+
+def is_range(vals):
+    return isinstance(vals, (tuple, list)) and len(vals) == 3 and vals[0] == RANGE
+
+
+def normalize_range(start, end, lo, hi):
+    # a range covering every date of the column is no filter
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if start <= pd.Timestamp(lo) and end >= pd.Timestamp(hi):
+        return None
+    return date_range(start if start > pd.Timestamp(lo) else None, end if end < pd.Timestamp(hi) else None)
+
+
+def _bounds(vals):
+    # inclusive day bounds as datetime64[ns] ints; the end covers its whole day
+    _, start, end = vals
+    lo = np.iinfo(np.int64).min if start is None else pd.Timestamp(start).value
+    hi = np.iinfo(np.int64).max if end is None else (pd.Timestamp(end) + pd.Timedelta(days=1)).value - 1
+    return lo, hi
+
+
+# ----------------------------
+# SORTED DATE INDEX
+# ----------------------------
+class SortedDateIndex:
+    """
+    Row positions of one date column sorted by date, missing dates left out.
+    A range is two binary searches and a slice of `order`.
+    """
+
+    def __init__(self, values):
+        keys = pd.Series(values).to_numpy(dtype="datetime64[ns]").view("int64")
+        valid = np.flatnonzero(keys != np.iinfo(np.int64).min)   # NaT
+        self.order = valid[np.argsort(keys[valid], kind="stable")]
+        self.keys = keys[self.order]
+        self.size = len(keys)
+
+    def positions(self, vals):
+        """Row positions inside the range, in date order."""
+        lo, hi = _bounds(vals)
+        return self.order[np.searchsorted(self.keys, lo, side="left"):np.searchsorted(self.keys, hi, side="right")]
+
+    def rows(self, vals):
+        """Row positions inside the range, in row order."""
+        return np.sort(self.positions(vals))
+
+
+class TableIndex:
+    """Sorted date indexes of one table; `columns` are built up front, others on first use."""
+
+    def __init__(self, df, columns=()):
+        self.df = df
+        self._columns = {col: SortedDateIndex(df[col]) for col in columns}
+        self._lock = threading.Lock()
+
+    def column(self, col):
+        with self._lock:
+            if col not in self._columns:
+                self._columns[col] = SortedDateIndex(self.df[col])
+            return self._columns[col]
+
+
+def range_rows(filters, index):
+    """
+    Sorted row positions inside every range filter of `filters`, from the
+    sorted indexes of `index`; None when `filters` holds no range.
+    """
+    rows = None
+    for col, vals in filters.items():
+        if is_range(vals):
+            found = index.column(col).rows(vals)
+            rows = found if rows is None else np.intersect1d(rows, found, assume_unique=True)
+    return rows
+
+
+def range_mask(df, col, vals):
+    """Rows of `df` whose `col` falls inside the range value `vals`."""
+    lo, hi = _bounds(vals)
+    keys = df[col].to_numpy(dtype="datetime64[ns]").view("int64")
+    return (keys != np.iinfo(np.int64).min) & (keys >= lo) & (keys <= hi)
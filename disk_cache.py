@@ -0,0 +1,228 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+CACHE_DIR = os.environ.get("CRM_CACHE_DIR", os.path.join(".cache", "artifacts"))
+CACHE_MAX_MB = float(os.environ.get("CRM_CACHE_MAX_MB", "512"))
+# CRM_DISK_CACHE=0 turns the tier off (everything is rebuilt in memory)
+CACHE_ENABLED = os.environ.get("CRM_DISK_CACHE", "1") == "1"
+
+MANIFEST = "manifest.json"
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def code_version():
+    # hash of the shared modules; any code change invalidates stored artifacts
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(_ROOT, "*.py"))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:12]
+
+
+CODE_VERSION = code_version()
+
+
+# ----------------------------
+# BUNDLE FORMAT
+# ----------------------------
+# an artifact is a flat dict of name -> DataFrame | ndarray | json value,
+# stored as one directory: frames as Arrow IPC (feather), arrays as .npy and
+# everything else inside manifest.json
+def _write_bundle(path, bundle):
+    items = {}
+    for name, value in bundle.items():
+        if isinstance(value, pd.DataFrame):
+            file = f"{name}.arrow"
+            value.reset_index(drop=True).to_feather(os.path.join(path, file))
+            items[name] = {"kind": "frame", "file": file}
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            file = f"{name}.npy"
+            np.save(os.path.join(path, file), value, allow_pickle=False)
+            items[name] = {"kind": "array", "file": file}
+        else:
+            items[name] = {"kind": "json", "value": value}
+    with open(os.path.join(path, MANIFEST), "w") as file:
+        json.dump({"created": time.time(), "items": items}, file)
+
+
+def _restore_missing(frame):
+    # Arrow reads missing strings back as None; pandas code matches them as NaN
+    for col in frame.columns[frame.dtypes == object]:
+        missing = frame[col].isna().to_numpy()
+        if missing.any():
+            values = frame[col].to_numpy(copy=True)
+            values[missing] = np.nan
+            frame[col] = values
+    return frame
+
+
+def _read_bundle(path, mmap=True):
+    with open(os.path.join(path, MANIFEST)) as file:
+        manifest = json.load(file)
+    bundle = {}
+    for name, item in manifest["items"].items():
+        if item["kind"] == "frame":
+            bundle[name] = _restore_missing(pd.read_feather(os.path.join(path, item["file"])))
+        elif item["kind"] == "array":
+            bundle[name] = np.load(os.path.join(path, item["file"]), mmap_mode="r" if mmap else None,
+                                   allow_pickle=False)
+        else:
+            bundle[name] = item["value"]
+    return bundle
+
+
+def _dir_size(path):
+    total = 0
+    for entry in os.scandir(path):
+        try:
+            total += entry.stat().st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+
+# ----------------------------
+# DISK CACHE
+# ----------------------------
+class DiskCache:
+    """
+    Artifacts keyed by (name, data version, code version) under `root`.
+
+    Writers build a bundle in a private temp directory and publish it with a
+    single rename, so concurrent replicas never see half-written entries; the
+    first rename wins and later ones are dropped. Reads touch the entry mtime
+    and eviction removes the least recently used entries above `max_bytes`.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024, code=CODE_VERSION):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.code = code
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name, version):
+        return os.path.join(self.root, f"{name}-{version}-{self.code}")
+
+    def exists(self, name, version):
+        """Whether an entry is published, without reading it or touching its mtime."""
+        return os.path.isdir(self._path(name, version))
+
+    def load(self, name, version):
+        path = self._path(name, version)
+        try:
+            bundle = _read_bundle(path)
+            os.utime(path)
+        except (FileNotFoundError, NotADirectoryError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return bundle
+
+    def store(self, name, version, bundle):
+        final = self._path(name, version)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            _write_bundle(tmp, bundle)
+            os.rename(tmp, final)
+        except OSError:
+            # another writer published the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def get_or_build(self, name, version, build, encode=lambda x: x, decode=lambda x: x):
+        bundle = self.load(name, version)
+        if bundle is not None:
+            try:
+                return decode(bundle)
+            except (KeyError, ValueError):
+                pass  # stale layout, rebuild below
+        value = build()
+        self.store(name, version, encode(value))
+        return value
+
+    def entries(self):
+        out = []
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".tmp-") or not entry.is_dir():
+                continue
+            try:
+                out.append((entry.stat().st_mtime, _dir_size(entry.path), entry.path))
+            except FileNotFoundError:
+                pass
+        return out
+
+    def evict(self):
+        with self._lock:
+            # temp dirs left behind by crashed writers
+            for tmp in glob.glob(os.path.join(self.root, ".tmp-*")):
+                try:
+                    if time.time() - os.stat(tmp).st_mtime > 3600:
+                        shutil.rmtree(tmp, ignore_errors=True)
+                except FileNotFoundError:
+                    pass
+
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                # rename first so readers never open a half-deleted entry
+                trash = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+                try:
+                    os.rename(path, trash)
+                except OSError:
+                    continue
+                shutil.rmtree(trash, ignore_errors=True)
+                total -= size
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def flatten(bundles):
+    # {"a": {"x": ..}, "b": {"x": ..}} -> {"a__x": .., "b__x": ..}
+    return {f"{outer}__{inner}": value for outer, bundle in bundles.items() for inner, value in bundle.items()}
+
+
+def unflatten(flat):
+    bundles = {}
+    for key, value in flat.items():
+        outer, inner = key.split("__", 1)
+        bundles.setdefault(outer, {})[inner] = value
+    return bundles
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    # process-wide cache, None when the disk tier is disabled or unwritable
+    global _cache, CACHE_ENABLED
+    with _cache_lock:
+        if CACHE_ENABLED and _cache is None:
+            try:
+                _cache = DiskCache()
+            except OSError:
+                CACHE_ENABLED = False
+        return _cache if CACHE_ENABLED else None
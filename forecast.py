@@ -0,0 +1,172 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+FORECAST_TRIALS = int(os.environ.get("CRM_FORECAST_TRIALS", "10000"))
+FORECAST_SEED = int(os.environ.get("CRM_FORECAST_SEED", "42"))
+
+# calendar months from the day after the last day of data that get their own
+# forecast column
+HORIZON_MONTHS = 6
+
+# deal x trial cells simulated per chunk, bounds the working memory
+# (~40 bytes per cell) independent of the pipeline size
+CHUNK_CELLS = 1 << 22
+
+# win rates of small (product, agent) groups are shrunk towards the product
+# rate, and product rates towards the overall rate, with this many pseudo deals
+PRIOR_DEALS = 10
+
+PERCENTILES = (10, 50, 90)
+
+
+# ----------------------------
+# HISTORICAL MODEL
+# ----------------------------
+def _smoothed(won, closed, prior):
+    return (won + PRIOR_DEALS * prior) / (closed + PRIOR_DEALS)
+
+
+class PipelineModel:
+    """
+    Win probabilities, deal values and sales cycles learned from closed deals.
+
+    Values are drawn from the won deals of the same product and cycles from
+    all won deals; both are kept as sorted arrays so a draw is an index.
+    Closed deals were all engaged, so their win rates hold for engaged
+    deals; a prospect first has to be engaged, at the share of every deal
+    that reached Engaging (the funnel's Prospecting conversion, prospects
+    never drop out before that).
+    """
+
+    def __init__(self, df):
+        closed = df[df["deal_stage"].isin(["Won", "Lost"])]
+        won = closed["deal_stage"].eq("Won")
+        overall = won.mean() if len(closed) else 0.0
+
+        by_product = won.groupby(closed["product"]).agg(["sum", "count"])
+        self.product_rate = _smoothed(by_product["sum"], by_product["count"], overall)
+        self.overall_rate = overall
+        by_pair = won.groupby([closed["product"], closed["sales_agent"]]).agg(["sum", "count"])
+        prior = self.product_rate.reindex(by_pair.index.get_level_values(0)).to_numpy()
+        self.pair_rate = pd.Series(_smoothed(by_pair["sum"].to_numpy(), by_pair["count"].to_numpy(), prior),
+                                   index=by_pair.index)
+
+        wins = closed[won]
+        values = wins.sort_values(["product", "close_value"])
+        self.values = values["close_value"].to_numpy(dtype="float64")
+        bounds = values.groupby("product", sort=True).size().cumsum()
+        self.value_end = bounds
+        self.value_start = bounds - values.groupby("product", sort=True).size()
+        self.cycles = np.sort(wins["sales_cycle_days"].dropna().to_numpy(dtype="float64"))
+        self.engage_rate = df["engage_date"].notna().mean() if len(df) else 1.0
+
+    def deal_inputs(self, deals, as_of):
+        """Per open deal: win probability (prospects engage first), value slice and age in days."""
+        key = pd.MultiIndex.from_arrays([deals["product"], deals["sales_agent"]])
+        p = self.pair_rate.reindex(key).to_numpy()
+        fallback = self.product_rate.reindex(deals["product"]).to_numpy()
+        p = np.where(np.isnan(p), fallback, p)
+        p = np.where(np.isnan(p), self.overall_rate, p)
+        p = np.where(deals["deal_stage"].eq("Prospecting").to_numpy(), p * self.engage_rate, p)
+
+        # products without a won deal draw from every won value
+        lo = self.value_start.reindex(deals["product"]).fillna(0).to_numpy(dtype=np.int64)
+        hi = self.value_end.reindex(deals["product"]).fillna(len(self.values)).to_numpy(dtype=np.int64)
+        age = (pd.Timestamp(as_of) - deals["engage_date"]).dt.days.to_numpy(dtype="float64", na_value=np.nan)
+        return {"p": p, "value_lo": lo, "value_hi": hi, "age": age}
+
+
+# ----------------------------
+# SIMULATION
+# ----------------------------
+def first_month(as_of):
+    # the first forecast month holds the first day after `as_of`
+    return np.datetime64(pd.Timestamp(as_of).normalize() + pd.Timedelta(days=1), "M")
+
+
+def _simulate_chunk(model, inputs, cells, n_cells, trials, seed, horizon, as_of):
+    """Revenue per (trial, cell) of one chunk of deals."""
+    rng = np.random.default_rng(seed)
+    n = len(inputs["p"])
+    won = rng.random((n, trials), dtype=np.float32) < inputs["p"][:, None].astype(np.float32)
+    deal, trial = np.nonzero(won)
+
+    # value: a won deal of the same product
+    lo, hi = inputs["value_lo"][deal], inputs["value_hi"][deal]
+    value = model.values[lo + (rng.random(len(deal)) * (hi - lo)).astype(np.int64)]
+
+    # close timing: a sales cycle longer than the deal's age, counted from
+    # its engage date; deals older than every won cycle (and prospects) start
+    # a fresh cycle today
+    age = np.nan_to_num(inputs["age"][deal], nan=-1.0)
+    cycles = model.cycles
+    first = np.searchsorted(cycles, age, side="right")
+    overdue = (first >= len(cycles)) | (age < 0)
+    first = np.where(overdue, 0, first)
+    cycle = cycles[first + (rng.random(len(deal)) * (len(cycles) - first)).astype(np.int64)]
+    remaining = np.where(overdue, cycle, cycle - age)
+
+    # calendar month of the simulated close date, counted from first_month
+    close = np.datetime64(pd.Timestamp(as_of).normalize(), "D") + remaining.astype(np.int64)
+    month = (close.astype("datetime64[M]") - first_month(as_of)).astype(np.int64)
+    month = np.clip(month, 0, horizon)
+
+    flat = (trial * n_cells + cells[deal]) * (horizon + 1) + month
+    return np.bincount(flat, weights=value, minlength=trials * n_cells * (horizon + 1))
+
+
+def simulate(model, deals, as_of, cells, n_cells, trials=FORECAST_TRIALS, seed=FORECAST_SEED,
+             horizon=HORIZON_MONTHS, chunk_cells=CHUNK_CELLS, workers=None):
+    """
+    Monte Carlo revenue of the open `deals`: an array (trials, n_cells,
+    horizon + 1) where the last month collects everything closing later.
+    Deals are simulated in chunks of at most `chunk_cells` deal x trial draws
+    on a thread pool; every chunk has its own child seed, so results only
+    depend on `seed` and the chunk size.
+    """
+    inputs = model.deal_inputs(deals, as_of)
+    size = max(1, chunk_cells // max(trials, 1))
+    starts = range(0, len(deals), size)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    def run(args):
+        start, child = args
+        part = {name: values[start:start + size] for name, values in inputs.items()}
+        return _simulate_chunk(model, part, cells[start:start + size], n_cells, trials, child, horizon, as_of)
+
+    total = np.zeros(trials * n_cells * (horizon + 1))
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 2, thread_name_prefix="forecast") as pool:
+        for part in pool.map(run, zip(starts, seeds)):
+            total += part
+    return total.reshape(trials, n_cells, horizon + 1)
+
+
+def forecast_frame(model, deals, as_of, trials=FORECAST_TRIALS, seed=FORECAST_SEED, horizon=HORIZON_MONTHS):
+    """
+    P10 / P50 / P90 and mean revenue of the open `deals` by close month and
+    region (office_location), plus an "All regions" row per month and a
+    "Horizon" month summing each trial over the forecast months.
+    """
+    codes, regions = pd.factorize(deals["office_location"], sort=True)
+    runs = simulate(model, deals, as_of, codes, len(regions), trials, seed, horizon)
+    runs = np.concatenate([runs, runs.sum(axis=1, keepdims=True)], axis=1)
+    runs = np.concatenate([runs, runs[:, :, :horizon].sum(axis=2, keepdims=True)], axis=2)
+    names = list(regions) + ["All regions"]
+
+    first = pd.Period(first_month(as_of), freq="M")
+    months = [(first + i).strftime("%b %Y") for i in range(horizon)] + ["Later", "Horizon"]
+    qs = np.percentile(runs, PERCENTILES, axis=0)          # (percentile, region, month)
+    return pd.DataFrame({
+        "region": np.repeat(names, len(months)),
+        "month": np.tile(months, len(names)),
+        "month_index": np.tile(np.arange(len(months)), len(names)),
+        "mean": runs.mean(axis=0).ravel(),
+        **{f"p{q}": qs[i].ravel() for i, q in enumerate(PERCENTILES)},
+    })
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# stages a deal moves through on the way to a win; Lost is a drop-off
+FUNNEL_STAGES = ["Prospecting", "Engaging", "Won"]
+
+# drop-off breakdowns of the executive page: label -> enriched column
+FUNNEL_GROUPS = {"Product": "product", "Sales Agent": "sales_agent", "Region": "office_location"}
+
+
+# ----------------------------
+# STAGE HISTORIES
+# ----------------------------
+def stage_histories(df):
+    """
+    One row per (opportunity, stage entered): every deal starts as a prospect,
+    enters Engaging on its engage date and Won / Lost on its close date. Rows
+    are ordered by opportunity, then stage; `opp` is the row position in df.
+    """
+    n = len(df)
+    engaged = df["engage_date"].notna().to_numpy()
+    closed = df["deal_stage"].isin(["Won", "Lost"]).to_numpy()
+    engage = df["engage_date"].to_numpy(dtype="datetime64[ns]")
+    close = df["close_date"].to_numpy(dtype="datetime64[ns]")
+    nat = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    parts = [
+        (np.arange(n), np.zeros(n, dtype=np.int8), nat, engage),
+        (np.flatnonzero(engaged), np.ones(engaged.sum(), dtype=np.int8), engage[engaged], close[engaged]),
+        (np.flatnonzero(closed), np.where(df["deal_stage"].to_numpy()[closed] == "Won", 2, 3).astype(np.int8),
+         close[closed], nat[closed]),
+    ]
+    opp, stage, entered, left = (np.concatenate(cols) for cols in zip(*parts))
+    order = np.lexsort((stage, opp))
+    history = pd.DataFrame({
+        "opp": opp[order],
+        "stage": pd.Categorical.from_codes(stage[order], ["Prospecting", "Engaging", "Won", "Lost"]),
+        "entered": entered[order],
+        "left": left[order],
+    })
+    history["days"] = (history["left"] - history["entered"]).dt.days
+    # stage the deal moved on to, NaN while it is still in this stage
+    history["exit"] = history.groupby("opp", sort=False)["stage"].shift(-1)
+    return history
+
+
+class StageFunnel:
+    """
+    Conversion, drop-off and time in stage over the stage histories of a
+    fact table. `transitions` are the stage changes observed between daily
+    exports (history.load_transitions), None when no history is recorded.
+    """
+
+    def __init__(self, df, groups=FUNNEL_GROUPS.values(), transitions=None):
+        self.history = stage_histories(df)
+        self.size = len(df)
+        self.ids = df["opportunity_id"].to_numpy()
+        self.transitions = transitions
+        for col in groups:
+            self.history[col] = df[col].to_numpy()[self.history["opp"].to_numpy()]
+
+    def _selected(self, rows):
+        if rows is None:
+            return self.history
+        keep = np.zeros(self.size, dtype=bool)
+        keep[np.asarray(rows)] = True
+        return self.history[keep[self.history["opp"].to_numpy()]]
+
+    @staticmethod
+    def _aggregate(history, by):
+        exit_ = history["exit"]
+        history = history.assign(
+            advanced=exit_.isin(["Engaging", "Won"]),
+            lost=exit_.eq("Lost"),
+            still_open=exit_.isna() & history["stage"].isin(["Prospecting", "Engaging"]),
+        )
+        return history.groupby(by, observed=False).agg(
+            deals=("opp", "size"),
+            advanced=("advanced", "sum"),
+            lost=("lost", "sum"),
+            still_open=("still_open", "sum"),
+            median_days=("days", "median"),
+        )
+
+    def funnel(self, rows=None):
+        """Per funnel stage: deals that reached it, moved on, were lost or are still in it."""
+        out = self._aggregate(self._selected(rows), "stage").reindex(FUNNEL_STAGES).reset_index()
+        out["conversion"] = out["advanced"] / out["deals"].where(out["deals"] > 0) * 100
+        out.loc[out["stage"] == "Won", ["advanced", "conversion"]] = np.nan
+        return out
+
+    def by_group(self, col, rows=None):
+        """Engage rate, win rate of engaged deals, drop-off and engaging days per `col` value."""
+        stats = self._aggregate(self._selected(rows), [col, "stage"])
+        # an empty selection has no stage columns to unstack into
+        stats = stats.unstack("stage").reindex(
+            columns=pd.MultiIndex.from_product([stats.columns, self.history["stage"].cat.categories]))
+        deals = stats[("deals", "Prospecting")]
+        engaged = stats[("deals", "Engaging")]
+        out = pd.DataFrame({
+            "deals": deals,
+            "engaged": engaged,
+            "won": stats[("deals", "Won")],
+            "lost": stats[("deals", "Lost")],
+            "engage_rate": engaged / deals.where(deals > 0) * 100,
+            "win_rate": stats[("deals", "Won")] / engaged.where(engaged > 0) * 100,
+            "drop_off": stats[("deals", "Lost")] / engaged.where(engaged > 0) * 100,
+            "median_engaging_days": stats[("median_days", "Engaging")],
+        })
+        return out[out["deals"] > 0].reset_index().sort_values("win_rate", ascending=False)
+
+    def observed(self, rows=None):
+        """Stage moves seen in the recorded exports of the selected deals, None without a history."""
+        if self.transitions is None:
+            return None
+        moves = self.transitions
+        if rows is not None:
+            moves = moves[moves["opportunity_id"].isin(self.ids[np.asarray(rows)])]
+        return (moves.groupby(["from_stage", "to_stage"])
+                .agg(deals=("opportunity_id", "size"), median_days=("days_in_stage", "median"))
+                .reset_index()
+                .sort_values("deals", ascending=False))
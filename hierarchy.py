@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# additive 360 columns rolled up at every node; rates are derived per node
+ROLLUP_MEASURES = [
+    "total_opportunities", "won_opportunities", "lost_opportunities", "open_opportunities", "revenue_won",
+]
+
+# page -> (360 table, levels from the root down, label of the root)
+HIERARCHIES = {
+    "agent": ("sales_agent_360", ["regional_office", "manager", "sales_agent"], "All regions"),
+    "account": ("account_360", ["subsidiary_of", "account"], "All parent companies"),
+}
+
+
+# ----------------------------
+# HIERARCHY ROLLUP
+# ----------------------------
+class HierarchyRollup:
+    """
+    Additive measures at every node of a level hierarchy over a 360 table.
+
+    Leaves (table rows) are ordered by their path, so every node covers one
+    contiguous run of leaves and its totals are a difference of two prefix
+    sums. The node ranges and the unfiltered prefix sums are built once per
+    data version; a filtered selection costs one cumsum over the leaves.
+    A node is addressed by its path, e.g. ("Central", "Melvin Marxen").
+    """
+
+    def __init__(self, df, levels, measures=ROLLUP_MEASURES, root_label="All"):
+        self.levels = list(levels)
+        self.measures = list(measures)
+        self.root_label = root_label
+        self.integer = [col for col in self.measures if pd.api.types.is_integer_dtype(df[col])] + ["members"]
+
+        paths = df[self.levels].astype(str)
+        self.order = np.lexsort([paths[col].to_numpy() for col in reversed(self.levels)])
+        leaves = paths.iloc[self.order].reset_index(drop=True)
+        # a trailing column of ones counts the leaves selected under a node
+        self.values = np.column_stack([df[self.measures].to_numpy(dtype="float64"), np.ones(len(df))])[self.order]
+
+        # path -> (first leaf, end leaf) for every prefix of every leaf path
+        self.ranges = {(): (0, len(leaves))}
+        self.children_of = {(): []}
+        for depth in range(1, len(self.levels) + 1):
+            for i, path in enumerate(zip(*(leaves[col] for col in self.levels[:depth]))):
+                if path in self.ranges:
+                    self.ranges[path] = (self.ranges[path][0], i + 1)
+                else:
+                    self.ranges[path] = (i, i + 1)
+                    self.children_of[path[:-1]].append(path)
+                    self.children_of[path] = []
+        self.totals = self.prefix()
+
+    def prefix(self, rows=None):
+        """Prefix sums over the leaves; `rows` are the selected table positions, None for all."""
+        values = self.values
+        if rows is not None:
+            keep = np.zeros(len(self.order), dtype=bool)
+            keep[np.asarray(rows, dtype=np.intp)] = True
+            values = values * keep[self.order][:, None]
+        out = np.zeros((len(values) + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=out[1:])
+        return out
+
+    def node(self, path, totals=None):
+        """Measures of one node as a dict, plus its member count and derived win rate."""
+        totals = self.totals if totals is None else totals
+        lo, hi = self.ranges[tuple(path)]
+        out = dict(zip(self.measures + ["members"], totals[hi] - totals[lo]))
+        closed = out.get("won_opportunities", 0) + out.get("lost_opportunities", 0)
+        out["win_rate"] = out["won_opportunities"] / closed * 100 if closed else 0.0
+        return out
+
+    def children(self, path=(), totals=None):
+        """One row per child of `path` with selected members; empty below the leaves."""
+        path = tuple(path)
+        level = self.levels[min(len(path), len(self.levels) - 1)]
+        columns = [level] + self.measures + ["members", "win_rate"]
+        if len(path) >= len(self.levels):
+            return pd.DataFrame(columns=columns)
+        rows = [{level: child[-1], **self.node(child, totals)} for child in self.children_of[path]]
+        out = pd.DataFrame(rows, columns=columns)
+        out = out[out["members"] > 0].reset_index(drop=True)
+        for col in self.integer:
+            out[col] = out[col].astype("int64")
+        return out
+
+    def breadcrumbs(self, path):
+        """(label, path) pairs from the root down to `path`."""
+        path = tuple(path)
+        return [(self.root_label, ())] + [(path[i - 1], path[:i]) for i in range(1, len(path) + 1)]
+
+    def level_name(self, path):
+        # name of the level the children of `path` belong to
+        return self.levels[len(path)] if len(path) < len(self.levels) else None
+
+    def valid(self, path):
+        return tuple(path) in self.ranges
+
+
+def build_hierarchies(tables):
+    return {
+        page: HierarchyRollup(tables[table], levels, root_label=root)
+        for page, (table, levels, root) in HIERARCHIES.items()
+    }
@@ -0,0 +1,306 @@
+import argparse
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_model
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+HISTORY_PATH = os.environ.get("CRM_HISTORY_PATH", os.path.join("history", "sales_pipeline.npz"))
+# CRM_HISTORY=0 stops the dashboard from recording each export it parses
+HISTORY_ENABLED = os.environ.get("CRM_HISTORY", "1") == "1"
+
+KEY = "opportunity_id"
+# tracked pipeline columns by encoding; a change row stores all of them
+CODED_COLUMNS = ["sales_agent", "product", "account", "deal_stage"]
+DATE_COLUMNS = ["engage_date", "close_date"]
+VALUE_COLUMNS = ["close_value"]
+
+# day sentinel of a missing date; code -1 is a missing dictionary value
+NO_DAY = np.iinfo(np.int32).min
+
+
+def _days(dates):
+    values = pd.Series(dates).to_numpy(dtype="datetime64[D]")
+    out = values.astype(np.int64)
+    out[np.isnat(values)] = NO_DAY
+    return out.astype(np.int32)
+
+
+def _dates(days):
+    values = days.astype(np.int64).astype("datetime64[D]")
+    values[days == NO_DAY] = np.datetime64("NaT")
+    return pd.DatetimeIndex(values.astype("datetime64[ns]"))
+
+
+# ----------------------------
+# HISTORY STORE
+# ----------------------------
+class HistoryStore:
+    """
+    Per-opportunity change log of daily sales_pipeline.csv exports.
+
+    Appending a snapshot keeps only the rows that differ from the previous
+    one: new opportunities, changed ones (full tracked row) and removed ones.
+    Strings are dictionary coded (stages share one small dictionary, seeded
+    with STAGE_ORDER), dates are days, and the log is ordered by (day, opp)
+    so on disk the days and the opportunity codes within a day are stored as
+    deltas. Any day's snapshot is the last change of every opportunity up to
+    that day, one binary search and one unique over the log.
+    """
+
+    def __init__(self):
+        self.ids = np.array([], dtype=object)
+        self._codes = {}
+        self.dictionaries = {col: [] for col in CODED_COLUMNS}
+        self.dictionaries["deal_stage"] = list(data_model.STAGE_ORDER)
+        self.snapshot_days = np.array([], dtype=np.int32)
+        self.log = {
+            "day": np.array([], dtype=np.int32),
+            "opp": np.array([], dtype=np.int32),
+            "removed": np.array([], dtype=bool),
+            **{col: np.array([], dtype=np.int32) for col in CODED_COLUMNS + DATE_COLUMNS},
+            **{col: np.array([], dtype="float64") for col in VALUE_COLUMNS},
+        }
+        self._lock = threading.Lock()
+
+    # ---- encoding ----
+    def _encode(self, frame):
+        """Tracked columns of an export as code / day / value arrays, opp codes first."""
+        # parse everything that can fail before the id map and dictionaries grow
+        rows = {col: _days(frame[col]) for col in DATE_COLUMNS}
+        for col in VALUE_COLUMNS:
+            rows[col] = frame[col].to_numpy(dtype="float64", na_value=np.nan)
+        ids = frame[KEY].astype(str).to_numpy(dtype=object)
+        new = [i for i in pd.unique(ids) if i not in self._codes]
+        for i in new:
+            self._codes[i] = len(self._codes)
+        self.ids = np.concatenate([self.ids, np.array(new, dtype=object)])
+        rows["opp"] = np.fromiter((self._codes[i] for i in ids), dtype=np.int32, count=len(ids))
+        for col in CODED_COLUMNS:
+            dictionary = self.dictionaries[col]
+            known = {value: code for code, value in enumerate(dictionary)}
+            values = frame[col].to_numpy(dtype=object)
+            for value in pd.unique(values[pd.notna(values)]):
+                if value not in known:
+                    known[value] = len(dictionary)
+                    dictionary.append(value)
+            rows[col] = np.array([known.get(v, -1) if pd.notna(v) else -1 for v in values], dtype=np.int32)
+        return rows
+
+    @staticmethod
+    def _validate(frame):
+        missing = [col for col in [KEY] + CODED_COLUMNS + DATE_COLUMNS + VALUE_COLUMNS if col not in frame]
+        if missing:
+            raise ValueError(f"export is missing columns: {', '.join(missing)}")
+        if frame[KEY].isna().any() or frame[KEY].duplicated().any():
+            raise ValueError(f"export has missing or duplicated {KEY} values")
+
+    def _state(self, upto):
+        # positions in the log of the latest change of every opportunity
+        end = int(np.searchsorted(self.log["day"], upto, side="right"))
+        opp = self.log["opp"][:end][::-1]
+        _, last = np.unique(opp, return_index=True)
+        return end - 1 - last
+
+    # ---- writes ----
+    def append(self, day, frame):
+        """Record the export of `day` (after every recorded day); returns the number of change rows."""
+        day = int(_days([day])[0])
+        self._validate(frame)
+        with self._lock:
+            if len(self.snapshot_days) and day <= self.snapshot_days[-1]:
+                raise ValueError("snapshots must be appended in date order")
+            # a rejected export leaves the store untouched: encode only once it is valid
+            rows = self._encode(frame)
+            n = len(self.ids)
+
+            # previous state per opportunity code; never seen counts as removed
+            seen = np.zeros(n, dtype=bool)
+            prev = {}
+            pos = self._state(day)
+            live = pos[~self.log["removed"][pos]]
+            seen[self.log["opp"][live]] = True
+            for col in CODED_COLUMNS + DATE_COLUMNS + VALUE_COLUMNS:
+                prev[col] = np.zeros(n, dtype=self.log[col].dtype)
+                prev[col][self.log["opp"][live]] = self.log[col][live]
+
+            opp = rows["opp"]
+            changed = ~seen[opp]
+            for col in CODED_COLUMNS + DATE_COLUMNS:
+                changed |= prev[col][opp] != rows[col]
+            for col in VALUE_COLUMNS:
+                a, b = prev[col][opp], rows[col]
+                changed |= ~((a == b) | (np.isnan(a) & np.isnan(b)))
+
+            present = np.zeros(n, dtype=bool)
+            present[opp] = True
+            gone = np.flatnonzero(seen & ~present).astype(np.int32)
+
+            add = {col: values[changed] for col, values in rows.items()}
+            add["opp"] = np.concatenate([add["opp"], gone])
+            for col in CODED_COLUMNS + DATE_COLUMNS + VALUE_COLUMNS:
+                add[col] = np.concatenate([add[col], prev[col][gone]])
+            add["removed"] = np.r_[np.zeros(changed.sum(), dtype=bool), np.ones(len(gone), dtype=bool)]
+            add["day"] = np.full(len(add["opp"]), day, dtype=np.int32)
+
+            order = np.argsort(add["opp"], kind="stable")
+            for col in self.log:
+                self.log[col] = np.concatenate([self.log[col], add[col][order]])
+            self.snapshot_days = np.append(self.snapshot_days, np.int32(day))
+            return len(order)
+
+    # ---- reads ----
+    def materialize(self, date):
+        """The pipeline export as of `date`, columns as data_model.read_sales_pipeline returns them."""
+        pos = self._state(int(_days([date])[0]))
+        pos = np.sort(pos[~self.log["removed"][pos]])
+        out = {KEY: self.ids[self.log["opp"][pos]]}
+        for col in CODED_COLUMNS:
+            codes = self.log[col][pos]
+            values = np.array(self.dictionaries[col] + [np.nan], dtype=object)
+            out[col] = values[np.where(codes < 0, len(values) - 1, codes)]
+        for col in DATE_COLUMNS:
+            out[col] = _dates(self.log[col][pos])
+        for col in VALUE_COLUMNS:
+            out[col] = self.log[col][pos]
+        frame = pd.DataFrame(out)
+        return frame[[KEY] + CODED_COLUMNS + DATE_COLUMNS + VALUE_COLUMNS]
+
+    def transitions(self):
+        """One row per stage change: opportunity, day, from / to stage and days spent in the old stage."""
+        log = self.log
+        order = np.lexsort((log["day"], log["opp"]))
+        opp, day, stage = log["opp"][order], log["day"][order], log["deal_stage"][order]
+        stage = np.where(log["removed"][order], -2, stage)
+        same_opp = np.r_[False, opp[1:] == opp[:-1]]
+        moved = same_opp & np.r_[False, stage[1:] != stage[:-1]]
+
+        # day each row's stage was entered: carried forward from its first row
+        entered_at = np.flatnonzero(~same_opp | np.r_[True, stage[1:] != stage[:-1]])
+        entered = day[entered_at][np.searchsorted(entered_at, np.arange(len(day)), side="right") - 1]
+
+        names = np.array(self.dictionaries["deal_stage"] + ["(removed)", None], dtype=object)
+        at = np.flatnonzero(moved)
+        return pd.DataFrame({
+            KEY: self.ids[opp[at]],
+            "date": _dates(day[at]),
+            "from_stage": names[stage[at - 1]],
+            "to_stage": names[stage[at]],
+            "days_in_stage": day[at] - entered[at - 1],
+        })
+
+    def transition_counts(self):
+        t = self.transitions()
+        return pd.crosstab(t["from_stage"], t["to_stage"])
+
+    # ---- disk ----
+    def save(self, path=HISTORY_PATH):
+        log = self.log
+        # days and opp codes are sorted within a day: store first differences
+        day_delta = np.diff(log["day"], prepend=np.int32(0)).astype(np.int32)
+        new_day = np.r_[True, log["day"][1:] != log["day"][:-1]] if len(log["day"]) else np.array([], dtype=bool)
+        opp_delta = np.where(new_day, log["opp"], np.diff(log["opp"], prepend=np.int32(0))).astype(np.int32)
+        arrays = {
+            "ids": self.ids.astype(str),
+            "snapshot_days": self.snapshot_days,
+            "day_delta": day_delta,
+            "opp_delta": opp_delta,
+            "removed": log["removed"],
+            **{f"dict_{col}": np.array(self.dictionaries[col], dtype=str) for col in CODED_COLUMNS},
+            **{col: log[col].astype(np.int16 if col == "deal_stage" else np.int32) for col in CODED_COLUMNS},
+            **{col: log[col] for col in DATE_COLUMNS + VALUE_COLUMNS},
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=HISTORY_PATH):
+        """The store saved at `path`, an empty one when there is none yet."""
+        store = cls()
+        if not os.path.exists(path):
+            return store
+        with np.load(path, allow_pickle=False) as data:
+            store.ids = data["ids"].astype(object)
+            store._codes = {i: code for code, i in enumerate(store.ids)}
+            store.snapshot_days = data["snapshot_days"]
+            day = np.cumsum(data["day_delta"], dtype=np.int64).astype(np.int32)
+            new_day = np.r_[True, day[1:] != day[:-1]] if len(day) else np.array([], dtype=bool)
+            # undo the within-day opp deltas: cumulative sum restarted on each new day
+            opp_delta = data["opp_delta"].astype(np.int64)
+            total = np.cumsum(opp_delta)
+            start = np.flatnonzero(new_day)
+            offset = np.repeat(total[start] - opp_delta[start], np.diff(np.r_[start, len(day)]))
+            store.log = {
+                "day": day,
+                "opp": (total - offset).astype(np.int32),
+                "removed": data["removed"],
+                **{col: data[col].astype(np.int32) for col in CODED_COLUMNS + DATE_COLUMNS},
+                **{col: data[col] for col in VALUE_COLUMNS},
+            }
+            for col in CODED_COLUMNS:
+                store.dictionaries[col] = data[f"dict_{col}"].tolist()
+        return store
+
+
+def record_export(frame, date=None, path=None):
+    """
+    Append the export of `date` (today by default) to the store at `path`
+    unless that day is already recorded. Returns the number of change rows,
+    None when the day was skipped.
+    """
+    path = path or HISTORY_PATH
+    date = pd.Timestamp(date) if date is not None else pd.Timestamp.today().normalize()
+    store = HistoryStore.load(path)
+    if len(store.snapshot_days) and _days([date])[0] <= store.snapshot_days[-1]:
+        return None
+    added = store.append(date, frame)
+    store.save(path)
+    return added
+
+
+def load_transitions(path=None):
+    """Stage changes recorded at `path`, None before two exports were recorded."""
+    store = HistoryStore.load(path or HISTORY_PATH)
+    if len(store.snapshot_days) < 2:
+        return None
+    return store.transitions()
+
+
+# ----------------------------
+# COMMAND LINE
+# ----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Delta-encoded history of daily sales_pipeline.csv exports.")
+    parser.add_argument("--path", default=HISTORY_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="append one daily export")
+    ingest.add_argument("csv", nargs="?", default=os.path.join(data_model.RESOURCE_DIR, "sales_pipeline.csv"))
+    ingest.add_argument("--date", default=None, help="export date, today by default")
+    show = commands.add_parser("show", help="stage counts of the snapshot on a date")
+    show.add_argument("date")
+    commands.add_parser("transitions", help="stage transition counts over the whole history")
+    args = parser.parse_args()
+
+    store = HistoryStore.load(args.path)
+    if args.command == "ingest":
+        date = pd.Timestamp(args.date) if args.date else pd.Timestamp.today().normalize()
+        added = store.append(date, data_model.read_sales_pipeline(args.csv))
+        store.save(args.path)
+        print(f"{date:%Y-%m-%d}: {added:,} change rows, {len(store.log['day']):,} in "
+              f"{len(store.snapshot_days)} snapshots, {os.path.getsize(args.path) / 1024:.0f} KiB on disk")
+    elif args.command == "show":
+        print(store.materialize(args.date)["deal_stage"].value_counts().to_string())
+    else:
+        print(store.transition_counts().to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from data_model import OPEN_STAGES
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# how the deals open on a past date ended up; "Open" are still open today
+OUTCOMES = ["Won", "Lost", "Open"]
+
+# cell dims of the executive page's index
+PIPELINE_DIMS = ["product", "office_location"]
+
+
+# ----------------------------
+# INTERVAL INDEX
+# ----------------------------
+class PipelineIntervals:
+    """
+    Open pipeline at any date from [engage_date, close_date) intervals.
+
+    A deal is open on day t when it was engaged on or before t and closes
+    after t (or has not closed). Per cell of `dims` x outcome, engage days
+    and close days are kept sorted under a composite key cell * span + day,
+    with prefix sums of `value` alongside. The open deals of any set of cells
+    on any set of days is then two binary searches per (cell, day) pair:
+    engaged up to t minus closed up to t. Deals without an engage date
+    (prospects) were never open on record and are left out.
+    """
+
+    def __init__(self, df, dims=PIPELINE_DIMS, value="sales_price"):
+        df = df[df["engage_date"].notna()]
+        self.origin = df["engage_date"].min().normalize()
+        self.last_date = max(df["engage_date"].max(), df["close_date"].max()).normalize()
+        self.n_days = (self.last_date - self.origin).days + 1
+        self.span = self.n_days + 1            # day n_days means "not closed yet"
+
+        outcome = df["deal_stage"].where(~df["deal_stage"].isin(OPEN_STAGES), "Open")
+        groups = pd.MultiIndex.from_arrays([df[d] for d in dims] + [outcome])
+        codes, cells = pd.factorize(groups, sort=True, use_na_sentinel=False)
+        self.dims = list(dims)
+        self.cells = pd.DataFrame(list(cells), columns=self.dims + ["outcome"])
+
+        start = (df["engage_date"] - self.origin).dt.days.to_numpy(dtype=np.int64)
+        end = (df["close_date"] - self.origin).dt.days.to_numpy(dtype="float64", na_value=np.nan)
+        end = np.where(np.isnan(end), self.n_days, end).astype(np.int64)
+        weights = df[value].to_numpy(dtype="float64", na_value=0)
+        self.starts, self.start_sums = self._sorted(codes * self.span + start, weights)
+        self.ends, self.end_sums = self._sorted(codes * self.span + end, weights)
+
+    @staticmethod
+    def _sorted(keys, weights):
+        order = np.argsort(keys, kind="stable")
+        sums = np.zeros(len(keys) + 1)
+        np.cumsum(weights[order], out=sums[1:])
+        return keys[order], sums
+
+    def select(self, filters=None):
+        """Positions of the cells matching {dim: values}; None keeps every cell."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, vals in (filters or {}).items():
+            if vals is not None and col in self.cells:
+                mask &= self.cells[col].isin(vals).to_numpy()
+        return np.flatnonzero(mask)
+
+    def day(self, date):
+        # grid offset of a date, clamped to the indexed days
+        return int(np.clip((pd.Timestamp(date).normalize() - self.origin).days, -1, self.n_days - 1))
+
+    def open_at(self, days, cells=None):
+        """(deals, value) arrays of shape (cells, days) open at the end of each day offset."""
+        cells = np.arange(len(self.cells)) if cells is None else np.asarray(cells)
+        base = cells[:, None] * self.span
+        upto = base + np.asarray(days)[None, :]
+
+        def through(keys, sums):
+            lo = np.searchsorted(keys, base, side="left")
+            hi = np.maximum(np.searchsorted(keys, upto, side="right"), lo)   # days before the origin
+            return hi - lo, sums[hi] - sums[lo]
+
+        engaged, engaged_value = through(self.starts, self.start_sums)
+        closed, closed_value = through(self.ends, self.end_sums)
+        return engaged - closed, engaged_value - closed_value
+
+    def snapshot(self, date, filters=None):
+        """Open deals and value at risk on `date` per eventual outcome."""
+        cells = self.select(filters)
+        deals, value = self.open_at([self.day(date)], cells)
+        out = pd.DataFrame({"outcome": self.cells["outcome"].to_numpy()[cells],
+                            "deals": deals[:, 0], "value": value[:, 0]})
+        out = out.groupby("outcome").sum().reindex(OUTCOMES, fill_value=0)
+        return out.reset_index()
+
+    def daily(self, filters=None):
+        """Open deals and value at risk at the end of every indexed day."""
+        cells = self.select(filters)
+        deals, value = self.open_at(np.arange(self.n_days), cells)
+        return pd.DataFrame({
+            "date": pd.date_range(self.origin, periods=self.n_days, freq="D"),
+            "deals": deals.sum(axis=0),
+            "value": value.sum(axis=0),
+        })
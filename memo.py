@@ -0,0 +1,134 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import queries
+import scheduler
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# memory budget for memoized filter results, shared by every session
+MEMO_MAX_MB = float(os.environ.get("CRM_MEMO_MAX_MB", "128"))
+
+
+def result_size(value):
+    """Approximate in-memory size of a view result in bytes."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+# ----------------------------
+# FILTER RESULT MEMO
+# ----------------------------
+class FilterMemo:
+    """
+    Process-wide LRU of computed page views keyed by
+    (page, data version, normalized filters, extra).
+
+    Filters must be normalized with `queries.normalize_filters`, so an empty
+    selection and "every value" share one entry. Entries are evicted least
+    recently used first once their total size exceeds `max_bytes`. Stored
+    results are shared between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes=MEMO_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(page, version, filters, *extra):
+        return (page, version, queries.filter_key(filters)) + extra
+
+    def get_or_compute(self, page, version, filters, compute, *extra, priority=scheduler.INTERACTIVE):
+        key = self.key(page, version, filters, *extra)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # computed outside the lock under admission control; sessions asking
+        # for the same key meanwhile wait for this result
+        def compute_and_store():
+            value = compute()
+            self.put(key, value)
+            return value
+
+        return scheduler.get_scheduler().run(key, priority, compute_and_store)
+
+    def put(self, key, value):
+        size = result_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def drop_version(self, keep):
+        # entries of replaced data versions are never hit again
+        with self._lock:
+            for key in [k for k in self._entries if k[1] != keep]:
+                self.bytes -= self._entries.pop(key)[1]
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self),
+            "mb": self.bytes / 1024 / 1024,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+
+_memo = None
+_memo_lock = threading.Lock()
+
+
+def get_memo():
+    # one memo per server process, shared by every session
+    global _memo
+    if _memo is None:
+        with _memo_lock:
+            if _memo is None:
+                _memo = FilterMemo()
+    return _memo
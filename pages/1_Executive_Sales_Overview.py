@@ -16,9 +16,26 @@ import numpy as np
 from PIL import Image
 import matplotlib.pyplot as plt
 import plotly.express as px
+import plotly.graph_objects as go
 from millify import millify
 import seaborn as sns
 
+import alerts
+import data_model
+import data_store
+import forecast
+import funnel
+import intervals
+import memo
+import quantiles
+import queries
+import rollup
+import sampling
+import scheduler
+import sketches
+import survival
+import usage
+
 # ----------------------------
 # PAGE SETUP
 # ----------------------------
@@ -101,6 +118,11 @@ st.markdown("""
     font-weight: bold;
     color:#1A2A40;
 }
+.kpi-delta {
+    font-size: 14px;
+    font-weight: 600;
+    color:#5a6a81;
+}
 </style>
 """, unsafe_allow_html=True)
 
@@ -131,15 +153,23 @@ with col_title:
 # --------------------------
 # LOAD DATA
 # --------------------------
-sales_pipeline = pd.read_csv('Resources/sales_pipeline.csv')
-sales_pipeline['close_date'] = pd.to_datetime(sales_pipeline['close_date'], format='%d-%m-%Y', errors="coerce")
-sales_pipeline['engage_date'] = pd.to_datetime(sales_pipeline['engage_date'], format='%d-%m-%Y', errors="coerce")
-accounts = pd.read_csv('Resources/accounts.csv')
-
-df = sales_pipeline.merge(accounts, on="account", how="inner")
-
-df["month_num"] = df["close_date"].dt.month
-df["month_name"] = df["close_date"].dt.month_name()
+def refinement_status(sampler, fraction):
+    # rerun the page as soon as a more precise sample is ready
+    if sampler.current().fraction != fraction:
+        st.rerun()
+    st.caption(f"⚡ Estimates from a {fraction:.0%} sample" + ("" if sampler.done else " · refining…"))
+
+
+# current data version, swapped in the background when Resources/ changes
+snapshot = data_store.get_store().current()
+df = snapshot.tables["enriched"]
+dropped = snapshot.tables["dropped"]
+
+if not dropped.empty:
+    st.warning(
+        f"⚠️ {len(dropped):,} pipeline rows have no matching account and are excluded "
+        f"({data_model.dropped_summary(dropped)})"
+    )
 
 
 # --------------------------
@@ -149,12 +179,11 @@ with st.sidebar:
 
     st.image("Resources/logo.jpeg", width=140)
 
+    st.caption(f"🗂 Data version {snapshot.label}")
+
     st.markdown("<div class='sidebar-title'>📊 FILTER PANEL</div>", unsafe_allow_html=True)
 
-    month_list = (df[['month_num','month_name']]
-                  .dropna().drop_duplicates()
-                  .sort_values('month_num')['month_name']
-                  .tolist())
+    month_list = data_model.month_year_options(df["close_date"])
 
     prod_list = sorted(df["product"].dropna().unique())
     region_list = sorted(df["office_location"].dropna().unique())
@@ -176,52 +205,106 @@ with st.sidebar:
     if not selected_regions:
         selected_regions = region_list
 
+    # DATE RANGES
+    engage_bounds = queries.date_bounds(df, "engage_date")
+    close_bounds = queries.date_bounds(df, "close_date")
+    st.markdown("<div class='sidebar-label'>🗓 Engage Date</div>", unsafe_allow_html=True)
+    engage_range = st.date_input("Engage Date", value=engage_bounds, min_value=engage_bounds[0], max_value=engage_bounds[1])
+    st.markdown("<div class='sidebar-label'>🗓 Close Date</div>", unsafe_allow_html=True)
+    close_range = st.date_input("Close Date", value=close_bounds, min_value=close_bounds[0], max_value=close_bounds[1])
+
+    # PERIOD COMPARISON
+    st.markdown("<div class='sidebar-label'>📆 Compare KPIs</div>", unsafe_allow_html=True)
+    comparison = st.selectbox("Compare KPIs", list(rollup.COMPARISONS))
+
+    # DISTINCT COUNTS
+    exact_distinct = st.checkbox("Exact distinct counts", value=sketches.EXACT_DISTINCT)
+    if not exact_distinct:
+        st.caption(f"Distinct counts are HyperLogLog estimates (±{sketches.standard_error():.1%} std. error)")
+
+    # APPROXIMATE MODE
+    approximate = st.toggle("⚡ Approximate mode", value=st.session_state.get("approximate_mode", False))
+    st.session_state["approximate_mode"] = approximate
+    if approximate:
+        sampler = snapshot.get("enriched_sampler")
+        sample = sampler.current()
+        st.fragment(run_every=None if sampler.done else 2)(refinement_status)(sampler, sample.fraction)
+
 
 
 # --------------------------
 # FILTER DATA
 # --------------------------
-filtered = df[
-    (df["month_name"].isin(selected_months)) &
-    (df["product"].isin(selected_products)) &
-    (df["office_location"].isin(selected_regions))
-]
-
-open_df = df[df['deal_stage'].isin(['Prospecting','Engaging'])]
-
-open_filtered = open_df[
-    (open_df["product"].isin(selected_products)) &
-    (open_df["office_location"].isin(selected_regions))
-]
+# results are memoized across sessions per (data version, normalized filters);
+# approximate mode reads a weighted stratified sample instead of the full table
+filters = queries.normalize_filters(
+    {"month_year": selected_months, "product": selected_products, "office_location": selected_regions},
+    {"month_year": month_list, "product": prod_list, "office_location": region_list},
+)
+# date ranges are two binary searches on the snapshot's sorted date indexes
+filters.update(queries.normalize_ranges({"engage_date": engage_range, "close_date": close_range}, df))
+results = memo.get_memo()
+
+if approximate:
+    view = results.get_or_compute(
+        "executive", snapshot.version, filters,
+        lambda: queries.executive_sample_view(snapshot, sample, filters, exact_distinct),
+        exact_distinct, sample.fraction)
+    filtered = sample.expanded().iloc[view["rows"]]
+else:
+    usage.get_tracker().record("executive", filters, exact_distinct)
+    view = results.get_or_compute(
+        "executive", snapshot.version, filters,
+        lambda: queries.executive_view(snapshot, filters, exact_distinct),
+        exact_distinct)
+    filtered = df.iloc[view["rows"]]
 
 
 
 # --------------------------
 # KPI CALCULATIONS
 # --------------------------
-Total_Revenue = df['close_value'].sum()
-Total_Revenue_Display = "$" + millify(Total_Revenue, precision=2)
-
-total_opps = pd.concat([filtered, open_filtered])["opportunity_id"].nunique()
-won_opps = filtered[filtered["deal_stage"]=="Won"]["opportunity_id"].nunique()
-lost_opps = filtered[filtered["deal_stage"]=="Lost"]["opportunity_id"].nunique()
-open_opps = len(open_filtered)
-win_rate = (won_opps / total_opps * 100) if total_opps > 0 else 0
-avg_deal_value = filtered.loc[filtered["deal_stage"]=="Won","close_value"].mean()
-avg_sales_cycle = (filtered["close_date"] - filtered["engage_date"]).dt.days.mean()
-active_customers = accounts["account"].nunique()
+kpis = view["kpis"]
+# period-over-period deltas read the calendar rollup index, O(1) per card
+deltas = queries.executive_deltas(snapshot, filters, comparison)
+delta = lambda kpi, points=False: rollup.format_delta(deltas[kpi], comparison, points)
+active_customers = kpis["active_customers"]
+# date ranges count distinct values exactly
+approx = "" if exact_distinct or queries.has_ranges(filters) else "≈"
+
+if approximate:
+    fmt_count = lambda v: f"{v:,.0f}"
+
+    Total_Revenue_Display = sampling.format_estimate(kpis["revenue"], lambda v: "$" + millify(v, precision=2))
+    total_opps_display = sampling.format_estimate(kpis["total_opps"], fmt_count)
+    won_opps_display = sampling.format_estimate(kpis["won_opps"], fmt_count)
+    open_opps_display = sampling.format_estimate(kpis["open_opps"], fmt_count)
+    lost_opps_display = sampling.format_estimate(kpis["lost_opps"], fmt_count)
+    win_rate_display = sampling.format_estimate(kpis["win_rate"], lambda v: f"{v:.2f}%")
+    avg_deal_value_display = sampling.format_estimate(kpis["avg_deal_value"], lambda v: f"${v:,.0f}")
+    avg_sales_cycle_display = sampling.format_estimate(kpis["avg_sales_cycle"], lambda v: f"{v:.0f} days")
+else:
+    Total_Revenue_Display = "$" + millify(kpis["revenue"], precision=2)
+    total_opps_display = f"{kpis['total_opps']:,}"
+    won_opps_display = f"{kpis['won_opps']:,}"
+    open_opps_display = f"{kpis['open_opps']:,}"
+    lost_opps_display = f"{kpis['lost_opps']:,}"
+    win_rate_display = f"{kpis['win_rate']:.2f}%"
+    avg_deal_value_display = f"${kpis['avg_deal_value']:,.0f}"
+    avg_sales_cycle_display = f"{kpis['avg_sales_cycle']:.0f} days"
 
 
 
 # --------------------------
 # KPI CARD FUNCTION
 # --------------------------
-def kpi_card(title, value):
+def kpi_card(title, value, delta=""):
     st.markdown(
         f"""
         <div class="kpi-box">
             <div class="kpi-title">{title}</div>
             <div class="kpi-value">{value}</div>
+            <div class="kpi-delta">{delta}</div>
         </div>
         """,
         unsafe_allow_html=True
@@ -233,19 +316,29 @@ def kpi_card(title, value):
 # KPI GRID
 # --------------------------
 k1,k2,k3 = st.columns(3)
-with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display)
-with k2: kpi_card("📁 Total Opps", f"{total_opps:,}")
-with k3: kpi_card("🏆 Won Opps", f"{won_opps:,}")
+with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display, delta("revenue"))
+with k2: kpi_card("📁 Total Opps", total_opps_display, delta("total_opps"))
+with k3: kpi_card("🏆 Won Opps", won_opps_display, delta("won_opps"))
 
 k4,k5,k6 = st.columns(3)
-with k4: kpi_card("📂 Open Opps", f"{open_opps:,}")
-with k5: kpi_card("❌ Lost Opps", f"{lost_opps:,}")
-with k6: kpi_card("📈 Win Rate %", f"{win_rate:.2f}%")
+with k4: kpi_card("📂 Open Opps", open_opps_display)
+with k5: kpi_card("❌ Lost Opps", lost_opps_display, delta("lost_opps"))
+with k6: kpi_card("📈 Win Rate %", win_rate_display, delta("win_rate", points=True))
 
 k7,k8,k9 = st.columns(3)
-with k7: kpi_card("💵 Avg Deal Value", f"${avg_deal_value:,.0f}")
-with k8: kpi_card("👥 Active Customers", f"{active_customers:,}")
-with k9: kpi_card("⏱ Avg Sales Cycle", f"{avg_sales_cycle:.0f} days")
+with k7: kpi_card("💵 Avg Deal Value", avg_deal_value_display, delta("avg_deal_value"))
+with k8: kpi_card("👥 Active Customers", f"{approx}{active_customers:,}")
+with k9: kpi_card("⏱ Avg Sales Cycle", avg_sales_cycle_display)
+
+# percentiles merge the quantile sketches of the selected cube cells
+spread = results.get_or_compute(
+    "distribution", snapshot.version, filters, lambda: queries.distribution_view(snapshot, filters))
+k10,k11 = st.columns(2)
+with k10: kpi_card("💵 Deal Value P50 · P90 · P99", queries.format_percentiles(
+    spread["close_value"], lambda v: "$" + millify(v, precision=1)))
+with k11: kpi_card("⏱ Sales Cycle P50 · P90 · P99", queries.format_percentiles(
+    spread["sales_cycle_days"], lambda v: f"{v:.0f}") + " days")
+st.caption(f"Percentiles are sketch estimates within ±{quantiles.RELATIVE_ACCURACY:.0%} of the exact value")
 
 
 
@@ -258,16 +351,11 @@ with k9: kpi_card("⏱ Avg Sales Cycle", f"{avg_sales_cycle:.0f} days")
 # ------------------------------------------
 st.markdown("## 📈 Monthly Revenue Trend")
 
-monthly = (
-    filtered.groupby(["month_num", "month_name"])["close_value"]
-    .sum()
-    .reset_index()
-    .sort_values("month_num")
-)
+monthly = view["monthly"]
 
 fig = px.line(
     monthly,
-    x="month_name",
+    x="month_year",
     y="close_value",
     markers=True,
     title="Monthly Revenue Trend",
@@ -288,26 +376,24 @@ st.plotly_chart(fig, use_container_width=True)
 # 🔻 OPPORTUNITY STAGE FUNNEL
 # ------------------------------------------
 
-st.markdown("## 🔻 Opportunity Stage Distribution Funnel")
-
-stage = (
-    df.groupby("deal_stage")["opportunity_id"]
-    .count()
-    .reset_index()
-)
+st.markdown("## 🔻 Opportunity Stage Funnel")
 
-order = ["Prospecting", "Engaging", "Lost", "Won"]
-stage["deal_stage"] = pd.Categorical(stage["deal_stage"], categories=order, ordered=True)
-stage = stage.sort_values("deal_stage")
+drop_label = st.selectbox("Drop-off by", list(funnel.FUNNEL_GROUPS))
+funnel_filters = {col: filters.get(col) for col in queries.FUNNEL_FILTERS}
+stages = results.get_or_compute(
+    "funnel", snapshot.version, funnel_filters,
+    lambda: queries.funnel_view(snapshot, funnel_filters, funnel.FUNNEL_GROUPS[drop_label]),
+    drop_label)
+stage = stages["funnel"]
 
 fig = px.funnel(
     stage,
-    y="deal_stage",
-    x="opportunity_id",
-    color="deal_stage",
+    y="stage",
+    x="deals",
+    color="stage",
     title="Opportunity Funnel",
     color_discrete_sequence=[
-        "#4B77BE", "#5DADE2", "#F5B041", "#27AE60"
+        "#4B77BE", "#5DADE2", "#27AE60"
     ]
 )
 
@@ -320,6 +406,40 @@ fig.update_layout(
 
 st.plotly_chart(fig, use_container_width=True)
 
+prospecting, engaging = stage.iloc[0], stage.iloc[1]
+f1, f2, f3 = st.columns(3)
+with f1: kpi_card("➡️ Prospect → Engaged", f"{prospecting['conversion']:.1f}%" if pd.notna(prospecting["conversion"]) else "–")
+with f2: kpi_card("🏆 Engaged → Won", f"{engaging['conversion']:.1f}%" if pd.notna(engaging["conversion"]) else "–")
+with f3: kpi_card("⏱ Median Days Engaging", f"{engaging['median_days']:.0f}" if pd.notna(engaging["median_days"]) else "–")
+st.caption(
+    f"{int(engaging['lost']):,} engaged deals lost, {int(engaging['still_open']):,} still engaging and "
+    f"{int(prospecting['still_open']):,} still prospecting. Month and close date filters do not apply."
+)
+
+groups = stages["groups"]
+fig = px.bar(
+    groups,
+    x=funnel.FUNNEL_GROUPS[drop_label],
+    y=["win_rate", "drop_off"],
+    barmode="group",
+    hover_data=["deals", "engaged", "won", "lost", "engage_rate", "median_engaging_days"],
+    title=f"Win Rate and Drop-off of Engaged Deals by {drop_label}",
+    color_discrete_sequence=["#2F8F83", "#E07A5F"]
+)
+fig.update_layout(xaxis_title=drop_label, yaxis_title="% of Engaged Deals", legend_title="")
+st.plotly_chart(fig, use_container_width=True)
+
+observed = stages["observed"]
+if observed is None:
+    st.caption("Observed stage moves appear here once the history holds two daily exports.")
+else:
+    st.markdown("#### Observed Stage Moves")
+    st.dataframe(
+        observed.rename(columns={"from_stage": "From", "to_stage": "To", "deals": "Deals",
+                                 "median_days": "Median Days in Stage"}),
+        hide_index=True, use_container_width=True)
+    st.caption("Stage changes between the recorded daily exports of the selected deals.")
+
 
 # ------------------------------------------
 # 📦 REVENUE BY PRODUCT
@@ -327,12 +447,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("## 📦 Revenue Contribution by Product")
 
-prod = (
-    filtered.groupby("product")["close_value"]
-    .sum()
-    .reset_index()
-    .sort_values('close_value')
-)
+prod = view["prod"]
 
 fig = px.bar(
     prod,
@@ -357,12 +472,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("## 📂 Revenue Contribution by Sector")
 
-sect = (
-    filtered.groupby('sector')["close_value"]
-    .sum()
-    .reset_index()
-    .sort_values('close_value', ascending=True)
-)
+sect = view["sect"]
 
 fig = px.bar(
     sect,
@@ -388,11 +498,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("## 🌍 Revenue by Region")
 
-region = (
-    filtered.groupby("office_location")["close_value"]
-    .sum()
-    .reset_index()
-)
+region = view["region"]
 
 fig = px.bar(
     region,
@@ -417,14 +523,7 @@ st.plotly_chart(fig, use_container_width=True)
 
 st.markdown("## 🏢 Top 10 Accounts by Revenue")
 
-acc = (
-    filtered.groupby("account")["close_value"]
-    .sum()
-    .reset_index()
-    .sort_values("close_value", ascending=False)
-    .head(10)
-    .sort_values("close_value", ascending=True)
-)
+acc = view["top_accounts"]
 
 fig = px.bar(
     acc,
@@ -444,7 +543,192 @@ fig.update_layout(
 st.plotly_chart(fig, use_container_width=True)
 
 
+# ------------------------------------------
+# 📊 DEAL SIZE AND CYCLE DISTRIBUTIONS
+# ------------------------------------------
+
+st.markdown("## 📊 Deal Size and Sales-Cycle Distributions")
+
+for value, label in [("close_value", "Won Deal Value"), ("sales_cycle_days", "Sales Cycle (Days)")]:
+    hist = spread[value + "_hist"]
+    fig = px.bar(
+        hist,
+        x=(hist["start"] + hist["end"]) / 2,
+        y="deals",
+        title=f"{label} Distribution",
+        color="deals",
+        color_continuous_scale=["#C8EAE2", "#2F8F83"]
+    )
+    for p, q in spread[value].items():
+        if pd.notna(q):
+            fig.add_vline(x=q, line_dash="dash", annotation_text=p.upper())
+    fig.update_layout(xaxis_title=label, yaxis_title="Deals", bargap=0.05)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# ------------------------------------------
+# 🗓️ PIPELINE AS OF A DATE
+# ------------------------------------------
+
+st.markdown("## 🗓️ Pipeline As Of")
+
+pipeline_index = snapshot.get("pipeline_intervals")
+as_of = st.date_input(
+    "As of date",
+    value=pipeline_index.last_date.date(),
+    min_value=pipeline_index.origin.date(),
+    max_value=pipeline_index.last_date.date(),
+)
+as_of_mix = queries.pipeline_as_of(snapshot, filters, as_of)
+p1, p2 = st.columns(2)
+with p1: kpi_card("📂 Open Deals", f"{as_of_mix['deals'].sum():,}")
+with p2: kpi_card("💼 Value at Risk (list price)", "$" + millify(as_of_mix["value"].sum(), precision=2))
+st.caption(
+    "Deals engaged on or before the date and not yet closed, split by how they ended up. "
+    "Prospects have no engage date and are not counted."
+)
+
+fig = px.bar(
+    as_of_mix,
+    x="outcome",
+    y="deals",
+    hover_data=["value"],
+    title=f"Open Deals on {as_of:%d %b %Y} by Outcome",
+    color="outcome",
+    color_discrete_map={"Won": "#2F8F83", "Lost": "#E07A5F", "Open": "#5e82ff"}
+)
+fig.update_layout(xaxis_title="Outcome", yaxis_title="Deals", showlegend=False)
+st.plotly_chart(fig, use_container_width=True)
+
+# one daily series per filter, every point two binary searches per cell
+open_daily = results.get_or_compute(
+    "pipeline_daily", snapshot.version, {col: filters.get(col) for col in intervals.PIPELINE_DIMS},
+    lambda: queries.pipeline_daily(snapshot, filters))
+fig = px.line(open_daily, x="date", y="deals", title="Open Pipeline by Day", hover_data=["value"])
+fig.add_vline(x=pd.Timestamp(as_of), line_dash="dash")
+fig.update_layout(xaxis_title="Date", yaxis_title="Open Deals")
+st.plotly_chart(fig, use_container_width=True)
+
+
+# ------------------------------------------
+# 🔮 OPEN PIPELINE FORECAST
+# ------------------------------------------
+
+st.markdown("## 🔮 Open Pipeline Forecast")
+
+# Monte Carlo over every open deal, memoized per product / region selection
+forecast_filters = {col: filters.get(col) for col in queries.FORECAST_FILTERS}
+outlook = results.get_or_compute(
+    "forecast", snapshot.version, forecast_filters,
+    lambda: queries.forecast_view(snapshot, forecast_filters),
+    priority=scheduler.BULK)
+bands = outlook["bands"]
+st.caption(
+    f"{outlook['deals']:,} open deals simulated {forecast.FORECAST_TRIALS:,} times from "
+    f"{outlook['as_of']:%d %b %Y}; win rates by product and agent, values and sales cycles "
+    f"from closed deals. Prospects are assumed to engage at the historical "
+    f"{outlook['engage_rate']:.0%} prospect-to-engaged conversion before they can win. "
+    f"Month and date filters do not apply to open deals."
+)
+
+overall = bands[(bands["region"] == "All regions") & (bands["month"] != "Horizon")]
+fig = go.Figure([
+    go.Scatter(x=overall["month"], y=overall["p90"], name="P90", line=dict(width=0)),
+    go.Scatter(x=overall["month"], y=overall["p10"], name="P10 – P90", line=dict(width=0),
+               fill="tonexty", fillcolor="rgba(47, 143, 131, 0.3)"),
+    go.Scatter(x=overall["month"], y=overall["p50"], name="P50", line=dict(color="#2F8F83", width=3)),
+])
+fig.update_layout(title="Forecast Revenue by Close Month", xaxis_title="Close Month", yaxis_title="Revenue")
+st.plotly_chart(fig, use_container_width=True)
+
+by_region = (
+    bands[(bands["region"] != "All regions") & (bands["month"] == "Horizon")]
+    .sort_values("p50", ascending=False)
+)
+fig = px.bar(
+    by_region,
+    x="region",
+    y="p50",
+    error_y=by_region["p90"] - by_region["p50"],
+    error_y_minus=by_region["p50"] - by_region["p10"],
+    title=f"Forecast Revenue by Region, next {forecast.HORIZON_MONTHS} months (P50, P10 – P90)",
+    color="p50",
+    color_continuous_scale=["#C8EAE2", "#2F8F83"]
+)
+fig.update_layout(xaxis_title="Region", yaxis_title="Revenue")
+st.plotly_chart(fig, use_container_width=True)
+
+# ------------------------------------------
+# ⏳ SALES-CYCLE SURVIVAL
+# ------------------------------------------
+
+st.markdown("## ⏳ Sales-Cycle Survival")
+
+group_label = st.selectbox("Survival by", list(survival.SURVIVAL_GROUPS))
+survival_filters = {col: filters.get(col) for col in queries.SURVIVAL_FILTERS}
+cycles = results.get_or_compute(
+    "survival", snapshot.version, survival_filters,
+    lambda: queries.survival_view(snapshot, survival_filters, survival.SURVIVAL_GROUPS[group_label]),
+    group_label)
+
+all_deals = cycles["overall"]
+if all_deals is not None and pd.notna(all_deals["median_days"]):
+    st.caption(
+        f"Kaplan–Meier median cycle {all_deals['median_days']:.0f} days over {all_deals['deals']:,} engaged deals, "
+        f"{all_deals['censored']:,} still open and counted as censored. The average sales cycle card only "
+        f"averages closed deals."
+    )
+
+fig = px.line(
+    cycles["curves"],
+    x="days",
+    y="survival",
+    color="group",
+    line_shape="hv",
+    title=f"Share of Deals Still Open by {group_label}",
+)
+fig.update_layout(xaxis_title="Days Since Engagement", yaxis_title="Still Open", yaxis_tickformat=".0%")
+st.plotly_chart(fig, use_container_width=True)
+
+medians = cycles["medians"]
+fig = px.bar(
+    medians,
+    x="group",
+    y="median_days",
+    title=f"Median Sales Cycle by {group_label} (Kaplan–Meier)",
+    hover_data=["deals", "closed", "censored"],
+    color="median_days",
+    color_continuous_scale=["#C8EAE2", "#2F8F83"]
+)
+fig.update_layout(xaxis_title=group_label, yaxis_title="Median Days")
+st.plotly_chart(fig, use_container_width=True)
+
+# ------------------------------------------
+# 🚨 ALERTS
+# ------------------------------------------
+
+st.markdown("## 🚨 Alerts")
+
+flagged = queries.alerts_view(snapshot, filters)
+st.caption(
+    f"Days and weeks whose revenue, won deals or win rate sit more than {alerts.ALERT_THRESHOLD:g} robust "
+    f"deviations from their EWMA baseline, overall and per region and product, over the last "
+    f"{alerts.RECENT_DAYS} days. Detectors update as each data version closes a period; month and date "
+    f"filters do not apply."
+)
+if flagged.empty:
+    st.info("No unusual days or weeks in the selection.")
+else:
+    st.dataframe(
+        flagged.assign(period=flagged["period"].dt.strftime("%d %b %Y")).round({"value": 1, "expected": 1, "z": 1}),
+        use_container_width=True,
+        hide_index=True,
+    )
+
 
 st.subheader("📄 Raw Data")
-st.dataframe(filtered)
+if approximate:
+    st.caption("Sampled rows, close_value is weighted up to the full pipeline")
+# raw tables are bulk work, admitted after interactive KPI / chart reruns
+scheduler.get_scheduler().run(None, scheduler.BULK, lambda: st.dataframe(filtered))
 
@@ -13,6 +13,15 @@ import plotly.express as px
 
 from millify import millify
 
+import data_model
+import data_store
+import memo
+import queries
+import rollup
+import sampling
+import scheduler
+import usage
+
 
 # ----------------------------
 # PAGE SETUP
@@ -97,6 +106,11 @@ st.markdown("""
     font-weight: bold;
     color:#1A2A40;
 }
+.kpi-delta {
+    font-size: 14px;
+    font-weight: 600;
+    color:#5a6a81;
+}
 </style>
 """, unsafe_allow_html=True)
 
@@ -126,24 +140,22 @@ with col_title:
 # ----------------------------
 # LOAD DATA
 # ----------------------------
-account360 = pd.read_csv("Resources/account_360.csv")
-account360['first_engage_date'] = pd.to_datetime(account360['first_engage_date'], format='%d-%m-%Y')
-account360['last_close_date'] = pd.to_datetime(account360['last_close_date'], format='%d-%m-%Y')
+# current data version, swapped in the background when Resources/ changes
+snapshot = data_store.get_store().current()
+account360 = queries.entity_table(snapshot, "account_360")
 
-account360['month_num'] = account360['first_engage_date'].dt.month
-account360['month_name'] = account360['first_engage_date'].dt.month_name()
+
+def refinement_status(sampler, fraction):
+    # rerun the page as soon as a more precise sample is ready
+    if sampler.current().fraction != fraction:
+        st.rerun()
+    st.caption(f"⚡ Estimates from a {fraction:.0%} sample" + ("" if sampler.done else " · refining…"))
 
 
 # ----------------------------
 # CREATE SLICER LISTS
 # ----------------------------
-month_list = (
-    account360[['month_num','month_name']]
-    .dropna()
-    .drop_duplicates()
-    .sort_values("month_num")["month_name"]
-    .tolist()
-)
+month_list = data_model.month_year_options(account360["first_engage_date"])
 
 account_list = sorted(account360['account'].dropna().unique())
 sector_list = sorted(account360['sector'].dropna().unique())
@@ -156,6 +168,8 @@ with st.sidebar:
 
     st.image("Resources/logo.jpeg", width=140)
 
+    st.caption(f"🗂 Data version {snapshot.label}")
+
     st.markdown("<div class='sidebar-title'>📊 FILTER PANEL</div>", unsafe_allow_html=True)
 
     # ------------------ MONTH SLICER ------------------
@@ -166,7 +180,13 @@ with st.sidebar:
 
     # ------------------ ACCOUNT SLICER ------------------
     st.markdown("<div class='sidebar-label'>🏢 Select Account</div>", unsafe_allow_html=True)
-    selected_account = st.multiselect("Select Account", account_list)
+    # only the selection and the top matches of the search go to the browser
+    account_query = st.text_input("Search Account", placeholder="Type to search…")
+    account_chosen = st.session_state.get("account_selection", [])
+    selected_account = st.multiselect(
+        "Select Account", queries.typeahead_options(snapshot, "account", account_query, account_chosen),
+        default=account_chosen)
+    st.session_state["account_selection"] = selected_account
     if not selected_account:
         selected_account = account_list
 
@@ -176,44 +196,91 @@ with st.sidebar:
     if not selected_sector:
         selected_sector = sector_list
 
+    # ------------------ AS OF SLICERS ------------------
+    engage_bounds = queries.date_bounds(account360, "first_engage_date")
+    close_bounds = queries.date_bounds(account360, "last_close_date")
+    st.markdown("<div class='sidebar-label'>🗓 First Engaged</div>", unsafe_allow_html=True)
+    engage_range = st.date_input("First Engaged", value=engage_bounds, min_value=engage_bounds[0], max_value=engage_bounds[1])
+    st.markdown("<div class='sidebar-label'>🗓 Last Closed</div>", unsafe_allow_html=True)
+    close_range = st.date_input("Last Closed", value=close_bounds, min_value=close_bounds[0], max_value=close_bounds[1])
+
+    # ------------------ PERIOD COMPARISON ------------------
+    st.markdown("<div class='sidebar-label'>📆 Compare KPIs</div>", unsafe_allow_html=True)
+    comparison = st.selectbox("Compare KPIs", list(rollup.COMPARISONS))
+
+    # ------------------ APPROXIMATE MODE ------------------
+    approximate = st.toggle("⚡ Approximate mode", value=st.session_state.get("approximate_mode", False))
+    st.session_state["approximate_mode"] = approximate
+    if approximate:
+        sampler = snapshot.get("pipeline_sampler")
+        sample = sampler.current()
+        st.fragment(run_every=None if sampler.done else 2)(refinement_status)(sampler, sample.fraction)
+
 
 # ----------------------------
 # APPLY FILTERS
 # ----------------------------
-filtered = account360[
-    account360["month_name"].isin(selected_months) &
-    account360["sector"].isin(selected_sector) &
-    account360["account"].isin(selected_account)
-]
+# memoized across sessions per (data version, normalized filters)
+filters = queries.normalize_filters(
+    {"month_year": selected_months, "account": selected_account, "sector": selected_sector},
+    {"month_year": month_list, "account": account_list, "sector": sector_list},
+)
+filters.update(queries.normalize_ranges(
+    {"first_engage_date": engage_range, "last_close_date": close_range}, account360))
+results = memo.get_memo()
+usage.get_tracker().record("account", filters)
+view = results.get_or_compute("account", snapshot.version, filters,
+                              lambda: queries.account_view(snapshot, filters))
+filtered = account360.iloc[view["rows"]]
+
+if filtered.empty:
+    st.warning("No accounts match the selected filters.")
+    st.stop()
 
 
 # ----------------------------
 # KPI VALUES
 # ----------------------------
-Total_Revenue = account360['revenue_won'].sum()
-Total_Revenue_Display = "$" + millify(Total_Revenue, precision=2)
-
-Total_Opportunities = filtered['total_opportunities'].sum()
-Open_Opportunities = filtered['open_opportunities'].sum()
-Won_Opportunities = filtered['won_opportunities'].sum()
-Lost_Opportunities = filtered['lost_opportunities'].sum()
-
-Win_Rate = (Won_Opportunities / Total_Opportunities * 100) if Total_Opportunities > 0 else 0
-
-Product_sold = filtered['distinct_products_sold'].sum()
-Active_Customers = len(filtered)
-avg_deal_value = filtered['avg_win_deal_value'].mean()
+kpis = view["kpis"]
+# period-over-period deltas of the selected accounts from the calendar rollup index
+deltas = queries.entity_deltas(snapshot, "account", "account", filtered["account"], comparison)
+delta = lambda kpi, points=False: rollup.format_delta(deltas[kpi], comparison, points)
+Total_Revenue_Display = "$" + millify(kpis["revenue"], precision=2)
+Product_sold = kpis["products_sold"]
+Active_Customers = kpis["active_customers"]
+
+# approximate mode: opportunity KPIs estimated from the pipeline sample
+if approximate:
+    est = results.get_or_compute(
+        "account_sample", snapshot.version, filters,
+        lambda: queries.entity_sample_kpis(sample, "account", filtered["account"]),
+        sample.fraction)
+    fmt_count = lambda v: millify(round(v), 2)
+
+    Total_Revenue_Display = sampling.format_estimate(est["revenue"], lambda v: "$" + millify(v, precision=2))
+    Total_Opportunities_Display = sampling.format_estimate(est["total_opps"], fmt_count)
+    Open_Opportunities_Display = sampling.format_estimate(est["open_opps"], fmt_count)
+    Lost_Opportunities_Display = sampling.format_estimate(est["lost_opps"], fmt_count)
+    Win_Rate_Display = sampling.format_estimate(est["win_rate"], lambda v: f"{v:.2f}%")
+    avg_deal_value_Display = sampling.format_estimate(est["avg_deal_value"], lambda v: "$" + millify(v, 2))
+else:
+    Total_Opportunities_Display = millify(kpis["total_opps"], 2)
+    Open_Opportunities_Display = millify(kpis["open_opps"], 2)
+    Lost_Opportunities_Display = millify(kpis["lost_opps"], 2)
+    Win_Rate_Display = f"{kpis['win_rate']:.2f}%"
+    avg_deal_value_Display = "$" + millify(kpis["avg_deal_value"], 2)
 
 
 # ----------------------------
 # KPI CARD FUNCTION
 # ----------------------------
-def kpi_card(title, value):
+def kpi_card(title, value, delta=""):
     st.markdown(
         f"""
         <div class="kpi-box">
             <div class="kpi-title">{title}</div>
             <div class="kpi-value">{value}</div>
+            <div class="kpi-delta">{delta}</div>
         </div>
         """,
         unsafe_allow_html=True
@@ -224,21 +291,65 @@ def kpi_card(title, value):
 # KPI DISPLAY GRID
 # ----------------------------
 k1, k2, k3 = st.columns(3)
-with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display)
-with k2: kpi_card("📁 Total Opportunities", millify(Total_Opportunities, 2))
-with k3: kpi_card("📂 Open Opportunities", millify(Open_Opportunities, 2))
+with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display, delta("revenue"))
+with k2: kpi_card("📁 Total Opportunities", Total_Opportunities_Display, delta("total_opps"))
+with k3: kpi_card("📂 Open Opportunities", Open_Opportunities_Display)
 
 k4, k5, k6 = st.columns(3)
-with k4: kpi_card("🏆 Win Rate", f"{Win_Rate:.2f}%")
-with k5: kpi_card("❌ Lost Opportunities", millify(Lost_Opportunities, 2))
+with k4: kpi_card("🏆 Win Rate", Win_Rate_Display, delta("win_rate", points=True))
+with k5: kpi_card("❌ Lost Opportunities", Lost_Opportunities_Display, delta("lost_opps"))
 with k6: kpi_card("📦 Total Products Sold", millify(Product_sold, 2))
 
 k7, k8, k9 = st.columns(3)
 with k7: kpi_card("👥 Active Customers", millify(Active_Customers, 2))
-with k8: kpi_card("💵 Avg Deal Value", "$" + millify(avg_deal_value, 2))
+with k8: kpi_card("💵 Avg Deal Value", avg_deal_value_Display, delta("avg_deal_value"))
 with k9: kpi_card("📅 Periods Shown", ", ".join(selected_months))
 
 
+
+# ------------------------------------------
+# PARENT COMPANY DRILL-DOWN
+# ------------------------------------------
+# node totals come from the hierarchy rollup; every visited node is memoized,
+# so breadcrumb jumps back up are cache hits
+st.subheader("🧭 Parent Company Drill-down")
+
+path = st.session_state.get("account_path", ())
+drill = results.get_or_compute("account_tree", snapshot.version, filters,
+                               lambda: queries.drilldown_view(snapshot, "account", view["rows"], path), path)
+path = st.session_state["account_path"] = drill["path"]
+
+crumb_cols = st.columns(len(drill["crumbs"]) + 1)
+for col, (label, crumb) in zip(crumb_cols, drill["crumbs"]):
+    if col.button(label, key=f"account_crumb_{len(crumb)}", disabled=crumb == path):
+        st.session_state["account_path"] = crumb
+        st.rerun()
+
+node = drill["node"]
+st.caption(
+    f"{millify(node['revenue_won'], 2)} revenue · {int(node['total_opportunities']):,} opportunities · "
+    f"{node['win_rate']:.2f}% win rate"
+)
+
+children = drill["children"]
+if drill["level"] is not None and not children.empty:
+    level = drill["level"]
+    fig = px.bar(children.sort_values('revenue_won'),
+                 x = 'revenue_won',
+                 y = level,
+                 orientation = 'h',
+                 text = 'members',
+                 title = f"Revenue by {level.replace('_', ' ')}",
+                 color_discrete_sequence=px.colors.qualitative.Set2)
+    st.plotly_chart(fig, use_container_width=True)
+
+    child = st.selectbox(f"Drill into {level.replace('_', ' ')}", ["—"] + children[level].tolist(),
+                         key=f"account_drill_{'/'.join(path)}")
+    if child != "—":
+        st.session_state["account_path"] = path + (child,)
+        st.rerun()
+
+
 # ------------------------------------------
 # VISUALS
 # ------------------------------------------
@@ -249,8 +360,7 @@ with k9: kpi_card("📅 Periods Shown", ", ".join(selected_months))
 # ------------------------------------------
 
 
-sector_dominance = (filtered.groupby(['office_location','sector'])['revenue_won']
-                    .sum().reset_index())
+sector_dominance = view["sector_dominance"]
 fig = px.bar(sector_dominance,
              x = 'office_location',
              y = 'revenue_won',
@@ -267,9 +377,7 @@ st.plotly_chart(fig, use_container_width=True)
 # ------------------------------------------
 
 
-rev_acc = (filtered.groupby('subsidiary_of')['revenue_won']
-            .sum().reset_index().sort_values('revenue_won',ascending = False)
-            .head(10).sort_values('revenue_won',ascending = True))
+rev_acc = view["rev_acc"]
 fig = px.bar(rev_acc,
              x = 'revenue_won',
              y = 'subsidiary_of',
@@ -285,9 +393,7 @@ st.plotly_chart(fig, use_container_width=True)
 # ------------------------------------------
 
 
-opp_acc= (filtered.groupby('account')[['won_opportunities','lost_opportunities','open_opportunities']]
-          .sum().reset_index().sort_values('won_opportunities',ascending = False).head(10).sort_values('won_opportunities',ascending = True)
-         )
+opp_acc = view["opp_acc"]
 
 opp_long = opp_acc.melt(
     id_vars='account',
@@ -316,13 +422,7 @@ st.plotly_chart(fig, use_container_width=True)
 # ------------------------------------------
 
 
-win_rate_sector = (filtered.groupby('sector')
-                   .agg(
-                       total = ('total_opportunities',"sum"),
-                       won = ('won_opportunities',"sum")
-                        ).reset_index()
-                    )
-win_rate_sector['win_rate'] = (win_rate_sector['won']/win_rate_sector['total'] * 100).round(2)
+win_rate_sector = view["win_rate_sector"]
 fig = px.bar(win_rate_sector,
              x = 'sector',
              y = 'win_rate',
@@ -350,12 +450,7 @@ st.plotly_chart(fig, use_container_width=True)
 # AVG SALES CYCLE BY SECTOR
 # ------------------------------------------
 
-avg_sales_cycle = (
-    filtered.groupby('sector')['avg_sales_cycle_days']
-    .mean()
-    .reset_index()
-    .sort_values('avg_sales_cycle_days',ascending= False)   # optional sort
-)
+avg_sales_cycle = view["avg_sales_cycle"]
 
 
 fig = px.line(
@@ -383,7 +478,7 @@ st.plotly_chart(fig, use_container_width=True)
 # ------------------------------------------
 # Avg deal value by sector 
 # ------------------------------------------
-sec_deal = (filtered.groupby('sector')['avg_win_deal_value'].mean().reset_index())
+sec_deal = view["sec_deal"]
 
 fig = px.line(
     sec_deal,
@@ -411,4 +506,5 @@ st.plotly_chart(fig,use_container_width= True)
 # ------------------------------------------
 
 st.subheader("📄 Raw Data")
-st.dataframe(account360)
+# raw tables are bulk work, admitted after interactive KPI / chart reruns
+scheduler.get_scheduler().run(None, scheduler.BULK, lambda: st.dataframe(account360))
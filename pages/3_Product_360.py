@@ -20,6 +20,16 @@ import plotly.express as px
 
 from millify import millify
 
+import data_model
+import data_store
+import memo
+import queries
+import rollup
+import sampling
+import scheduler
+import sketches
+import usage
+
 
 # ----------------------------
 # PAGE SETUP
@@ -104,6 +114,11 @@ st.markdown("""
     font-weight: bold;
     color:#1A2A40;
 }
+.kpi-delta {
+    font-size: 14px;
+    font-weight: 600;
+    color:#5a6a81;
+}
 </style>
 """, unsafe_allow_html=True)
 
@@ -133,25 +148,23 @@ with col_title:
 # ----------------------------
 # LOAD DATA
 # ----------------------------
-pr360 = pd.read_csv("Resources/product_360.csv")
-pr360['first_engage_date'] = pd.to_datetime(pr360['first_engage_date'],format = '%d-%m-%Y')
-pr360['last_close_date']= pd.to_datetime(pr360['last_close_date'],format = '%d-%m-%Y')
+# current data version, swapped in the background when Resources/ changes
+snapshot = data_store.get_store().current()
+pr360 = queries.entity_table(snapshot, "product_360")
 
-pr360['month_num'] = pr360['first_engage_date'].dt.month
-pr360['month_name'] = pr360['first_engage_date'].dt.month_name()
+
+def refinement_status(sampler, fraction):
+    # rerun the page as soon as a more precise sample is ready
+    if sampler.current().fraction != fraction:
+        st.rerun()
+    st.caption(f"⚡ Estimates from a {fraction:.0%} sample" + ("" if sampler.done else " · refining…"))
 
 
 # ----------------------------
 # CREATE SLICER LISTS
 # ----------------------------
 
-month_list = (
-    pr360[['month_num','month_name']]
-    .dropna()
-    .drop_duplicates()
-    .sort_values("month_num")["month_name"]
-    .tolist()
-)
+month_list = data_model.month_year_options(pr360["first_engage_date"])
 
 product_list = sorted(pr360['product'].dropna().unique())
 series_list = sorted(pr360['series'].dropna().unique())
@@ -164,6 +177,8 @@ with st.sidebar:
 
     st.image("Resources/logo.jpeg", width=140)
 
+    st.caption(f"🗂 Data version {snapshot.label}")
+
     st.markdown("<div class='sidebar-title'>📊 FILTER PANEL</div>", unsafe_allow_html=True)
 
     # ------------------ MONTH SLICER ------------------
@@ -185,45 +200,93 @@ with st.sidebar:
     if not selected_series:
         selected_series = series_list
 
+    # ------------------ AS OF SLICERS ------------------
+    engage_bounds = queries.date_bounds(pr360, "first_engage_date")
+    close_bounds = queries.date_bounds(pr360, "last_close_date")
+    st.markdown("<div class='sidebar-label'>🗓 First Engaged</div>", unsafe_allow_html=True)
+    engage_range = st.date_input("First Engaged", value=engage_bounds, min_value=engage_bounds[0], max_value=engage_bounds[1])
+    st.markdown("<div class='sidebar-label'>🗓 Last Closed</div>", unsafe_allow_html=True)
+    close_range = st.date_input("Last Closed", value=close_bounds, min_value=close_bounds[0], max_value=close_bounds[1])
+
+    # ------------------ PERIOD COMPARISON ------------------
+    st.markdown("<div class='sidebar-label'>📆 Compare KPIs</div>", unsafe_allow_html=True)
+    comparison = st.selectbox("Compare KPIs", list(rollup.COMPARISONS))
+
+    # ------------------ APPROXIMATE MODE ------------------
+    approximate = st.toggle("⚡ Approximate mode", value=st.session_state.get("approximate_mode", False))
+    st.session_state["approximate_mode"] = approximate
+    if approximate:
+        sampler = snapshot.get("pipeline_sampler")
+        sample = sampler.current()
+        st.fragment(run_every=None if sampler.done else 2)(refinement_status)(sampler, sample.fraction)
+
 
 
 # ----------------------------
 # APPLY FILTERS
 # ----------------------------
-filtered = pr360[
-    pr360["month_name"].isin(selected_months) &
-    pr360["product"].isin(selected_product) &
-    pr360['series'].isin(selected_series)
-]
+# memoized across sessions per (data version, normalized filters)
+filters = queries.normalize_filters(
+    {"month_year": selected_months, "product": selected_product, "series": selected_series},
+    {"month_year": month_list, "product": product_list, "series": series_list},
+)
+filters.update(queries.normalize_ranges(
+    {"first_engage_date": engage_range, "last_close_date": close_range}, pr360))
+results = memo.get_memo()
+usage.get_tracker().record("product", filters)
+view = results.get_or_compute("product", snapshot.version, filters,
+                              lambda: queries.product_view(snapshot, filters))
+filtered = pr360.iloc[view["rows"]]
+
+if filtered.empty:
+    st.warning("No products match the selected filters.")
+    st.stop()
 
 
 # ----------------------------
 # KPI VALUES
 # ----------------------------
-Total_Revenue = pr360['revenue_won'].sum()
-Total_Revenue_Display = "$" + millify(Total_Revenue, precision=2)
-
-Total_Opportunities = filtered['total_opportunities'].sum()
-Open_Opportunities = filtered['open_opportunities'].sum()
-Won_Opportunities = filtered['won_opportunities'].sum()
-Lost_Opportunities = filtered['lost_opportunities'].sum()
-
-Win_Rate = (Won_Opportunities / Total_Opportunities * 100) if Total_Opportunities > 0 else 0
-
-Customer_per_Product = filtered['distinct_accounts'].mean()
-Avg_Sales_Cycle = filtered['avg_sales_cycle_days'].mean()
-avg_deal_value = filtered['avg_win_deal_value'].mean()
-Product_Count = filtered['product'].nunique()
+kpis = view["kpis"]
+# period-over-period deltas of the selected products from the calendar rollup index
+deltas = queries.entity_deltas(snapshot, "product", "product", filtered["product"], comparison)
+delta = lambda kpi, points=False: rollup.format_delta(deltas[kpi], comparison, points)
+Total_Revenue_Display = "$" + millify(kpis["revenue"], precision=2)
+Accounts_Reached = kpis["accounts_reached"]
+Product_Count = kpis["product_count"]
+
+# approximate mode: opportunity KPIs estimated from the pipeline sample
+if approximate:
+    est = results.get_or_compute(
+        "product_sample", snapshot.version, filters,
+        lambda: queries.entity_sample_kpis(sample, "product", filtered["product"]),
+        sample.fraction)
+    fmt_count = lambda v: millify(round(v), 2)
+
+    Total_Revenue_Display = sampling.format_estimate(est["revenue"], lambda v: "$" + millify(v, precision=2))
+    Total_Opportunities_Display = sampling.format_estimate(est["total_opps"], fmt_count)
+    Open_Opportunities_Display = sampling.format_estimate(est["open_opps"], fmt_count)
+    Lost_Opportunities_Display = sampling.format_estimate(est["lost_opps"], fmt_count)
+    Win_Rate_Display = sampling.format_estimate(est["win_rate"], lambda v: f"{v:.2f}%")
+    avg_deal_value_Display = sampling.format_estimate(est["avg_deal_value"], lambda v: "$" + millify(v, 2))
+    Avg_Sales_Cycle_Display = sampling.format_estimate(est["avg_sales_cycle"], lambda v: millify(v, 2))
+else:
+    Total_Opportunities_Display = millify(kpis["total_opps"], 2)
+    Open_Opportunities_Display = millify(kpis["open_opps"], 2)
+    Lost_Opportunities_Display = millify(kpis["lost_opps"], 2)
+    Win_Rate_Display = f"{kpis['win_rate']:.2f}%"
+    avg_deal_value_Display = "$" + millify(kpis["avg_deal_value"], 2)
+    Avg_Sales_Cycle_Display = millify(kpis["avg_sales_cycle"], 2)
 
 # ----------------------------
 # KPI CARD FUNCTION
 # ----------------------------
-def kpi_card(title, value):
+def kpi_card(title, value, delta=""):
     st.markdown(
         f"""
         <div class="kpi-box">
             <div class="kpi-title">{title}</div>
             <div class="kpi-value">{value}</div>
+            <div class="kpi-delta">{delta}</div>
         </div>
         """,
         unsafe_allow_html=True
@@ -234,20 +297,28 @@ def kpi_card(title, value):
 # KPI DISPLAY GRID
 # ----------------------------
 k1, k2, k3 = st.columns(3)
-with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display)
-with k2: kpi_card("📁 Total Opportunities", millify(Total_Opportunities, 2))
-with k3: kpi_card("📂 Open Opportunities", millify(Open_Opportunities, 2))
+with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display, delta("revenue"))
+with k2: kpi_card("📁 Total Opportunities", Total_Opportunities_Display, delta("total_opps"))
+with k3: kpi_card("📂 Open Opportunities", Open_Opportunities_Display)
 
 k4, k5, k6 = st.columns(3)
-with k4: kpi_card("🏆 Win Rate", f"{Win_Rate:.2f}%")
-with k5: kpi_card("❌ Lost Opportunities", millify(Lost_Opportunities, 2))
-with k6: kpi_card("📦 Average Sales Cycle", millify(Avg_Sales_Cycle, 2))
+with k4: kpi_card("🏆 Win Rate", Win_Rate_Display, delta("win_rate", points=True))
+with k5: kpi_card("❌ Lost Opportunities", Lost_Opportunities_Display, delta("lost_opps"))
+with k6: kpi_card("📦 Average Sales Cycle", Avg_Sales_Cycle_Display)
 
 k7, k8, k9 = st.columns(3)
-with k7: kpi_card("👥 Customer Per Product", millify(Customer_per_Product, 2))
-with k8: kpi_card("💵 Avg Deal Value", "$" + millify(avg_deal_value, 2))
+with k7: kpi_card("👥 Customers Reached", ("" if sketches.EXACT_DISTINCT else "≈") + f"{Accounts_Reached:,}")
+with k8: kpi_card("💵 Avg Deal Value", avg_deal_value_Display, delta("avg_deal_value"))
 with k9: kpi_card("📅 Total Product", (Product_Count))
 
+# percentiles merge the quantile sketches of the selected entities
+spread = view["spread"]
+k10, k11 = st.columns(2)
+with k10: kpi_card("💵 Deal Value P50 · P90 · P99", queries.format_percentiles(
+    spread["close_value"], lambda v: "$" + millify(v, precision=1)))
+with k11: kpi_card("⏱ Sales Cycle P50 · P90 · P99", queries.format_percentiles(
+    spread["sales_cycle_days"], lambda v: f"{v:.0f}") + " days")
+
 
 
 # ------------------------------------------
@@ -260,8 +331,7 @@ with k9: kpi_card("📅 Total Product", (Product_Count))
 # Product Revenue
 # ------------------------------------------
 
-product_revenue = (filtered.groupby(['product'])['revenue_won'].sum().reset_index())
-product_revenue ['rev_fmt'] = product_revenue['revenue_won'].apply(lambda x: millify(x,precision = 1))
+product_revenue = view["product_revenue"]
 
 fig = px.bar(product_revenue,
              x = 'product',
@@ -276,9 +346,7 @@ st.plotly_chart(fig,use_container_width= True)
 # no of opportunities per product
 # ------------------------------------------
  
-opp_prod = (filtered.groupby('product')[['won_opportunities','lost_opportunities','open_opportunities']]
-          .sum().reset_index().sort_values('won_opportunities',ascending = False).head(10).sort_values('won_opportunities',ascending = True)
-         )
+opp_prod = view["opp_prod"]
 
 opp_long = opp_prod.melt(
         id_vars= 'product',
@@ -304,7 +372,7 @@ st.plotly_chart(fig,use_container_width= True)
 # Avg deal value per product
 # ------------------------------------------
 
-avg_del = (filtered.groupby('product')['avg_win_deal_value'].mean().reset_index().sort_values('avg_win_deal_value',ascending= False))
+avg_del = view["avg_del"]
 fig = px.line(avg_del,
               x = 'product',
               y = 'avg_win_deal_value',
@@ -318,13 +386,7 @@ st.plotly_chart(fig,use_container_width= True)
 # Win Rate % by Product
 # ------------------------------------------
 
-win_rate_product = (filtered.groupby('product')
-                    .agg(
-                        total = ('total_opportunities','sum'),
-                        won = ('won_opportunities','sum')
-                    ).reset_index()
-                    )
-win_rate_product['win_rate'] = (win_rate_product['won']/win_rate_product['total']* 100).round(2)
+win_rate_product = view["win_rate_product"]
 
 fig = px.bar(win_rate_product,
              x = 'product',
@@ -344,7 +406,7 @@ st.plotly_chart(fig, use_container_width=True)
 # Product Adoption (distinct Customers)
 # ------------------------------------------
 
-prod_ado = (filtered.groupby('product')['distinct_accounts'].sum().reset_index().sort_values('distinct_accounts',ascending= False))
+prod_ado = view["prod_ado"]
 
 fig = px.bar(prod_ado,
              x = 'product',
@@ -360,8 +422,7 @@ st.plotly_chart(fig,use_container_width= True)
 # avg sales cycle
 # ------------------------------------------
 
-avg_sal = (filtered.groupby('product')['avg_sales_cycle_days'].mean()
-           .reset_index().sort_values('avg_sales_cycle_days',ascending= False))
+avg_sal = view["avg_sal"]
 
 fig = px.line(
     avg_sal,
@@ -375,5 +436,35 @@ fig = px.line(
 st.subheader(' 🏆 Average Sales Cycle (Days)')
 st.plotly_chart(fig,use_container_width= True)
 
+
+
+# ----------------------------
+# CROSS-SELL
+# ----------------------------
+
+cross = results.get_or_compute(
+    "product_cross_sell", snapshot.version, {"product": tuple(sorted(filtered["product"].unique()))},
+    lambda: queries.cross_sell_view(snapshot, filtered["product"].unique()))
+
+fig = px.imshow(
+    cross["lift"],
+    text_auto=".2f",
+    color_continuous_scale=["#C8EAE2", "#2F8F83"],
+    title="Lift of Buying the Column Product Given the Row Product")
+fig.update_layout(xaxis_title="Then Bought", yaxis_title="Account Bought")
+st.subheader("🔗 Cross-sell Affinity (Won Deals)")
+st.plotly_chart(fig, use_container_width=True)
+
+c1, c2 = st.columns(2)
+with c1:
+    st.markdown("**Rules from the selected products**")
+    st.dataframe(cross["rules"], hide_index=True, use_container_width=True)
+with c2:
+    st.markdown("**Next-product suggestions for accounts**")
+    st.dataframe(cross["suggestions"], hide_index=True, use_container_width=True)
+st.caption("Confidence: share of the accounts buying the first product that also bought the second. "
+           "Lift above 1 means the pair sells together more often than chance.")
+
 st.subheader("📄 Raw Data")
-st.dataframe(filtered)
\ No newline at end of file
+# raw tables are bulk work, admitted after interactive KPI / chart reruns
+scheduler.get_scheduler().run(None, scheduler.BULK, lambda: st.dataframe(filtered))
\ No newline at end of file
@@ -13,6 +13,16 @@ import plotly.express as px
 
 from millify import millify
 
+import data_model
+import data_store
+import memo
+import queries
+import rollup
+import sampling
+import scheduler
+import sketches
+import usage
+
 
 # ----------------------------
 # PAGE SETUP
@@ -97,6 +107,11 @@ st.markdown("""
     font-weight: bold;
     color:#1A2A40;
 }
+.kpi-delta {
+    font-size: 14px;
+    font-weight: 600;
+    color:#5a6a81;
+}
 </style>
 """, unsafe_allow_html=True)
 
@@ -126,24 +141,22 @@ with col_title:
 # ----------------------------
 # LOAD DATA
 # ----------------------------
-sa360 = pd.read_csv("Resources/sales_agent_360.csv")
-sa360['first_engage_date'] = pd.to_datetime(sa360['first_engage_date'],format = '%d-%m-%Y')
-sa360['last_close_date']= pd.to_datetime(sa360['last_close_date'],format = '%d-%m-%Y')
+# current data version, swapped in the background when Resources/ changes
+snapshot = data_store.get_store().current()
+sa360 = queries.entity_table(snapshot, "sales_agent_360")
 
-sa360['month_num'] = sa360['first_engage_date'].dt.month
-sa360['month_name'] = sa360['first_engage_date'].dt.month_name()
+
+def refinement_status(sampler, fraction):
+    # rerun the page as soon as a more precise sample is ready
+    if sampler.current().fraction != fraction:
+        st.rerun()
+    st.caption(f"⚡ Estimates from a {fraction:.0%} sample" + ("" if sampler.done else " · refining…"))
 
 
 # ----------------------------
 # CREATE SLICER LISTS
 # ----------------------------
-month_list = (
-    sa360[['month_num','month_name']]
-    .dropna()
-    .drop_duplicates()
-    .sort_values("month_num")["month_name"]
-    .tolist()
-)
+month_list = data_model.month_year_options(sa360["first_engage_date"])
 
 agent_list = sorted(sa360['sales_agent'].dropna().unique())
 region_list = sorted(sa360['regional_office'].dropna().unique())
@@ -156,6 +169,8 @@ with st.sidebar:
 
     st.image("Resources/logo.jpeg", width=140)
 
+    st.caption(f"🗂 Data version {snapshot.label}")
+
     st.markdown("<div class='sidebar-title'>📊 FILTER PANEL</div>", unsafe_allow_html=True)
 
     # ------------------ MONTH SLICER ------------------
@@ -166,7 +181,13 @@ with st.sidebar:
 
     # ------------------ Agent SLICER ------------------
     st.markdown("<div class='sidebar-label'>👨‍💼 Select Agent</div>", unsafe_allow_html=True)
-    selected_agent = st.multiselect("Select Agent", agent_list)
+    # only the selection and the top matches of the search go to the browser
+    agent_query = st.text_input("Search Agent", placeholder="Type to search…")
+    agent_chosen = st.session_state.get("agent_selection", [])
+    selected_agent = st.multiselect(
+        "Select Agent", queries.typeahead_options(snapshot, "agent", agent_query, agent_chosen),
+        default=agent_chosen)
+    st.session_state["agent_selection"] = selected_agent
     if not selected_agent:
         selected_agent = agent_list
 
@@ -176,44 +197,92 @@ with st.sidebar:
     if not selected_region:
         selected_region =  region_list 
 
+    # ------------------ AS OF SLICERS ------------------
+    engage_bounds = queries.date_bounds(sa360, "first_engage_date")
+    close_bounds = queries.date_bounds(sa360, "last_close_date")
+    st.markdown("<div class='sidebar-label'>🗓 First Engaged</div>", unsafe_allow_html=True)
+    engage_range = st.date_input("First Engaged", value=engage_bounds, min_value=engage_bounds[0], max_value=engage_bounds[1])
+    st.markdown("<div class='sidebar-label'>🗓 Last Closed</div>", unsafe_allow_html=True)
+    close_range = st.date_input("Last Closed", value=close_bounds, min_value=close_bounds[0], max_value=close_bounds[1])
+
+    # ------------------ PERIOD COMPARISON ------------------
+    st.markdown("<div class='sidebar-label'>📆 Compare KPIs</div>", unsafe_allow_html=True)
+    comparison = st.selectbox("Compare KPIs", list(rollup.COMPARISONS))
+
+    # ------------------ APPROXIMATE MODE ------------------
+    approximate = st.toggle("⚡ Approximate mode", value=st.session_state.get("approximate_mode", False))
+    st.session_state["approximate_mode"] = approximate
+    if approximate:
+        sampler = snapshot.get("pipeline_sampler")
+        sample = sampler.current()
+        st.fragment(run_every=None if sampler.done else 2)(refinement_status)(sampler, sample.fraction)
+
 
 # ----------------------------
 # APPLY FILTERS
 # ----------------------------
-filtered = sa360[
-    sa360["month_name"].isin(selected_months) &
-    sa360["regional_office"].isin(selected_region) &
-    sa360["sales_agent"].isin(selected_agent)
-]
+# memoized across sessions per (data version, normalized filters)
+filters = queries.normalize_filters(
+    {"month_year": selected_months, "sales_agent": selected_agent, "regional_office": selected_region},
+    {"month_year": month_list, "sales_agent": agent_list, "regional_office": region_list},
+)
+filters.update(queries.normalize_ranges(
+    {"first_engage_date": engage_range, "last_close_date": close_range}, sa360))
+results = memo.get_memo()
+usage.get_tracker().record("agent", filters)
+view = results.get_or_compute("agent", snapshot.version, filters,
+                              lambda: queries.agent_view(snapshot, filters))
+filtered = sa360.iloc[view["rows"]]
+
+if filtered.empty:
+    st.warning("No sales agents match the selected filters.")
+    st.stop()
 
 
 # ----------------------------
 # KPI VALUES
 # ----------------------------
-Total_Revenue = sa360['revenue_won'].sum()
-Total_Revenue_Display = "$" + millify(Total_Revenue, precision=2)
-
-Total_Opportunities = filtered['total_opportunities'].sum()
-Open_Opportunities = filtered['open_opportunities'].sum()
-Won_Opportunities = filtered['won_opportunities'].sum()
-Lost_Opportunities = filtered['lost_opportunities'].sum()
-
-Win_Rate = (Won_Opportunities / Total_Opportunities * 100) if Total_Opportunities > 0 else 0
-Active_Customers = len(filtered)
-avg_deal_value = filtered['avg_win_deal_value'].mean()
-Customer_per_agent = filtered['distinct_accounts'].mean()
-Avg_Sales_Cycle = filtered['avg_sales_cycle_days'].mean()
-agent_Count = filtered['sales_agent'].nunique()
+kpis = view["kpis"]
+# period-over-period deltas of the selected agents from the calendar rollup index
+deltas = queries.entity_deltas(snapshot, "agent", "sales_agent", filtered["sales_agent"], comparison)
+delta = lambda kpi, points=False: rollup.format_delta(deltas[kpi], comparison, points)
+Total_Revenue_Display = "$" + millify(kpis["revenue"], precision=2)
+Accounts_Reached = kpis["accounts_reached"]
+agent_Count = kpis["agent_count"]
+
+# approximate mode: opportunity KPIs estimated from the pipeline sample
+if approximate:
+    est = results.get_or_compute(
+        "agent_sample", snapshot.version, filters,
+        lambda: queries.entity_sample_kpis(sample, "sales_agent", filtered["sales_agent"]),
+        sample.fraction)
+    fmt_count = lambda v: millify(round(v), 2)
+
+    Total_Revenue_Display = sampling.format_estimate(est["revenue"], lambda v: "$" + millify(v, precision=2))
+    Total_Opportunities_Display = sampling.format_estimate(est["total_opps"], fmt_count)
+    Open_Opportunities_Display = sampling.format_estimate(est["open_opps"], fmt_count)
+    Lost_Opportunities_Display = sampling.format_estimate(est["lost_opps"], fmt_count)
+    Win_Rate_Display = sampling.format_estimate(est["win_rate"], lambda v: f"{v:.2f}%")
+    avg_deal_value_Display = sampling.format_estimate(est["avg_deal_value"], lambda v: "$" + millify(v, 2))
+    Avg_Sales_Cycle_Display = sampling.format_estimate(est["avg_sales_cycle"], lambda v: millify(v, 2))
+else:
+    Total_Opportunities_Display = millify(kpis["total_opps"], 2)
+    Open_Opportunities_Display = millify(kpis["open_opps"], 2)
+    Lost_Opportunities_Display = millify(kpis["lost_opps"], 2)
+    Win_Rate_Display = f"{kpis['win_rate']:.2f}%"
+    avg_deal_value_Display = "$" + millify(kpis["avg_deal_value"], 2)
+    Avg_Sales_Cycle_Display = millify(kpis["avg_sales_cycle"], 2)
 
 # ----------------------------
 # KPI CARD FUNCTION
 # ----------------------------
-def kpi_card(title, value):
+def kpi_card(title, value, delta=""):
     st.markdown(
         f"""
         <div class="kpi-box">
             <div class="kpi-title">{title}</div>
             <div class="kpi-value">{value}</div>
+            <div class="kpi-delta">{delta}</div>
         </div>
         """,
         unsafe_allow_html=True
@@ -224,20 +293,72 @@ def kpi_card(title, value):
 # KPI DISPLAY GRID
 # ----------------------------
 k1, k2, k3 = st.columns(3)
-with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display)
-with k2: kpi_card("📁 Total Opportunities", millify(Total_Opportunities, 2))
-with k3: kpi_card("📂 Open Opportunities", millify(Open_Opportunities, 2))
+with k1: kpi_card("💰 Total Revenue", Total_Revenue_Display, delta("revenue"))
+with k2: kpi_card("📁 Total Opportunities", Total_Opportunities_Display, delta("total_opps"))
+with k3: kpi_card("📂 Open Opportunities", Open_Opportunities_Display)
 
 k4, k5, k6 = st.columns(3)
-with k4: kpi_card("🏆 Win Rate", f"{Win_Rate:.2f}%")
-with k5: kpi_card("❌ Lost Opportunities", millify(Lost_Opportunities, 2))
-with k6: kpi_card("📦 Average Sales Cycle", millify(Avg_Sales_Cycle, 2))
+with k4: kpi_card("🏆 Win Rate", Win_Rate_Display, delta("win_rate", points=True))
+with k5: kpi_card("❌ Lost Opportunities", Lost_Opportunities_Display, delta("lost_opps"))
+with k6: kpi_card("📦 Average Sales Cycle", Avg_Sales_Cycle_Display)
 
 k7, k8, k9 = st.columns(3)
-with k7: kpi_card("👥 Customer Per Sales Agent", millify(Customer_per_agent, 2))
-with k8: kpi_card("💵 Avg Deal Value", "$" + millify(avg_deal_value, 2))
+with k7: kpi_card("👥 Accounts Covered", ("" if sketches.EXACT_DISTINCT else "≈") + f"{Accounts_Reached:,}")
+with k8: kpi_card("💵 Avg Deal Value", avg_deal_value_Display, delta("avg_deal_value"))
 with k9: kpi_card("📅 Total Sales Agent", (agent_Count))
 
+# percentiles merge the quantile sketches of the selected entities
+spread = view["spread"]
+k10, k11 = st.columns(2)
+with k10: kpi_card("💵 Deal Value P50 · P90 · P99", queries.format_percentiles(
+    spread["close_value"], lambda v: "$" + millify(v, precision=1)))
+with k11: kpi_card("⏱ Sales Cycle P50 · P90 · P99", queries.format_percentiles(
+    spread["sales_cycle_days"], lambda v: f"{v:.0f}") + " days")
+
+
+
+# ------------------------------------------
+# TEAM DRILL-DOWN
+# ------------------------------------------
+# node totals come from the hierarchy rollup; every visited node is memoized,
+# so breadcrumb jumps back up are cache hits
+st.subheader("🧭 Team Drill-down")
+
+path = st.session_state.get("agent_path", ())
+drill = results.get_or_compute("agent_tree", snapshot.version, filters,
+                               lambda: queries.drilldown_view(snapshot, "agent", view["rows"], path), path)
+path = st.session_state["agent_path"] = drill["path"]
+
+crumb_cols = st.columns(len(drill["crumbs"]) + 1)
+for col, (label, crumb) in zip(crumb_cols, drill["crumbs"]):
+    if col.button(label, key=f"agent_crumb_{len(crumb)}", disabled=crumb == path):
+        st.session_state["agent_path"] = crumb
+        st.rerun()
+
+node = drill["node"]
+st.caption(
+    f"{millify(node['revenue_won'], 2)} revenue · {int(node['total_opportunities']):,} opportunities · "
+    f"{node['win_rate']:.2f}% win rate"
+)
+
+children = drill["children"]
+if drill["level"] is not None and not children.empty:
+    level = drill["level"]
+    fig = px.bar(children.sort_values('revenue_won'),
+                 x = 'revenue_won',
+                 y = level,
+                 orientation = 'h',
+                 text = 'members',
+                 title = f"Revenue by {level.replace('_', ' ')}",
+                 color_discrete_sequence=px.colors.qualitative.Set2)
+    st.plotly_chart(fig, use_container_width=True)
+
+    child = st.selectbox(f"Drill into {level.replace('_', ' ')}", ["—"] + children[level].tolist(),
+                         key=f"agent_drill_{'/'.join(path)}")
+    if child != "—":
+        st.session_state["agent_path"] = path + (child,)
+        st.rerun()
+
 
 
 # ------------------------------------------
@@ -248,8 +369,7 @@ with k9: kpi_card("📅 Total Sales Agent", (agent_Count))
 # Agent Revenue
 # ------------------------------------------
 
-agent_revenue = (filtered.groupby(['sales_agent'])['revenue_won'].sum().reset_index())
-agent_revenue ['rev_fmt'] = agent_revenue['revenue_won'].apply(lambda x: millify(x,precision = 1))
+agent_revenue = view["agent_revenue"]
 
 fig = px.bar(agent_revenue,
              x = 'sales_agent',
@@ -265,9 +385,7 @@ st.plotly_chart(fig,use_container_width= True)
 # no of opportunities per agent
 # ------------------------------------------
  
-opp_sa = (filtered.groupby('sales_agent')[['won_opportunities','lost_opportunities','open_opportunities']]
-          .sum().reset_index().sort_values('won_opportunities',ascending = False).head(10).sort_values('won_opportunities',ascending = True)
-         )
+opp_sa = view["opp_sa"]
 
 opp_long = opp_sa.melt(
         id_vars= 'sales_agent',
@@ -293,7 +411,7 @@ st.plotly_chart(fig,use_container_width= True)
 # Avg deal value per agent
 # ------------------------------------------
 
-avg_del = (filtered.groupby('sales_agent')['avg_win_deal_value'].mean().reset_index().sort_values('avg_win_deal_value',ascending= False))
+avg_del = view["avg_del"]
 fig = px.line(avg_del,
               x = 'sales_agent',
               y = 'avg_win_deal_value',
@@ -306,14 +424,7 @@ st.plotly_chart(fig,use_container_width= True)
 # Win Rate % by Sales Agent
 # ------------------------------------------
 
-win_rate_agent = (filtered.groupby('sales_agent')
-                    .agg(
-                        total = ('total_opportunities','sum'),
-                        won = ('won_opportunities','sum')
-                    ).reset_index()
-                    )
-win_rate_agent['win_rate'] = (win_rate_agent['won']/win_rate_agent['total']* 100).round(2)
-win_rate_agent = win_rate_agent.sort_values('win_rate', ascending=False)
+win_rate_agent = view["win_rate_agent"]
 
 
 fig = px.line(win_rate_agent,
@@ -330,7 +441,7 @@ st.plotly_chart(fig, use_container_width=True)
 # Account Coverage by Sales Agent
 # ------------------------------------------
 
-agco = (filtered.groupby('sales_agent')['distinct_accounts'].sum().reset_index().sort_values('distinct_accounts',ascending= False))
+agco = view["agco"]
 
 fig = px.bar(agco,
              x = 'sales_agent',
@@ -345,8 +456,7 @@ st.plotly_chart(fig,use_container_width= True)
 # avg sales cycle
 # ------------------------------------------
 
-avg_sal = (filtered.groupby('sales_agent')['avg_sales_cycle_days'].mean()
-           .reset_index().sort_values('avg_sales_cycle_days',ascending= False))
+avg_sal = view["avg_sal"]
 
 fig = px.line(
     avg_sal,
@@ -365,7 +475,7 @@ st.plotly_chart(fig,use_container_width= True)
 # regional sales
 # ------------------------------------------
 
-regs = filtered.groupby('regional_office')['revenue_won'].sum().reset_index()
+regs = view["regs"]
 fig = px.pie(
     regs,
     names='regional_office',
@@ -383,7 +493,8 @@ st.subheader("🌍 Revenue by Regional Office")
 st.plotly_chart(fig, use_container_width=True)
 
 st.subheader("📄 Raw Data")
-st.dataframe(filtered)
+# raw tables are bulk work, admitted after interactive KPI / chart reruns
+scheduler.get_scheduler().run(None, scheduler.BULK, lambda: st.dataframe(filtered))
 
 
 
@@ -9,9 +9,17 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import plotly.express as px
+import plotly.graph_objects as go
 
 from millify import millify
 
+import cohort
+import data_store
+import memo
+import queries
+import scheduler
+import usage
+
 
 # ----------------------------
 # PAGE SETUP
@@ -99,14 +107,10 @@ with col_title:
 # ----------------------------
 # LOAD DATA
 # ----------------------------
-cr = pd.read_csv("Resources/cohort_raw.csv")
-cr['cohort_month'] = pd.to_datetime(cr['cohort_month'],format = '%d-%m-%Y')
-cr = cr.sort_values('cohort_month',ascending = True).reset_index(drop = True)
-
-cr['month_num'] = cr['cohort_month'].dt.month
-cr['month_name'] = cr['cohort_month'].dt.month_name()
+# current data version, swapped in the background when Resources/ changes
+snapshot = data_store.get_store().current()
+cr = snapshot.tables["cohort"]
 
-cr['month_year'] = cr['cohort_month'].dt.strftime('%b %Y')
 
 # ----------------------------
 # CREATE SLICER LISTS
@@ -129,6 +133,8 @@ with st.sidebar:
 
     st.image("Resources/logo.jpeg", width=140)
 
+    st.caption(f"🗂 Data version {snapshot.label}")
+
     st.markdown("<div class='sidebar-title'>📊 FILTER PANEL</div>", unsafe_allow_html=True)
 
     # ------------------ MONTH SLICER ------------------
@@ -147,26 +153,33 @@ with st.sidebar:
 # ----------------------------
 # APPLY FILTERS
 # ----------------------------
-filtered = cr[
-    cr["month_name"].isin(selected_months) &
-    cr["month_since_acquisition"].isin(selected_month_s)
-]
+# memoized across sessions per (data version, normalized filters); the month
+# slicer lists cohort months, so it filters on month_year
+filters = queries.normalize_filters(
+    {"month_year": selected_months, "month_since_acquisition": selected_month_s},
+    {"month_year": month_list, "month_since_acquisition": month_s},
+)
+usage.get_tracker().record("cohort", filters)
+view = memo.get_memo().get_or_compute("cohort", snapshot.version, filters,
+                                      lambda: queries.cohort_view(snapshot, filters))
+filtered = cr.iloc[view["rows"]]
 
 
 # ----------------------------
 # KPI VALUES
 # ----------------------------
-Total_Revenue = filtered['total_revenue_cohort_customers'].max()
+kpis = view["kpis"]
+Total_Revenue = kpis["revenue"]
 if pd.isna(Total_Revenue):
     Total_Revenue_Display = "$0"
 else:
     Total_Revenue_Display = "$" + millify(Total_Revenue, precision=2)
 
 
-avg_month_repeat = filtered['avg_months_to_repeat'].max()
-repeat_purchase = (filtered['retention_rate'].max()) * 100
-repeat_customer = filtered['repeat_customers'].max()
-cohort_size = filtered['cohort_customers'].max()
+avg_month_repeat = kpis["avg_month_repeat"]
+repeat_purchase = kpis["repeat_purchase"]
+repeat_customer = kpis["repeat_customer"]
+cohort_size = kpis["cohort_size"]
 
 
 
@@ -180,32 +193,27 @@ cohort_size = filtered['cohort_customers'].max()
 # Cohort Analysis
 # ------------------------------------------
 
-cohort_pivot = (
-    cr.pivot_table(
-        index='cohort_month',
-        columns='month_since_acquisition',
-        values='retention_by_month',
-        aggfunc='max'        
-    )
-    .round(2)
-)
-
+retention, cohort_keys, period_keys = snapshot.get("retention_matrix")
+cohort_labels = pd.DatetimeIndex(cohort_keys).strftime('%b %Y')
 
-cohort_style = (
-    cohort_pivot.style
-    .background_gradient(cmap='Greens')
-    .format("{:.2f}")
+fig = go.Figure(go.Heatmap(**cohort.heatmap_trace_args(retention, cohort_labels, period_keys)))
+fig.update_layout(
+    xaxis_title="Month Since Acquisition",
+    yaxis_title="Cohort Month",
+    yaxis=dict(autorange="reversed", type="category"),
+    xaxis=dict(type="category"),
+    template="simple_white",
+    height=max(300, min(900, 40 * len(cohort_labels) + 120)),
 )
 
-
 st.subheader("📊 Cohort Analysis Table")
-st.dataframe(cohort_style, use_container_width=True)
+st.plotly_chart(fig, use_container_width=True)
 
 col1, col2 = st.columns(2)
 # ------------------------------------------
 # Cohort Size
 # ------------------------------------------
-crco = cr.groupby('month_year')['cohort_customers'].max().reset_index().sort_values('month_year',ascending= True)
+crco = view["crco"]
 
 fig = px.bar(
     crco,
@@ -228,7 +236,7 @@ with col1:
 # ------------------------------------------
 
 
-crcr = cr.groupby('month_year')['total_revenue_cohort_customers'].max().reset_index().sort_values('month_year',ascending= True)
+crcr = view["crcr"]
 fig = px.line(crcr,
               x = 'month_year',
               y = 'total_revenue_cohort_customers',
@@ -242,11 +250,7 @@ with col2:
 # Retention curve
 # ------------------------------------------
 
-ret = (
-    cr.groupby(['month_year', 'month_since_acquisition'], as_index=False)
-      .agg(retention_by_month=('retention_by_month', 'max'))
-      .sort_values(['month_year', 'month_since_acquisition'])
-)
+ret = view["ret"]
 
 fig = px.line(
     ret,
@@ -273,11 +277,7 @@ st.plotly_chart(fig, use_container_width=True)
 # ------------------------------------------
 col3, col4 = st.columns(2)
 
-cr_avg = (
-    cr.groupby(['month_year'], as_index=False)['avg_months_to_repeat']
-      .max()
-      .sort_values('month_year')
-)
+cr_avg = view["cr_avg"]
 
 fig = px.pie(
     cr_avg,
@@ -302,11 +302,7 @@ with col3:
 # ------------------------------------------
 
 col5, col6 = st.columns(2)
-cr_repeat = (
-    cr.groupby('month_year', as_index=False)['repeat_customers']
-      .max()
-      .sort_values('month_year')
-)
+cr_repeat = view["cr_repeat"]
 
 
 fig = px.bar(
@@ -329,4 +325,5 @@ with col4:
 
 
 st.subheader("📄 Raw Data")
-st.dataframe(cr)
\ No newline at end of file
+# raw tables are bulk work, admitted after interactive KPI / chart reruns
+scheduler.get_scheduler().run(None, scheduler.BULK, lambda: st.dataframe(cr))
\ No newline at end of file
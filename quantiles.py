@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# relative accuracy alpha: every reported quantile q lies within
+# x * (1 - alpha) .. x * (1 + alpha) of a value x whose rank is exactly q,
+# for any data and any number of merges (DDSketch guarantee).
+#   alpha=0.01 -> 1% with ~1,040 buckets per sketch over MIN_VALUE .. MAX_VALUE
+RELATIVE_ACCURACY = 0.01
+
+# values below MIN_VALUE share one bucket reported as 0; values above
+# MAX_VALUE are clamped into the last bucket
+MIN_VALUE = 1.0
+MAX_VALUE = 1e9
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+def _gamma(alpha=RELATIVE_ACCURACY):
+    return (1 + alpha) / (1 - alpha)
+
+
+def bucket_keys(values, alpha=RELATIVE_ACCURACY):
+    """Bucket of each value: 0 below MIN_VALUE, else 1 + ceil(log_gamma(x / MIN_VALUE))."""
+    gamma = _gamma(alpha)
+    n_buckets = int(np.ceil(np.log(MAX_VALUE / MIN_VALUE) / np.log(gamma))) + 2
+    values = np.asarray(values, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keys = np.ceil(np.log(values / MIN_VALUE) / np.log(gamma)) + 1
+    keys = np.where(values < MIN_VALUE, 0, np.clip(keys, 1, n_buckets - 1))
+    return keys.astype(np.intp), n_buckets
+
+
+def bucket_values(n_buckets, alpha=RELATIVE_ACCURACY):
+    # value reported for each bucket: within alpha of everything in it
+    gamma = _gamma(alpha)
+    k = np.arange(n_buckets) - 1
+    return np.where(k < 0, 0.0, MIN_VALUE * 2 * gamma ** k / (gamma + 1))
+
+
+# ----------------------------
+# SINGLE SKETCH
+# ----------------------------
+class QuantileSketch:
+    """Mergeable relative-error quantile sketch; merging adds bucket counts."""
+
+    def __init__(self, counts, alpha=RELATIVE_ACCURACY):
+        self.counts = counts
+        self.alpha = alpha
+
+    @classmethod
+    def from_values(cls, values, alpha=RELATIVE_ACCURACY):
+        values = np.asarray(values, dtype="float64")
+        keys, n_buckets = bucket_keys(values[~np.isnan(values)], alpha)
+        return cls(np.bincount(keys, minlength=n_buckets).astype(np.int64), alpha)
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("cannot merge sketches with different accuracy")
+        return QuantileSketch(self.counts + other.counts, self.alpha)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        """Value at rank q (0..1), NaN for an empty sketch."""
+        n = self.count
+        if n == 0:
+            return np.nan
+        rank = int(np.floor(q * (n - 1)))
+        key = int(np.searchsorted(np.cumsum(self.counts), rank, side="right"))
+        return float(bucket_values(len(self.counts), self.alpha)[key])
+
+    def quantiles(self, qs=QUANTILES):
+        return {name: self.quantile(q) for name, q in qs.items()}
+
+    def histogram(self, bins=30):
+        """(counts, edges) over equal-width bins, each bucket placed at its reported value."""
+        used = np.flatnonzero(self.counts)
+        if not len(used):
+            return np.zeros(0, dtype=np.int64), np.zeros(1)
+        values = bucket_values(len(self.counts), self.alpha)[used]
+        counts, edges = np.histogram(values, bins=bins, weights=self.counts[used])
+        return counts.astype(np.int64), edges
+
+
+# ----------------------------
+# SKETCH PER CUBE CELL
+# ----------------------------
+class QuantileCube:
+    """
+    One QuantileSketch of `value` per combination of `dims` values.
+
+    `sketch(filters)` sums the bucket counts of every cell allowed by the
+    filters (column -> allowed values, None means all; NaN is a regular
+    value), so a filtered percentile never touches the rows.
+    """
+
+    def __init__(self, dims, value, alpha, cell_values, cell_counts):
+        self.dims = dims
+        self.value = value
+        self.alpha = alpha
+        self.cell_values = cell_values
+        self.cell_counts = cell_counts
+
+    @classmethod
+    def from_frame(cls, df, dims, value, alpha=RELATIVE_ACCURACY):
+        present = df[value].notna().to_numpy()
+        df = df[present]
+        if dims:
+            cell_ids, cells = pd.factorize(pd.MultiIndex.from_arrays([df[d] for d in dims]), use_na_sentinel=False)
+            cell_values = pd.DataFrame(list(cells), columns=dims) if len(cells) else pd.DataFrame(columns=dims)
+        else:
+            cell_ids = np.zeros(len(df), dtype=np.intp)
+            cell_values = pd.DataFrame(index=[0])
+
+        keys, n_buckets = bucket_keys(df[value].to_numpy(dtype="float64"), alpha)
+        flat = np.asarray(cell_ids, dtype=np.intp) * n_buckets + keys
+        counts = np.bincount(flat, minlength=len(cell_values) * n_buckets).reshape(len(cell_values), n_buckets)
+        # per-cell counts fit 32 bits and halve the cube
+        return cls(list(dims), value, alpha, cell_values, counts.astype("uint32"))
+
+    def to_bundle(self):
+        # flat dict of frames / arrays for the disk cache
+        return {
+            "meta": {"dims": self.dims, "value": self.value, "alpha": self.alpha},
+            "cell_values": self.cell_values,
+            "cell_counts": self.cell_counts,
+        }
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        meta = bundle["meta"]
+        return cls(meta["dims"], meta["value"], meta["alpha"], bundle["cell_values"], bundle["cell_counts"])
+
+    def _cell_mask(self, filters):
+        mask = np.ones(len(self.cell_values), dtype=bool)
+        for col, vals in (filters or {}).items():
+            if vals is not None and col in self.dims:
+                mask &= pd.Index(self.cell_values[col]).isin(list(vals))
+        return mask
+
+    def sketch(self, filters=None):
+        counts = self.cell_counts[self._cell_mask(filters)].sum(axis=0, dtype=np.int64)
+        return QuantileSketch(counts, self.alpha)
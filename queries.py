@@ -0,0 +1,626 @@
+import numpy as np
+import pandas as pd
+from millify import millify
+
+import aggregate
+import alerts
+import date_index
+import forecast
+import funnel
+import hierarchy
+import intervals
+import quantiles
+import rollup
+import sampling
+import search
+import survival
+import topk
+from data_model import OPEN_STAGES
+
+
+# ----------------------------
+# FILTER NORMALIZATION
+# ----------------------------
+def normalize_selection(selected, universe):
+    # an empty selection and "every value" mean the same thing: no filter
+    selected = list(selected or [])
+    if not selected or set(selected) >= set(universe):
+        return None
+    return tuple(sorted(selected, key=str))
+
+
+def normalize_filters(selections, universes):
+    return {col: normalize_selection(selections.get(col), universes[col]) for col in universes}
+
+
+def date_bounds(df, col):
+    # first and last date of a column, the default of its range slicer
+    return df[col].min().date(), df[col].max().date()
+
+
+def normalize_ranges(ranges, df):
+    # date slicer picks -> range filters; a half-picked or full range is no filter
+    out = {}
+    for col, picked in ranges.items():
+        picked = tuple(picked or ())
+        out[col] = date_index.normalize_range(*picked, *date_bounds(df, col)) if len(picked) == 2 else None
+    return out
+
+
+def filter_key(filters):
+    # hashable, order independent form of a normalized filter dict
+    return tuple(sorted(filters.items()))
+
+
+def filter_rows(df, filters, index=None):
+    # sorted row positions matching `filters`; with `index` (date_index.TableIndex
+    # of df) the date ranges pick the candidate rows and the other filters only
+    # look at those
+    rows = date_index.range_rows(filters, index) if index is not None else None
+    if rows is None:
+        return np.flatnonzero(filter_mask(df, filters))
+    for col, vals in filters.items():
+        if vals is not None and not date_index.is_range(vals):
+            rows = rows[df[col].take(rows).isin(vals).to_numpy()]
+    return rows
+
+
+def filter_mask(df, filters, index=None):
+    if index is not None and has_ranges(filters):
+        mask = np.zeros(len(df), dtype=bool)
+        mask[filter_rows(df, filters, index)] = True
+        return mask
+    mask = np.ones(len(df), dtype=bool)
+    for col, vals in filters.items():
+        if date_index.is_range(vals):
+            mask &= date_index.range_mask(df, col, vals)
+        elif vals is not None:
+            mask &= df[col].isin(vals).to_numpy()
+    return mask
+
+
+def has_ranges(filters):
+    return any(date_index.is_range(vals) for vals in filters.values())
+
+
+def range_filters(filters):
+    return {col: vals for col, vals in filters.items() if date_index.is_range(vals)}
+
+
+def table_index(snapshot, name):
+    # sorted date indexes of a snapshot table; 360 tables rebuilt by the
+    # aggregation service get their own, cached next to the table
+    engine = aggregate.get_engine(snapshot)
+    if engine.local or name == "enriched":
+        return snapshot.get("date_indexes")[name]
+    return engine.cached(f"{name}_index", lambda: date_index.TableIndex(entity_table(snapshot, name)))
+
+
+def _distinct_filters(filters):
+    # open deals have no close month, so their NaN month cells always count
+    months = filters.get("month_year")
+    return {
+        "month_year": None if months is None else list(months) + [np.nan],
+        "product": filters.get("product"),
+        "office_location": filters.get("office_location"),
+    }
+
+
+# ----------------------------
+# EXECUTIVE SALES OVERVIEW
+# ----------------------------
+EXECUTIVE_FILTERS = ["month_year", "product", "office_location"]
+EXECUTIVE_RANGES = ["engage_date", "close_date"]
+
+
+def executive_charts(filtered):
+    monthly = (
+        filtered.groupby(["close_month_start", "month_year"])["close_value"]
+        .sum()
+        .reset_index()
+        .sort_values("close_month_start")
+    )
+    prod = (
+        filtered.groupby("product")["close_value"]
+        .sum()
+        .reset_index()
+        .sort_values('close_value')
+    )
+    sect = (
+        filtered.groupby('sector')["close_value"]
+        .sum()
+        .reset_index()
+        .sort_values('close_value', ascending=True)
+    )
+    region = (
+        filtered.groupby("office_location")["close_value"]
+        .sum()
+        .reset_index()
+    )
+    return {"monthly": monthly, "prod": prod, "sect": sect, "region": region}
+
+
+def _revenue_by(engine, by, filters, where=None):
+    return engine.query(aggregate.make_query(
+        "enriched", by, {"close_value": ("close_value", "sum", where)}, filters))
+
+
+def engine_charts(engine, filters):
+    # executive_charts through the aggregation engine, same frames
+    return {
+        "monthly": _revenue_by(engine, ["close_month_start", "month_year"], filters).sort_values("close_month_start"),
+        "prod": _revenue_by(engine, ["product"], filters).sort_values('close_value'),
+        "sect": _revenue_by(engine, ["sector"], filters).sort_values('close_value', ascending=True),
+        "region": _revenue_by(engine, ["office_location"], filters),
+    }
+
+
+def distinct_counts(snapshot, filters, exact_distinct=False):
+    # (opportunities, accounts) of the selection; the cubes stop at months,
+    # so date ranges count the matching rows exactly instead
+    distinct = _distinct_filters(filters)
+    if has_ranges(filters):
+        df = snapshot.tables["enriched"]
+        rows = filter_rows(df, {**distinct, **range_filters(filters)}, table_index(snapshot, "enriched"))
+        return df["opportunity_id"].take(rows).nunique(), df["account"].take(rows).nunique()
+    cubes = snapshot.get("distinct_cubes")
+    return (cubes["opportunity_id"].count(distinct, exact=exact_distinct),
+            cubes["account"].count(distinct, exact=exact_distinct))
+
+
+def distribution_view(snapshot, filters, prefix="", bins=30):
+    """
+    P50 / P90 / P99 and histograms of won deal sizes and closed-deal cycles.
+    Sketches of the matching cube cells are merged; date ranges sketch the
+    matching rows instead, the cubes stop at months.
+    """
+    cubes = snapshot.get("quantile_cubes")
+    view = {}
+    for value in ["close_value", "sales_cycle_days"]:
+        if has_ranges(filters):
+            df = snapshot.tables["enriched"]
+            rows = filter_rows(df, filters, table_index(snapshot, "enriched"))
+            if value == "close_value":
+                rows = rows[(df["deal_stage"].take(rows) == "Won").to_numpy()]
+            sketch = quantiles.QuantileSketch.from_values(df[value].to_numpy(dtype="float64", na_value=np.nan)[rows])
+        else:
+            sketch = cubes[prefix + value].sketch(filters)
+        counts, edges = sketch.histogram(bins)
+        view[value] = sketch.quantiles()
+        view[value + "_hist"] = pd.DataFrame({"start": edges[:-1], "end": edges[1:], "deals": counts})
+    return view
+
+
+def format_percentiles(qs, fmt):
+    # "P50 · P90 · P99" card value, a dash for an empty selection
+    return " · ".join("–" if pd.isna(v) else fmt(v) for v in qs.values())
+
+
+def _month_rows(df, filters, index=None):
+    # rows behind the charts and the raw table: the month slicer lists close
+    # months, so even with no month selected it keeps closed deals only
+    return filter_mask(df, filters, index) & df["month_year"].notna().to_numpy()
+
+
+def executive_view(snapshot, filters, exact_distinct=False):
+    df = snapshot.tables["enriched"]
+    rows = _month_rows(df, filters, table_index(snapshot, "enriched"))
+    engine = aggregate.get_engine(snapshot)
+
+    totals = engine.query(aggregate.make_query("enriched", [], {
+        "won_opps": ("opportunity_id", "count", {"deal_stage": ["Won"]}),
+        "lost_opps": ("opportunity_id", "count", {"deal_stage": ["Lost"]}),
+        "avg_deal_value": ("close_value", "mean", {"deal_stage": ["Won"]}),
+        "avg_sales_cycle": ("sales_cycle_days", "mean"),
+    }, filters)).iloc[0]
+    open_opps = engine.query(aggregate.make_query("enriched", [], {"open_opps": ("opportunity_id", "count")}, {
+        "product": filters.get("product"),
+        "office_location": filters.get("office_location"),
+        "deal_stage": OPEN_STAGES,
+    })).iloc[0]["open_opps"]
+    # company-wide on purpose: the Total Revenue card ignores the slicers,
+    # as it always has; do not pass `filters` here
+    revenue = engine.query(aggregate.make_query("enriched", [], {"revenue": ("close_value", "sum")})).iloc[0]["revenue"]
+
+    # one row per opportunity: closed rows of the selection plus the open
+    # deals count exactly, only the accounts need a distinct count
+    active_customers = distinct_counts(snapshot, filters, exact_distinct)[1]
+    won_opps, lost_opps = int(totals["won_opps"]), int(totals["lost_opps"])
+    total_opps = won_opps + lost_opps + int(open_opps)
+
+    kpis = {
+        "revenue": revenue,
+        "total_opps": total_opps,
+        "won_opps": won_opps,
+        "lost_opps": lost_opps,
+        "open_opps": int(open_opps),
+        "win_rate": (won_opps / total_opps * 100) if total_opps > 0 else 0,
+        "avg_deal_value": totals["avg_deal_value"],
+        "avg_sales_cycle": totals["avg_sales_cycle"],
+        "active_customers": active_customers,
+    }
+
+    # cached per filter context and carried over to new data versions
+    top_accounts = snapshot.get("account_leaderboards").leaderboard(
+        snapshot.get("won_deals"), filters).to_frame("account", "close_value")
+
+    view = engine_charts(engine, filters)
+    view.update(rows=np.flatnonzero(rows), kpis=kpis, top_accounts=top_accounts)
+    return view
+
+
+def executive_sample_view(snapshot, sample, filters, exact_distinct=False):
+    # same layout as executive_view, KPIs are sampling.Estimate values
+    s_df = sample.frame
+    rows = _month_rows(s_df, filters)
+    kpi_rows = filter_mask(s_df, {"product": filters.get("product"), "office_location": filters.get("office_location")})
+    in_months = filter_mask(s_df, {"month_year": filters.get("month_year")})
+    kpi_rows &= in_months | s_df["deal_stage"].isin(OPEN_STAGES).to_numpy()
+    kpi_rows &= filter_mask(s_df, range_filters(filters))
+
+    kpis = sampling.pipeline_kpis(sample, kpi_rows)
+    kpis["revenue"] = sample.total(s_df["close_value"].to_numpy())
+    kpis["active_customers"] = distinct_counts(snapshot, filters, exact_distinct)[1]
+
+    top_accounts = snapshot.get("account_leaderboards").leaderboard(
+        snapshot.get("won_deals"), filters).to_frame("account", "close_value")
+
+    view = executive_charts(sample.expanded()[rows])
+    view.update(rows=np.flatnonzero(rows), kpis=kpis, top_accounts=top_accounts)
+    return view
+
+
+# ----------------------------
+# PERIOD-OVER-PERIOD DELTAS
+# ----------------------------
+def comparison_as_of(index, months=None):
+    # last day of the latest selected month, the last day of data without one
+    if not months:
+        return index.last_date
+    latest = max(pd.Period(month, freq="M") for month in months)
+    return min(latest.end_time.normalize(), index.last_date)
+
+
+def executive_deltas(snapshot, filters, comparison):
+    # deltas of the KPI cards over the product / region selection, anchored
+    # at the latest selected month; the revenue card is company-wide
+    index = snapshot.get("calendar_rollups")["executive"]
+    as_of = comparison_as_of(index, filters.get("month_year"))
+    deltas = rollup.kpi_deltas(index, comparison, as_of, filters)
+    deltas["revenue"] = rollup.kpi_deltas(index, comparison, as_of)["revenue"]
+    return deltas
+
+
+def entity_deltas(snapshot, page, key, entities, comparison):
+    # 360 cards cover the selected entities up to the last day of data
+    index = snapshot.get("calendar_rollups")[page]
+    deltas = rollup.kpi_deltas(index, comparison, index.last_date, {key: list(entities)})
+    deltas["revenue"] = rollup.kpi_deltas(index, comparison, index.last_date)["revenue"]
+    return deltas
+
+
+# ----------------------------
+# POINT-IN-TIME PIPELINE
+# ----------------------------
+def pipeline_as_of(snapshot, filters, as_of):
+    """Deals open on `as_of` by eventual outcome, binary searches on the interval index."""
+    return snapshot.get("pipeline_intervals").snapshot(as_of, {col: filters.get(col) for col in intervals.PIPELINE_DIMS})
+
+
+def pipeline_daily(snapshot, filters):
+    # open deals and value at risk at the end of every day of the data
+    return snapshot.get("pipeline_intervals").daily({col: filters.get(col) for col in intervals.PIPELINE_DIMS})
+
+
+# ----------------------------
+# PIPELINE FORECAST
+# ----------------------------
+FORECAST_FILTERS = ["product", "office_location"]
+
+
+def forecast_view(snapshot, filters):
+    """Monte Carlo revenue bands of the open deals in the product / region selection."""
+    df = snapshot.tables["enriched"]
+    # open deals have no close date, so month and date filters do not apply
+    deals = df[df["deal_stage"].isin(OPEN_STAGES)]
+    deals = deals[filter_mask(deals, {col: filters.get(col) for col in FORECAST_FILTERS})]
+    as_of = df["close_date"].max()
+    model = snapshot.get("pipeline_model")
+    return {
+        "as_of": as_of,
+        "deals": len(deals),
+        "engage_rate": model.engage_rate,
+        "bands": forecast.forecast_frame(model, deals, as_of),
+    }
+
+
+# ----------------------------
+# SALES-CYCLE SURVIVAL
+# ----------------------------
+# the close month and close date would drop the open (censored) deals
+SURVIVAL_FILTERS = ["product", "office_location", "engage_date"]
+
+
+def survival_view(snapshot, filters, by=None):
+    """Kaplan-Meier time-to-close curves and medians of the engaged deals in the selection."""
+    df = snapshot.tables["enriched"]
+    rows = filter_mask(df, {col: filters.get(col) for col in SURVIVAL_FILTERS}, table_index(snapshot, "enriched"))
+    selected = df[rows]
+    curves, medians = survival.survival_frame(selected, by, as_of=df["close_date"].max())
+    overall = survival.survival_frame(selected, as_of=df["close_date"].max())[1]
+    return {"curves": curves, "medians": medians, "overall": overall.iloc[0] if len(overall) else None}
+
+
+# ----------------------------
+# STAGE FUNNEL
+# ----------------------------
+# open deals sit in the funnel too, so the close-side filters do not apply
+FUNNEL_FILTERS = SURVIVAL_FILTERS
+
+
+def funnel_view(snapshot, filters, by):
+    """Stage conversion of the selected deals and their drop-off per `by` column."""
+    df = snapshot.tables["enriched"]
+    rows = filter_rows(df, {col: filters.get(col) for col in FUNNEL_FILTERS}, table_index(snapshot, "enriched"))
+    stages = snapshot.get("stage_funnel")
+    return {"funnel": stages.funnel(rows), "groups": stages.by_group(by, rows), "observed": stages.observed(rows)}
+
+
+# ----------------------------
+# ALERTS
+# ----------------------------
+def alerts_view(snapshot, filters, days=alerts.RECENT_DAYS):
+    """Flagged days / weeks of the last `days` in the product / region selection."""
+    df = snapshot.tables["enriched"]
+    monitor = alerts.get_monitor()
+    # a no-op once this data version is ingested; a new version only scores the periods it completes
+    monitor.ingest(df, snapshot.version)
+    since = df["close_date"].max() - pd.Timedelta(days=days)
+    return monitor.recent(since, {col: filters.get(col) for col in ["product", "office_location"]})
+
+
+# ----------------------------
+# 360 PAGES
+# ----------------------------
+def entity_table(snapshot, name):
+    # 360 tables ship as csv files; behind the aggregation service they are
+    # rebuilt from the partitioned pipeline instead
+    engine = aggregate.get_engine(snapshot)
+    if engine.local:
+        return snapshot.tables[name]
+    return engine.cached(name, lambda: aggregate.entity_table(engine, name, snapshot.tables))
+
+
+def entity_kpis(filtered, full):
+    # shared KPI block of the account / product / agent 360 tables
+    total = filtered['total_opportunities'].sum()
+    won = filtered['won_opportunities'].sum()
+    return {
+        "revenue": full['revenue_won'].sum(),
+        "total_opps": total,
+        "open_opps": filtered['open_opportunities'].sum(),
+        "won_opps": won,
+        "lost_opps": filtered['lost_opportunities'].sum(),
+        "win_rate": (won / total * 100) if total > 0 else 0,
+        "avg_deal_value": filtered['avg_win_deal_value'].mean(),
+    }
+
+
+def entity_sample_kpis(sample, key, entities):
+    # opportunity KPIs of the selected entities, estimated from the sample
+    s_df = sample.frame
+    kpis = sampling.pipeline_kpis(sample, s_df[key].isin(entities).to_numpy())
+    kpis["revenue"] = sample.total(s_df["close_value"].to_numpy())
+    return kpis
+
+
+def win_rate_by(filtered, key):
+    out = (filtered.groupby(key)
+           .agg(
+               total = ('total_opportunities','sum'),
+               won = ('won_opportunities','sum')
+           ).reset_index()
+           )
+    out['win_rate'] = (out['won']/out['total']* 100).round(2)
+    return out
+
+
+OPPORTUNITY_COLUMNS = ['won_opportunities','lost_opportunities','open_opportunities']
+
+ACCOUNT_FILTERS = ["month_year", "account", "sector"]
+
+# "as of" slicers of the 360 pages
+ENTITY_RANGES = ["first_engage_date", "last_close_date"]
+
+
+def account_view(snapshot, filters):
+    account360 = entity_table(snapshot, "account_360")
+    rows = filter_mask(account360, filters, table_index(snapshot, "account_360"))
+    filtered = account360[rows]
+
+    kpis = entity_kpis(filtered, account360)
+    kpis["products_sold"] = filtered['distinct_products_sold'].sum()
+    kpis["active_customers"] = len(filtered)
+
+    return {
+        "rows": np.flatnonzero(rows),
+        "kpis": kpis,
+        "sector_dominance": (filtered.groupby(['office_location','sector'])['revenue_won']
+                             .sum().reset_index()),
+        "rev_acc": topk.top_k_frame(drilldown_view(snapshot, "account", np.flatnonzero(rows))["children"],
+                                    'subsidiary_of', 'revenue_won', k=10),
+        "opp_acc": topk.top_k_frame(filtered, 'account', OPPORTUNITY_COLUMNS, k=10),
+        "win_rate_sector": win_rate_by(filtered, 'sector'),
+        "avg_sales_cycle": (filtered.groupby('sector')['avg_sales_cycle_days']
+                            .mean()
+                            .reset_index()
+                            .sort_values('avg_sales_cycle_days',ascending= False)),
+        "sec_deal": filtered.groupby('sector')['avg_win_deal_value'].mean().reset_index(),
+    }
+
+
+PRODUCT_FILTERS = ["month_year", "product", "series"]
+
+
+def product_view(snapshot, filters):
+    pr360 = entity_table(snapshot, "product_360")
+    rows = filter_mask(pr360, filters, table_index(snapshot, "product_360"))
+    filtered = pr360[rows]
+
+    kpis = entity_kpis(filtered, pr360)
+    kpis["accounts_reached"] = snapshot.get("product_account_sketches").count({'product': filtered['product'].tolist()})
+    kpis["avg_sales_cycle"] = filtered['avg_sales_cycle_days'].mean()
+    kpis["product_count"] = filtered['product'].nunique()
+
+    product_revenue = filtered.groupby(['product'])['revenue_won'].sum().reset_index()
+    product_revenue['rev_fmt'] = product_revenue['revenue_won'].apply(lambda x: millify(x,precision = 1))
+
+    return {
+        "rows": np.flatnonzero(rows),
+        "kpis": kpis,
+        "product_revenue": product_revenue,
+        "opp_prod": topk.top_k_frame(filtered, 'product', OPPORTUNITY_COLUMNS, k=10),
+        "spread": distribution_view(snapshot, {"product": filtered["product"].tolist()}, "product_"),
+        "avg_del": (filtered.groupby('product')['avg_win_deal_value'].mean().reset_index()
+                    .sort_values('avg_win_deal_value',ascending= False)),
+        "win_rate_product": win_rate_by(filtered, 'product'),
+        "prod_ado": (filtered.groupby('product')['distinct_accounts'].sum().reset_index()
+                     .sort_values('distinct_accounts',ascending= False)),
+        "avg_sal": (filtered.groupby('product')['avg_sales_cycle_days'].mean()
+                    .reset_index().sort_values('avg_sales_cycle_days',ascending= False)),
+    }
+
+
+def cross_sell_view(snapshot, products):
+    """Co-purchase rules from the selected products and the accounts they are suggested to."""
+    products = list(products)
+    model = snapshot.get("product_affinity")
+    return {
+        "lift": model.matrix("lift"),
+        "rules": model.rules[model.rules["antecedent"].isin(products)].reset_index(drop=True),
+        "suggestions": model.next_products[model.next_products["product"].isin(products)].reset_index(drop=True),
+    }
+
+
+AGENT_FILTERS = ["month_year", "sales_agent", "regional_office"]
+
+
+def agent_view(snapshot, filters):
+    sa360 = entity_table(snapshot, "sales_agent_360")
+    rows = filter_mask(sa360, filters, table_index(snapshot, "sales_agent_360"))
+    filtered = sa360[rows]
+
+    kpis = entity_kpis(filtered, sa360)
+    kpis["active_customers"] = len(filtered)
+    kpis["accounts_reached"] = snapshot.get("agent_account_sketches").count({'sales_agent': filtered['sales_agent'].tolist()})
+    kpis["avg_sales_cycle"] = filtered['avg_sales_cycle_days'].mean()
+    kpis["agent_count"] = filtered['sales_agent'].nunique()
+
+    agent_revenue = filtered.groupby(['sales_agent'])['revenue_won'].sum().reset_index()
+    agent_revenue['rev_fmt'] = agent_revenue['revenue_won'].apply(lambda x: millify(x,precision = 1))
+
+    return {
+        "rows": np.flatnonzero(rows),
+        "kpis": kpis,
+        "agent_revenue": agent_revenue,
+        "opp_sa": topk.top_k_frame(filtered, 'sales_agent', OPPORTUNITY_COLUMNS, k=10),
+        "spread": distribution_view(snapshot, {"sales_agent": filtered["sales_agent"].tolist()}, "agent_"),
+        "avg_del": (filtered.groupby('sales_agent')['avg_win_deal_value'].mean().reset_index()
+                    .sort_values('avg_win_deal_value',ascending= False)),
+        "win_rate_agent": win_rate_by(filtered, 'sales_agent').sort_values('win_rate', ascending=False),
+        "agco": (filtered.groupby('sales_agent')['distinct_accounts'].sum().reset_index()
+                 .sort_values('distinct_accounts',ascending= False)),
+        "avg_sal": (filtered.groupby('sales_agent')['avg_sales_cycle_days'].mean()
+                    .reset_index().sort_values('avg_sales_cycle_days',ascending= False)),
+        "regs": filtered.groupby('regional_office')['revenue_won'].sum().reset_index(),
+    }
+
+
+# ----------------------------
+# TYPEAHEAD SLICERS
+# ----------------------------
+def typeahead_options(snapshot, page, query, selected, limit=search.TYPEAHEAD_LIMIT):
+    # options sent to the browser: the current selection, then the best matches
+    matches = snapshot.get("typeahead")[page].search(query, limit)
+    chosen = set(selected)
+    return list(selected) + [name for name in matches if name not in chosen]
+
+
+# ----------------------------
+# HIERARCHY DRILL-DOWN
+# ----------------------------
+def hierarchy_rollup(snapshot, page):
+    # node ranges are positions in the page's 360 table, so the aggregation
+    # service's rebuilt tables get their own rollup
+    engine = aggregate.get_engine(snapshot)
+    if engine.local:
+        return snapshot.get("hierarchies")[page]
+    table, levels, root = hierarchy.HIERARCHIES[page]
+    return engine.cached(f"{table}_hierarchy", lambda: hierarchy.HierarchyRollup(
+        entity_table(snapshot, table), levels, root_label=root))
+
+
+def drilldown_view(snapshot, page, rows, path=()):
+    """Breadcrumbs, node totals and children of `path` over the selected 360 rows."""
+    tree = hierarchy_rollup(snapshot, page)
+    path = tuple(path) if tree.valid(path) else ()
+    totals = tree.prefix(rows)
+    return {
+        "path": path,
+        "crumbs": tree.breadcrumbs(path),
+        "level": tree.level_name(path),
+        "node": tree.node(path, totals),
+        "children": tree.children(path, totals),
+    }
+
+
+# ----------------------------
+# COHORT ANALYSIS
+# ----------------------------
+COHORT_FILTERS = ["month_year", "month_since_acquisition"]
+
+
+def _by_cohort(cr, col):
+    # per cohort maximum in calendar order; "%b %Y" labels do not sort by date
+    return (cr.groupby(['cohort_month', 'month_year'], as_index=False)[col]
+            .max()
+            .sort_values('cohort_month')
+            .drop(columns='cohort_month'))
+
+
+def cohort_view(snapshot, filters):
+    cr = snapshot.tables["cohort"]
+    rows = filter_mask(cr, filters)
+    filtered = cr[rows]
+
+    kpis = {
+        "revenue": filtered['total_revenue_cohort_customers'].max(),
+        "avg_month_repeat": filtered['avg_months_to_repeat'].max(),
+        "repeat_purchase": (filtered['retention_rate'].max()) * 100,
+        "repeat_customer": filtered['repeat_customers'].max(),
+        "cohort_size": filtered['cohort_customers'].max(),
+    }
+
+    return {
+        "rows": np.flatnonzero(rows),
+        "kpis": kpis,
+        "crco": _by_cohort(cr, 'cohort_customers'),
+        "crcr": _by_cohort(cr, 'total_revenue_cohort_customers'),
+        "ret": (cr.groupby(['cohort_month', 'month_year', 'month_since_acquisition'], as_index=False)
+                .agg(retention_by_month=('retention_by_month', 'max'))
+                .sort_values(['cohort_month', 'month_since_acquisition'])
+                .drop(columns='cohort_month')),
+        "cr_avg": _by_cohort(cr, 'avg_months_to_repeat'),
+        "cr_repeat": _by_cohort(cr, 'repeat_customers'),
+    }
+
+
+# page name -> view(snapshot, filters, *extra), used to recompute a memo
+# entry from its key alone
+PAGE_VIEWS = {
+    "executive": executive_view,
+    "account": account_view,
+    "product": product_view,
+    "agent": agent_view,
+    "cohort": cohort_view,
+}
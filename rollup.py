@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from data_model import OPEN_STAGES
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+GRAINS = {"day": "D", "week": "W-SUN", "month": "M", "quarter": "Q", "year": "Y"}
+
+# KPI card comparison -> calendar grain it steps back by
+COMPARISONS = {"MoM": "month", "QoQ": "quarter", "YoY": "year"}
+
+# measure -> (date column it is booked on, value column or None to count rows, deal stages)
+PIPELINE_MEASURES = {
+    "revenue": ("close_date", "close_value", ["Won"]),
+    "won": ("close_date", None, ["Won"]),
+    "lost": ("close_date", None, ["Lost"]),
+}
+
+
+# ----------------------------
+# CALENDAR ROLLUP INDEX
+# ----------------------------
+class CalendarRollup:
+    """
+    Prefix sums of daily measures per cell of `dims`.
+
+    The day grid starts on January 1st of the first year in the data, so
+    every week / month / quarter / year boundary is a grid offset. The sum of
+    a measure over any date range is one subtraction per selected cell, and
+    the per-grain period starts turn a whole trend into a single gather.
+    Deals still open have no booking date and are counted per cell.
+    """
+
+    def __init__(self, start, dims, cells, sums, periods, open_deals):
+        self.start = start            # Timestamp of grid offset 0
+        self.dims = dims
+        self.cells = cells            # DataFrame of dim values, one row per cell
+        self.sums = sums              # measure -> (n_cells, n_days + 1) prefix sums
+        self.periods = periods        # grain -> (period start offsets, period labels)
+        self.open_deals = open_deals  # open deals per cell
+
+    @classmethod
+    def from_frame(cls, df, dims, measures=PIPELINE_MEASURES):
+        dates = pd.concat([df[date_col] for date_col, _, _ in measures.values()]).dropna()
+        start = pd.Timestamp(year=dates.min().year, month=1, day=1)
+        end = dates.max().normalize()
+        n_days = (end - start).days + 1
+
+        if dims:
+            # rows with a missing dim value get code -1 and are left out
+            groups = df.groupby(dims, sort=True, dropna=True)
+            codes = groups.ngroup().to_numpy(dtype="float64", na_value=-1).astype(np.intp)
+            cells = groups.size().index.to_frame(index=False)
+        else:
+            codes, cells = np.zeros(len(df), dtype=np.intp), pd.DataFrame(index=[0])
+        n_cells = len(cells)
+
+        sums = {}
+        for name, (date_col, value_col, stages) in measures.items():
+            day = ((df[date_col] - start).dt.days).to_numpy(dtype="float64", na_value=np.nan)
+            keep = ~np.isnan(day) & (codes >= 0)
+            if stages is not None:
+                keep &= df["deal_stage"].isin(stages).to_numpy()
+            weights = None if value_col is None else df[value_col].to_numpy(dtype="float64", na_value=0)[keep]
+            flat = codes[keep] * n_days + day[keep].astype(np.int64)
+            daily = np.bincount(flat, weights=weights, minlength=n_cells * n_days).reshape(n_cells, n_days)
+            prefix = np.zeros((n_cells, n_days + 1))
+            np.cumsum(daily, axis=1, out=prefix[:, 1:])
+            sums[name] = prefix
+
+        is_open = df["deal_stage"].isin(OPEN_STAGES).to_numpy() & (codes >= 0)
+        open_deals = np.bincount(codes[is_open], minlength=n_cells)
+
+        periods = {}
+        days = pd.date_range(start, periods=n_days, freq="D")
+        for grain, freq in GRAINS.items():
+            period = days.to_period(freq)
+            first = np.flatnonzero(np.r_[True, period[1:] != period[:-1]])
+            periods[grain] = (first, period[first])
+        return cls(start, list(dims), cells, sums, periods, open_deals)
+
+    @property
+    def n_days(self):
+        return next(iter(self.sums.values())).shape[1] - 1
+
+    @property
+    def last_date(self):
+        return self.start + pd.Timedelta(days=self.n_days - 1)
+
+    def offset(self, date):
+        # grid offset of a date, clamped to the grid
+        return int(np.clip((pd.Timestamp(date).normalize() - self.start).days, 0, self.n_days))
+
+    def select(self, filters=None):
+        """Positions of the cells matching {dim: values}; None keeps every cell."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for col, vals in (filters or {}).items():
+            if vals is not None and col in self.dims:
+                mask &= self.cells[col].isin(vals).to_numpy()
+        return np.flatnonzero(mask)
+
+    def total(self, measure, lo, hi, cells=None):
+        """Sum of `measure` over grid offsets [lo, hi)."""
+        prefix = self.sums[measure] if cells is None else self.sums[measure][cells]
+        return float((prefix[:, hi] - prefix[:, lo]).sum())
+
+    def series(self, measure, grain, cells=None):
+        """Per-period totals of `measure`, indexed by period."""
+        first, labels = self.periods[grain]
+        prefix = self.sums[measure] if cells is None else self.sums[measure][cells]
+        bounds = np.r_[first, self.n_days]
+        return pd.Series(np.diff(prefix[:, bounds].sum(axis=0)), index=labels, name=measure)
+
+    def compare(self, comparison, as_of, cells=None):
+        """
+        (current, previous) measure totals for a MoM / QoQ / YoY comparison:
+        the period containing `as_of` up to that day against the same number
+        of days at the start of the period before. `previous` is None when
+        that period lies before the data. Both carry the deals open today
+        as "open", the way the cards count them whatever the period.
+        """
+        first, _ = self.periods[COMPARISONS[comparison]]
+        end = self.offset(as_of) + 1
+        p = int(np.searchsorted(first, end - 1, side="right")) - 1
+        lo = int(first[p])
+        open_deals = float(self.open_deals.sum() if cells is None else self.open_deals[cells].sum())
+        current = {m: self.total(m, lo, end, cells) for m in self.sums}
+        current["open"] = open_deals
+        if p == 0:
+            return current, None
+        prev_lo = int(first[p - 1])
+        prev_hi = min(prev_lo + (end - lo), lo)
+        previous = {m: self.total(m, prev_lo, prev_hi, cells) for m in self.sums}
+        previous["open"] = open_deals
+        return current, previous
+
+
+def build_rollups(tables):
+    # one index per page: the executive page slices the enriched pipeline by
+    # product / region, the 360 pages slice the full pipeline by their entity
+    pipeline = tables["sales_pipeline"]
+    return {
+        "executive": CalendarRollup.from_frame(tables["enriched"], ["product", "office_location"]),
+        "account": CalendarRollup.from_frame(pipeline, ["account"]),
+        "product": CalendarRollup.from_frame(pipeline, ["product"]),
+        "agent": CalendarRollup.from_frame(pipeline, ["sales_agent"]),
+    }
+
+
+# ----------------------------
+# KPI DELTAS
+# ----------------------------
+def kpi_totals(totals):
+    # the card formulas over one period: opportunities are the deals closed
+    # in it plus the open ones, the win rate is won over those opportunities
+    won, lost = totals["won"], totals["lost"]
+    total = won + lost + totals["open"]
+    return {
+        "revenue": totals["revenue"],
+        "total_opps": total,
+        "won_opps": won,
+        "lost_opps": lost,
+        "win_rate": (won / total * 100) if total > 0 else None,
+        "avg_deal_value": (totals["revenue"] / won) if won > 0 else None,
+    }
+
+
+def kpi_deltas(rollup, comparison, as_of, filters=None):
+    """kpi -> (current, previous) for the cards; previous is None without history."""
+    current, previous = rollup.compare(comparison, as_of, rollup.select(filters))
+    current = kpi_totals(current)
+    previous = kpi_totals(previous) if previous is not None else {}
+    return {kpi: (value, previous.get(kpi)) for kpi, value in current.items()}
+
+
+def format_delta(delta, comparison, points=False):
+    """'▲ 12.4% MoM' style caption; rates change by percentage points."""
+    if delta is None:
+        return ""
+    current, previous = delta
+    if current is None or previous is None:
+        return f"– no prior {COMPARISONS[comparison]}"
+    if points:
+        change, unit = current - previous, " pp"
+    elif previous == 0:
+        return f"▲ new {comparison}" if current > 0 else f"■ flat {comparison}"
+    else:
+        change, unit = (current - previous) / abs(previous) * 100, "%"
+    arrow = "▲" if change > 0 else "▼" if change < 0 else "■"
+    return f"{arrow} {abs(change):.1f}{unit} {comparison}"
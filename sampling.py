@@ -0,0 +1,183 @@
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from data_model import OPEN_STAGES
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+STRATA = ["deal_stage", "product"]
+
+# sample fractions used by the progressive sampler, the last one is exact
+REFINEMENT_LEVELS = (0.02, 0.10, 0.30, 1.0)
+
+# every stratum keeps at least this many rows (or all of them) so rare
+# combinations such as GTK 500 deals are never lost
+MIN_PER_STRATUM = 30
+
+Z_95 = 1.96
+
+
+# ----------------------------
+# ESTIMATES
+# ----------------------------
+class Estimate(namedtuple("Estimate", ["value", "low", "high"])):
+    """Point estimate with its 95% confidence interval."""
+
+    @property
+    def rel_error(self):
+        if not self.value:
+            return 0.0
+        return (self.high - self.low) / 2 / abs(self.value)
+
+
+def format_estimate(est, fmt):
+    # "1,234 ±0.8%" style label for KPI cards; exact values show no interval
+    label = fmt(est.value)
+    if est.rel_error >= 0.0005:
+        label += f" <small>±{est.rel_error:.1%}</small>"
+    return label
+
+
+# ----------------------------
+# STRATIFIED SAMPLE
+# ----------------------------
+class StratifiedSample:
+    """
+    A stratified random sample of a fact table. Totals are expanded by N_h/n_h
+    per stratum and their variance follows the stratified SRS formula with
+    finite population correction, so a fraction of 1.0 gives exact values.
+    """
+
+    def __init__(self, frame, stratum, n_h, N_h, fraction):
+        self.frame = frame
+        self.stratum = stratum
+        self.n_h = n_h
+        self.N_h = N_h
+        self.fraction = fraction
+        self.weight = (N_h / np.maximum(n_h, 1))[stratum]
+
+    @classmethod
+    def draw(cls, df, fraction, strata=STRATA, min_per_stratum=MIN_PER_STRATUM, seed=0):
+        codes, _ = pd.factorize(pd.MultiIndex.from_frame(df[strata].astype(str)))
+        N_h = np.bincount(codes).astype("float64")
+        n_h = np.minimum(N_h, np.maximum(np.ceil(N_h * fraction), min_per_stratum))
+
+        # random order inside each stratum, keep the first n_h rows of it
+        keys = np.random.default_rng(seed).random(len(df))
+        order = np.lexsort((keys, codes))
+        starts = np.concatenate([[0], np.cumsum(N_h)[:-1]]).astype(np.intp)
+        rank = np.arange(len(df)) - starts[codes[order]]
+        keep = np.sort(order[rank < n_h[codes[order]]])
+
+        return cls(df.iloc[keep].reset_index(drop=True), codes[keep], n_h, N_h, fraction)
+
+    def _total_and_var(self, y):
+        H = len(self.N_h)
+        n_h = self.n_h
+        sum_y = np.bincount(self.stratum, weights=y, minlength=H)
+        sum_y2 = np.bincount(self.stratum, weights=y * y, minlength=H)
+        mean_h = sum_y / np.maximum(n_h, 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var_h = np.where(n_h > 1, (sum_y2 - n_h * mean_h ** 2) / (n_h - 1), 0.0)
+        fpc = 1 - n_h / np.maximum(self.N_h, 1)
+        total = float(np.sum(self.N_h * mean_h))
+        var = float(np.sum(self.N_h ** 2 * fpc * np.maximum(var_h, 0) / np.maximum(n_h, 1)))
+        return total, var
+
+    def total(self, y, mask=None):
+        y = np.nan_to_num(np.asarray(y, dtype="float64"))
+        if mask is not None:
+            y = y * mask
+        total, var = self._total_and_var(y)
+        half = Z_95 * np.sqrt(var)
+        return Estimate(total, total - half, total + half)
+
+    def count(self, mask):
+        return self.total(np.ones(len(self.frame)), mask)
+
+    def ratio(self, y, x, mask=None):
+        # linearized variance of Y/X
+        y = np.nan_to_num(np.asarray(y, dtype="float64"))
+        x = np.nan_to_num(np.asarray(x, dtype="float64"))
+        if mask is not None:
+            y, x = y * mask, x * mask
+        Y, _ = self._total_and_var(y)
+        X, _ = self._total_and_var(x)
+        if X == 0:
+            return Estimate(np.nan, np.nan, np.nan)
+        r = Y / X
+        _, var_z = self._total_and_var(y - r * x)
+        half = Z_95 * np.sqrt(var_z) / abs(X)
+        return Estimate(r, r - half, r + half)
+
+    def expanded(self, columns=("close_value",)):
+        # frame whose additive columns are weighted, so plain groupby sums
+        # over it are unbiased estimates of the population sums
+        out = self.frame.copy()
+        for col in columns:
+            out[col] = out[col] * self.weight
+        return out
+
+
+def pipeline_kpis(sample, mask):
+    """Pipeline KPI estimates for the rows of `sample.frame` selected by `mask`."""
+    frame = sample.frame
+    mask = np.asarray(mask, dtype="float64")
+    stage = frame["deal_stage"].to_numpy()
+    won = (stage == "Won").astype("float64")
+    lost = (stage == "Lost").astype("float64")
+    is_open = np.isin(stage, OPEN_STAGES).astype("float64")
+    closed = won + lost
+    value = frame["close_value"].to_numpy()
+    cycle = (frame["close_date"] - frame["engage_date"]).dt.days.to_numpy(dtype="float64", na_value=np.nan)
+
+    return {
+        "revenue": sample.total(value * won, mask),
+        "total_opps": sample.count(mask),
+        "won_opps": sample.count(won * mask),
+        "lost_opps": sample.count(lost * mask),
+        "open_opps": sample.count(is_open * mask),
+        "win_rate": sample.ratio(won * 100, np.ones(len(frame)), mask),
+        "avg_deal_value": sample.ratio(value * won, won, mask),
+        "avg_sales_cycle": sample.ratio(np.nan_to_num(cycle) * closed, closed * ~np.isnan(cycle), mask),
+    }
+
+
+# ----------------------------
+# PROGRESSIVE REFINEMENT
+# ----------------------------
+class ProgressiveSampler:
+    """
+    Draws the smallest sample synchronously, then refines towards the full
+    table in a background daemon thread. `current()` always returns the most
+    precise sample finished so far.
+    """
+
+    def __init__(self, df, levels=REFINEMENT_LEVELS, strata=STRATA, seed=0):
+        self._df = df
+        self._levels = levels
+        self._strata = strata
+        self._seed = seed
+        self._lock = threading.Lock()
+        self._current = StratifiedSample.draw(df, levels[0], strata, seed=seed)
+        self._thread = threading.Thread(target=self._refine, name="progressive-sampler", daemon=True)
+        self._thread.start()
+
+    def _refine(self):
+        for fraction in self._levels[1:]:
+            sample = StratifiedSample.draw(self._df, fraction, self._strata, seed=self._seed)
+            with self._lock:
+                self._current = sample
+
+    def current(self):
+        with self._lock:
+            return self._current
+
+    @property
+    def done(self):
+        return self.current().fraction >= self._levels[-1]
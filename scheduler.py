@@ -0,0 +1,136 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# heavy computations allowed to run at the same time in one server process
+MAX_CONCURRENT = int(os.environ.get("CRM_MAX_HEAVY", str(max(2, (os.cpu_count() or 2) // 2))))
+
+# lower runs first
+INTERACTIVE = 0   # KPI cards and charts of the page being looked at
+BULK = 1          # raw-table materialization and exports
+BACKGROUND = 2    # usage-driven precomputation
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk", BACKGROUND: "background"}
+
+# wait times kept for the percentile metrics
+WAIT_WINDOW = 1000
+
+
+# ----------------------------
+# SCHEDULER
+# ----------------------------
+class Scheduler:
+    """
+    Admission control for expensive reruns.
+
+    At most `max_concurrent` tasks run at once; waiting tasks are admitted by
+    priority, then arrival order. One slot is kept for INTERACTIVE work, so
+    raw tables and background warm-ups can never starve KPI reruns. Tasks
+    submitted with the same key while one is in flight wait for that result
+    instead of running again. Tasks run in the calling thread.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT):
+        self.max_concurrent = max(1, max_concurrent)
+        self.running = 0
+        self.completed = 0
+        self.coalesced = 0
+        self._queue = []
+        self._seq = itertools.count()
+        self._inflight = {}
+        self._waits = {p: deque(maxlen=WAIT_WINDOW) for p in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+
+    def _limit(self, priority):
+        if priority == INTERACTIVE or self.max_concurrent == 1:
+            return self.max_concurrent
+        return self.max_concurrent - 1
+
+    def _acquire(self, priority):
+        ticket = (priority, next(self._seq))
+        start = time.perf_counter()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            # admitted when first in line and a slot for this priority is free
+            while self._queue[0] != ticket or self.running >= self._limit(priority):
+                self._cond.wait(timeout=1.0)
+            heapq.heappop(self._queue)
+            self.running += 1
+            self._waits[priority].append(time.perf_counter() - start)
+            self._cond.notify_all()
+
+    def _release(self):
+        with self._cond:
+            self.running -= 1
+            self.completed += 1
+            self._cond.notify_all()
+
+    def run(self, key, priority, fn):
+        """Run `fn()` under admission control; `key=None` disables coalescing."""
+        if key is not None:
+            with self._cond:
+                future = self._inflight.get(key)
+                if future is not None:
+                    self.coalesced += 1
+                else:
+                    owner = self._inflight[key] = Future()
+            if future is not None:
+                return future.result()
+            future = owner
+
+        self._acquire(priority)
+        try:
+            result = fn()
+        except BaseException as exc:
+            if key is not None:
+                future.set_exception(exc)
+            raise
+        else:
+            if key is not None:
+                future.set_result(result)
+            return result
+        finally:
+            self._release()
+            if key is not None:
+                with self._cond:
+                    self._inflight.pop(key, None)
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def stats(self):
+        with self._cond:
+            waits = {PRIORITY_NAMES[p]: sorted(w) for p, w in self._waits.items()}
+            out = {
+                "running": self.running,
+                "queued": len(self._queue),
+                "completed": self.completed,
+                "coalesced": self.coalesced,
+            }
+        for name, w in waits.items():
+            out[f"{name}_wait_ms"] = 1000 * (sum(w) / len(w)) if w else 0.0
+            out[f"{name}_p95_ms"] = 1000 * w[int(0.95 * (len(w) - 1))] if w else 0.0
+        return out
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    # one scheduler per server process, shared by every session
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler()
+    return _scheduler
@@ -0,0 +1,99 @@
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# options sent to the browser per search, on top of the current selection
+TYPEAHEAD_LIMIT = int(os.environ.get("CRM_TYPEAHEAD_LIMIT", "20"))
+
+# share of the query trigrams a name must contain to count as a fuzzy match
+MIN_SIMILARITY = 0.5
+
+# page -> (360 table, name column, ranking column)
+TYPEAHEAD_FIELDS = {
+    "account": ("account_360", "account", "revenue_won"),
+    "agent": ("sales_agent_360", "sales_agent", "revenue_won"),
+}
+
+
+def _normalize(text):
+    return " ".join(re.findall(r"\w+", str(text).lower()))
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# ----------------------------
+# TYPEAHEAD INDEX
+# ----------------------------
+class TypeaheadIndex:
+    """
+    Search-as-you-type over entity names, best matches ranked by a score.
+
+    Matches are tiered: names starting with the query, then names with a word
+    starting with it (both found by binary search over the sorted word
+    suffixes), then fuzzy matches sharing enough trigrams with the query.
+    Within a tier higher scores (revenue) come first.
+    """
+
+    def __init__(self, names, scores):
+        self.names = np.asarray(pd.Series(names).astype(str), dtype=object)
+        self.scores = np.nan_to_num(np.asarray(scores, dtype="float64"))
+        keys = [_normalize(name) for name in self.names]
+
+        # every word start of every name, sorted, for prefix range lookups
+        tokens = sorted(
+            (key[m.start():], pos, m.start() == 0)
+            for pos, key in enumerate(keys) for m in re.finditer(r"\w+", key)
+        )
+        self.token_keys = np.array([t[0] for t in tokens], dtype=object)
+        self.token_pos = np.array([t[1] for t in tokens], dtype=np.intp)
+        self.token_first = np.array([t[2] for t in tokens], dtype=bool)
+
+        grams = defaultdict(list)
+        for pos, key in enumerate(keys):
+            for gram in _trigrams(key):
+                grams[gram].append(pos)
+        self.grams = {gram: np.array(pos, dtype=np.intp) for gram, pos in grams.items()}
+        self.by_score = np.argsort(-self.scores, kind="stable")
+
+    def search(self, query, limit=TYPEAHEAD_LIMIT):
+        """Up to `limit` names matching `query`; the top scored names for an empty query."""
+        q = _normalize(query)
+        if not q:
+            return self.names[self.by_score[:limit]].tolist()
+
+        tier = np.zeros(len(self.names))
+        lo = np.searchsorted(self.token_keys, q, side="left")
+        hi = np.searchsorted(self.token_keys, q + "\uffff", side="left")
+        tier[self.token_pos[lo:hi]] = 2.0
+        tier[self.token_pos[lo:hi][self.token_first[lo:hi]]] = 3.0
+
+        query_grams = _trigrams(q)
+        if len(q) >= 3:
+            shared = np.zeros(len(self.names))
+            for gram in query_grams:
+                if gram in self.grams:
+                    shared[self.grams[gram]] += 1
+            similarity = shared / len(query_grams)
+            # similarity only admits a name; fuzzy matches rank by score like the other tiers
+            tier[(tier == 0) & (similarity >= MIN_SIMILARITY)] = 1.0
+
+        found = np.flatnonzero(tier > 0)
+        order = np.lexsort((-self.scores[found], -tier[found]))
+        return self.names[found[order][:limit]].tolist()
+
+
+def build_indexes(tables):
+    return {
+        page: TypeaheadIndex(tables[table][name], tables[table][score])
+        for page, (table, name, score) in TYPEAHEAD_FIELDS.items()
+    }
@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import data_model
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# /dev/shm is RAM backed, every worker mapping a file there shares its pages
+_DEFAULT_DIR = "/dev/shm/crm-dashboard" if os.path.isdir("/dev/shm") else os.path.join(".cache", "shared")
+SHARED_DIR = os.environ.get("CRM_SHARED_DIR", _DEFAULT_DIR)
+
+# CRM_SHARED_DATA=1 makes the dashboard attach to the published dataset
+# instead of parsing Resources/ itself
+SHARED_ENABLED = os.environ.get("CRM_SHARED_DATA", "0") == "1"
+
+# published versions kept next to the current one; older ones are removed
+# once a newer version is published
+KEEP_VERSIONS = 1
+
+MANIFEST = "manifest.json"
+LAYOUT = "layout.json"
+
+
+# ----------------------------
+# COLUMN LAYOUT
+# ----------------------------
+# every column is one .npy file mapped read-only by the workers:
+#   array     numeric / bool values, used as they are
+#   datetime  int64 nanoseconds viewed as datetime64
+#   masked    values plus a mask file for nullable (Int64, boolean) columns
+#   string    Arrow large_string buffers (offsets, utf-8 bytes, validity
+#             bitmap); workers wrap the mapped buffers without copying
+#   text      int32 codes into a dictionary stored in the layout, for object
+#             columns that are not all strings; workers rebuild the column
+def _save(path, values):
+    np.save(path, np.ascontiguousarray(values), allow_pickle=False)
+
+
+def _write_column(path, name, series):
+    file = f"{name}.npy"
+    dtype = series.dtype
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(series.array, "_mask"):
+        values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        _save(os.path.join(path, file), values)
+        _save(os.path.join(path, f"{name}.mask.npy"), series.isna().to_numpy())
+        return {"kind": "masked", "file": file, "mask": f"{name}.mask.npy", "dtype": str(dtype)}
+    if pd.api.types.is_datetime64_dtype(dtype):
+        _save(os.path.join(path, file), series.to_numpy().view("int64"))
+        return {"kind": "datetime", "file": file, "dtype": str(dtype)}
+    if dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        array = pa.array(series, type=pa.large_string(), from_pandas=True)
+        validity, offsets, data = array.buffers()
+        spec = {"kind": "string", "rows": len(array), "file": file, "data": f"{name}.data.npy"}
+        _save(os.path.join(path, file), np.frombuffer(offsets, dtype=np.int64)[:len(array) + 1])
+        _save(os.path.join(path, spec["data"]), np.frombuffer(data, dtype=np.uint8) if data else np.zeros(0, np.uint8))
+        if array.null_count:
+            spec["validity"] = f"{name}.valid.npy"
+            _save(os.path.join(path, spec["validity"]), np.frombuffer(validity, dtype=np.uint8))
+        return spec
+    if dtype == object:
+        codes, uniques = pd.factorize(series)
+        _save(os.path.join(path, file), codes.astype("int32"))
+        return {"kind": "text", "file": file, "categories": uniques.tolist()}
+    _save(os.path.join(path, file), series.to_numpy())
+    return {"kind": "array", "file": file}
+
+
+def _map(path):
+    # plain ndarray view of a read-only mapping, the mapping stays alive as its base
+    return np.load(path, mmap_mode="r").view(np.ndarray)
+
+
+def _buffer(path, file):
+    # pyarrow buffer over a mapped file; the mapping stays alive as its base
+    return pa.py_buffer(_map(os.path.join(path, file)))
+
+
+def _read_column(path, spec):
+    if spec["kind"] == "string":
+        validity = spec.get("validity")
+        array = pa.LargeStringArray.from_buffers(
+            spec["rows"], _buffer(path, spec["file"]), _buffer(path, spec["data"]),
+            _buffer(path, validity) if validity else None)
+        return pd.Series(pd.arrays.ArrowExtensionArray(array), copy=False)
+    values = _map(os.path.join(path, spec["file"]))
+    if spec["kind"] == "masked":
+        mask = _map(os.path.join(path, spec["mask"]))
+        array_type = pd.api.types.pandas_dtype(spec["dtype"]).construct_array_type()
+        return pd.Series(array_type(values, mask), copy=False)
+    if spec["kind"] == "datetime":
+        return pd.Series(values.view(spec["dtype"]), copy=False)
+    if spec["kind"] == "text":
+        categories = np.array(spec["categories"] + [np.nan], dtype=object)
+        return pd.Series(categories[values], dtype=object)   # code -1 -> NaN
+    return pd.Series(values, copy=False)
+
+
+def _write_frame(path, df):
+    os.makedirs(path)
+    columns = {str(col): _write_column(path, f"c{i}", df[col]) for i, col in enumerate(df.columns)}
+    return {"kind": "frame", "rows": len(df), "columns": columns}
+
+
+def _read_frame(path, spec):
+    return pd.DataFrame({col: _read_column(path, c) for col, c in spec["columns"].items()}, copy=False)
+
+
+# ----------------------------
+# BUNDLES
+# ----------------------------
+# a bundle is a flat dict of name -> DataFrame | ndarray | json value, the
+# same shape the disk cache stores
+def write_bundle(path, bundle):
+    os.makedirs(path)
+    items = {}
+    for name, value in bundle.items():
+        if isinstance(value, pd.DataFrame):
+            items[name] = _write_frame(os.path.join(path, name), value.reset_index(drop=True))
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            _save(os.path.join(path, f"{name}.npy"), value)
+            items[name] = {"kind": "array", "file": f"{name}.npy"}
+        else:
+            items[name] = {"kind": "json", "value": value}
+    with open(os.path.join(path, LAYOUT), "w") as file:
+        json.dump(items, file, default=lambda v: v.item())  # numpy scalars
+
+
+def read_bundle(path):
+    with open(os.path.join(path, LAYOUT)) as file:
+        items = json.load(file)
+    bundle = {}
+    for name, item in items.items():
+        if item["kind"] == "frame":
+            bundle[name] = _read_frame(os.path.join(path, name), item)
+        elif item["kind"] == "array":
+            bundle[name] = _map(os.path.join(path, item["file"]))
+        else:
+            bundle[name] = item["value"]
+    return bundle
+
+
+# ----------------------------
+# PUBLISH / ATTACH
+# ----------------------------
+def current_version(root=SHARED_DIR):
+    """Version named by the manifest, None when nothing is published."""
+    try:
+        with open(os.path.join(root, MANIFEST)) as file:
+            return json.load(file)["current"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def publish(version, tables, derived=None, root=SHARED_DIR):
+    """
+    Write `tables` and the `derived` bundles under root/<version>, then point
+    the manifest at it. The version directory is renamed into place, so
+    workers never see a half-written dataset.
+    """
+    os.makedirs(root, exist_ok=True)
+    final = os.path.join(root, version)
+    if not os.path.isdir(final):
+        tmp = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            write_bundle(os.path.join(tmp, "tables"), tables)
+            for name, bundle in (derived or {}).items():
+                write_bundle(os.path.join(tmp, "derived", name), bundle)
+            os.rename(tmp, final)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.isdir(final):
+                raise
+
+    manifest = os.path.join(root, MANIFEST)
+    tmp = f"{manifest}.{os.getpid()}.tmp"
+    with open(tmp, "w") as file:
+        json.dump({"current": version, "published": time.time(), "derived": sorted(derived or {})}, file)
+    os.replace(tmp, manifest)
+    reclaim(root)
+
+
+def reclaim(root=SHARED_DIR, keep=KEEP_VERSIONS):
+    # workers still mapping a removed file keep valid pages, the memory is
+    # released when their last mapping of it goes away
+    current = current_version(root)
+    versions = sorted(
+        (entry for entry in os.scandir(root)
+         if entry.is_dir() and entry.name != current and not entry.name.startswith(".tmp-")),
+        key=lambda entry: entry.stat().st_mtime, reverse=True,
+    )
+    for entry in versions[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def attach(version, root=SHARED_DIR):
+    """Read-only, zero-copy tables of a published version."""
+    return read_bundle(os.path.join(root, version, "tables"))
+
+
+def attach_derived(version, name, root=SHARED_DIR):
+    path = os.path.join(root, version, "derived", name)
+    if not os.path.isdir(path):
+        return None
+    return read_bundle(path)
+
+
+# ----------------------------
+# LOADER PROCESS
+# ----------------------------
+def publish_resources(resource_dir=data_model.RESOURCE_DIR, root=SHARED_DIR):
+    """Parse Resources/ once and publish tables plus persisted aggregates."""
+    import data_store  # the builders live there; data_store imports this module
+
+    version = data_model.data_version(resource_dir)
+    if version == current_version(root):
+        return version
+    snapshot = data_store.Snapshot(version, data_model.load_all_tables(resource_dir))
+    derived = {name: encode(snapshot.get(name)) for name, (encode, _) in data_store.PERSISTED.items()}
+    publish(version, snapshot.tables, derived, root)
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish the dashboard dataset to shared memory.")
+    parser.add_argument("--resources", default=data_model.RESOURCE_DIR)
+    parser.add_argument("--root", default=SHARED_DIR)
+    parser.add_argument("--watch", action="store_true", help="keep publishing when Resources/ changes")
+    parser.add_argument("--interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    served = None
+    while True:
+        try:
+            version = publish_resources(args.resources, args.root)
+            if version != served:
+                print(f"{time.strftime('%H:%M:%S')} serving {version} from {args.root}", flush=True)
+                served = version
+        except Exception as exc:  # keep the previous version published
+            print(f"{time.strftime('%H:%M:%S')} publish failed: {type(exc).__name__}: {exc}", flush=True)
+        if not args.watch:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
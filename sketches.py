@@ -0,0 +1,160 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# precision p -> 2**p one-byte registers per sketch.
+# relative standard error of a HyperLogLog estimate is 1.04 / sqrt(2**p):
+#   p=10 -> 3.25%   p=12 -> 1.63%   p=14 -> 0.81%
+# roughly 95% of estimates fall within twice that bound.
+DEFAULT_PRECISION = 14
+
+# CRM_EXACT_DISTINCT=1 forces exact distinct counts everywhere
+EXACT_DISTINCT = os.environ.get("CRM_EXACT_DISTINCT", "0") == "1"
+
+
+def standard_error(p=DEFAULT_PRECISION):
+    return 1.04 / np.sqrt(2 ** p)
+
+
+def hash_values(values):
+    # stable 64-bit hash, identical across processes and runs
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+def _bit_length(x):
+    # exact bit length of uint64 values, float64 is exact below 2**32
+    hi = (x >> np.uint64(32)).astype("float64")
+    lo = (x & np.uint64(0xFFFFFFFF)).astype("float64")
+    bl_hi = np.frexp(hi)[1]
+    bl_lo = np.frexp(lo)[1]
+    return np.where(hi > 0, 32 + bl_hi, bl_lo)
+
+
+def register_updates(hashes, p):
+    """Register index and rank (position of the first set bit) for each hash."""
+    hashes = np.asarray(hashes, dtype="uint64")
+    index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - p)) - 1)
+    rank = (64 - p) - _bit_length(rest) + 1
+    return index, rank.astype("uint8")
+
+
+def estimate(registers):
+    """HyperLogLog cardinality estimate with the linear-counting small-range fix."""
+    registers = np.asarray(registers)
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=-1)
+    zeros = np.sum(registers == 0, axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+# ----------------------------
+# SINGLE SKETCH
+# ----------------------------
+class HyperLogLog:
+    """Mergeable distinct-count sketch; merging is an element-wise max."""
+
+    def __init__(self, p=DEFAULT_PRECISION, registers=None):
+        self.p = p
+        self.registers = np.zeros(2 ** p, dtype="uint8") if registers is None else registers
+
+    def add(self, values):
+        index, rank = register_updates(hash_values(values), self.p)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("cannot merge sketches with different precision")
+        return HyperLogLog(self.p, np.maximum(self.registers, other.registers))
+
+    def count(self):
+        return int(round(float(estimate(self.registers))))
+
+    @property
+    def relative_error(self):
+        return standard_error(self.p)
+
+
+# ----------------------------
+# SKETCH PER CUBE CELL
+# ----------------------------
+class DistinctCube:
+    """
+    One HyperLogLog per combination of `dims` values over a fact table.
+
+    `count(filters)` merges the sketches of every cell allowed by the filters
+    (column -> allowed values, None means all; NaN is a regular value). With
+    exact=True the count is taken from the per-row value codes instead.
+    """
+
+    def __init__(self, dims, value, p, cell_values, cell_registers, row_cells, row_values):
+        self.dims = dims
+        self.value = value
+        self.p = p
+        self.cell_values = cell_values
+        self.cell_registers = cell_registers
+        self._row_cells = row_cells
+        self._row_values = row_values
+
+    @classmethod
+    def from_frame(cls, df, dims, value, p=DEFAULT_PRECISION):
+        if dims:
+            cell_ids, cells = pd.factorize(pd.MultiIndex.from_arrays([df[d] for d in dims]), use_na_sentinel=False)
+            cell_values = pd.DataFrame(list(cells), columns=dims) if len(cells) else pd.DataFrame(columns=dims)
+        else:
+            cell_ids = np.zeros(len(df), dtype=np.intp)
+            cell_values = pd.DataFrame(index=[0])
+
+        present = df[value].notna().to_numpy()
+        registers = np.zeros((len(cell_values), 2 ** p), dtype="uint8")
+        index, rank = register_updates(hash_values(df[value].to_numpy()[present]), p)
+        np.maximum.at(registers, (cell_ids[present], index), rank)
+
+        row_values = pd.factorize(df[value])[0]
+        return cls(list(dims), value, p, cell_values, registers, cell_ids, row_values)
+
+    def to_bundle(self):
+        # flat dict of frames / arrays for the disk cache
+        return {
+            "meta": {"dims": self.dims, "value": self.value, "p": self.p},
+            "cell_values": self.cell_values,
+            "cell_registers": self.cell_registers,
+            "row_cells": self._row_cells,
+            "row_values": self._row_values,
+        }
+
+    @classmethod
+    def from_bundle(cls, bundle):
+        meta = bundle["meta"]
+        return cls(meta["dims"], meta["value"], meta["p"], bundle["cell_values"],
+                   bundle["cell_registers"], bundle["row_cells"], bundle["row_values"])
+
+    def _cell_mask(self, filters):
+        mask = np.ones(len(self.cell_values), dtype=bool)
+        for col, vals in (filters or {}).items():
+            if vals is not None:
+                mask &= pd.Index(self.cell_values[col]).isin(list(vals))
+        return mask
+
+    def sketch(self, filters=None):
+        mask = self._cell_mask(filters)
+        if not mask.any():
+            return HyperLogLog(self.p)
+        return HyperLogLog(self.p, self.cell_registers[mask].max(axis=0))
+
+    def count(self, filters=None, exact=None):
+        exact = EXACT_DISTINCT if exact is None else exact
+        if not exact:
+            return self.sketch(filters).count()
+        rows = self._cell_mask(filters)[self._row_cells]
+        values = self._row_values[rows]
+        return int(np.unique(values[values >= 0]).size)
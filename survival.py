@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+from data_model import OPEN_STAGES
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# group-by choices of the survival view: label -> enriched column
+SURVIVAL_GROUPS = {"Product": "product", "Sales Agent": "sales_agent", "Sector": "sector"}
+
+# groups with fewer engaged deals get no curve of their own
+MIN_GROUP_DEALS = 5
+
+
+# ----------------------------
+# DURATIONS
+# ----------------------------
+def cycle_durations(df, as_of=None):
+    """
+    (days, closed) per engaged deal: closed deals run from engage to close,
+    open deals are right-censored at `as_of` (the last close date by default).
+    Deals without an engage date are left out, days is NaN for them.
+    """
+    as_of = pd.Timestamp(df["close_date"].max() if as_of is None else as_of)
+    open_ = df["deal_stage"].isin(OPEN_STAGES).to_numpy()
+    end = df["close_date"].where(~open_, as_of)
+    days = (end - df["engage_date"]).dt.days.to_numpy(dtype="float64", na_value=np.nan)
+    return days, ~open_
+
+
+# ----------------------------
+# KAPLAN-MEIER
+# ----------------------------
+def kaplan_meier(days, closed, groups=None):
+    """
+    Kaplan-Meier survival (share of deals still open) per group, one row per
+    (group, distinct duration) with at least one close or censoring.
+
+    One lexsort of (group, days) does all the work: deals at risk are the
+    group size minus everything that ended earlier, and the survival product
+    is a per-group cumulative sum of log(1 - closed / at risk).
+    """
+    keep = ~np.isnan(days)
+    days, closed = days[keep], np.asarray(closed, dtype=bool)[keep]
+    if groups is None:
+        codes, labels = np.zeros(len(days), dtype=np.intp), pd.Index(["All deals"])
+    else:
+        codes, labels = pd.factorize(pd.Series(groups)[keep], sort=True)
+        days, closed = days[codes >= 0], closed[codes >= 0]
+        codes = codes[codes >= 0]
+    if not len(days):
+        return pd.DataFrame(columns=["group", "days", "at_risk", "closed", "censored", "survival"])
+
+    order = np.lexsort((days, codes))
+    codes, days, closed = codes[order], days[order], closed[order]
+
+    # one step per distinct (group, duration)
+    new = np.r_[True, (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])]
+    step = np.cumsum(new) - 1
+    ended = np.bincount(step)
+    events = np.bincount(step, weights=closed).astype(np.int64)
+    step_code, step_days = codes[new], days[new]
+
+    group_start = np.r_[True, step_code[1:] != step_code[:-1]]
+    size = np.bincount(codes)[step_code]
+    ended_before = np.cumsum(ended) - ended
+    at_risk = size - (ended_before - ended_before[group_start][np.cumsum(group_start) - 1])
+
+    # a step closing every deal at risk sends the curve to zero for good
+    hazard = events / at_risk
+    log_s = np.log1p(-np.minimum(hazard, 1 - 1e-12))
+    zero = hazard >= 1
+    cum_log, cum_zero = np.cumsum(log_s), np.cumsum(zero)
+    first = np.flatnonzero(group_start)[np.cumsum(group_start) - 1]
+    cum_log = cum_log - (cum_log[first] - log_s[first])
+    cum_zero = cum_zero - (cum_zero[first] - zero[first])
+    survival = np.where(cum_zero > 0, 0.0, np.exp(cum_log))
+
+    return pd.DataFrame({
+        "group": labels[step_code],
+        "days": step_days.astype(np.int64),
+        "at_risk": at_risk,
+        "closed": events,
+        "censored": ended - events,
+        "survival": survival,
+    })
+
+
+def median_cycles(curves):
+    """
+    Per group: deals, closes, censored deals and the Kaplan-Meier median
+    cycle, the first duration where survival drops to 50% or below. The
+    median is NaN when more than half the deals are still open past the
+    longest observed duration.
+    """
+    grouped = curves.groupby("group", sort=False)
+    out = grouped.agg(deals=("at_risk", "first"), closed=("closed", "sum"), censored=("censored", "sum"))
+    below = curves[curves["survival"] <= 0.5]
+    out["median_days"] = below.groupby("group", sort=False)["days"].first().reindex(out.index)
+    return out.reset_index()
+
+
+def survival_frame(df, by=None, as_of=None, min_deals=MIN_GROUP_DEALS):
+    """Curves and medians of time-to-close for `df`, overall or per `by` column."""
+    days, closed = cycle_durations(df, as_of)
+    curves = kaplan_meier(days, closed, None if by is None else df[by].to_numpy())
+    medians = median_cycles(curves)
+    medians = medians[medians["deals"] >= min_deals].sort_values("median_days", na_position="last")
+    return curves[curves["group"].isin(medians["group"])], medians.reset_index(drop=True)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    # Resources/ and .cache/ are resolved relative to the app directory
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture(autouse=True)
+def history_path(monkeypatch, tmp_path):
+    # snapshots built by the tests record their export outside the repo
+    import history
+    monkeypatch.setattr(history, "HISTORY_PATH", str(tmp_path / "history.npz"))
@@ -0,0 +1,57 @@
+import pytest
+
+import aggregate
+import data_model
+
+MEASURES = {
+    "revenue": ("close_value", "sum", {"deal_stage": ["Won"]}),
+    "deals": ("opportunity_id", "count"),
+    "products": ("product", "nunique"),
+    "avg_value": ("close_value", "mean"),
+    "last_close": ("close_date", "max"),
+}
+
+# GTK 500 is not sold in Panama
+NO_ROWS = {"product": ["GTK 500"], "office_location": ["Panama"]}
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return aggregate.engine_tables(data_model.load_all_tables(data_model.RESOURCE_DIR))
+
+
+@pytest.fixture(scope="module")
+def local_engine(tables):
+    return aggregate.LocalEngine(aggregate.partition(tables, 3))
+
+
+@pytest.fixture(scope="module")
+def scatter_engine(tmp_path_factory):
+    socket_dir = str(tmp_path_factory.mktemp("sockets"))
+    processes = aggregate.start_workers(socket_dir, 2)
+    try:
+        yield aggregate.ScatterGatherEngine(aggregate.socket_addresses(socket_dir))
+    finally:
+        for proc in processes:
+            proc.terminate()
+
+
+@pytest.mark.parametrize("engine", ["local_engine", "scatter_engine"])
+def test_empty_selection_grouped(engine, request):
+    out = request.getfixturevalue(engine).query(aggregate.make_query("enriched", ["account"], MEASURES, NO_ROWS))
+    assert out.empty
+    assert list(out.columns) == ["account"] + list(MEASURES)
+
+
+@pytest.mark.parametrize("engine", ["local_engine", "scatter_engine"])
+def test_empty_selection_total(engine, request):
+    out = request.getfixturevalue(engine).query(aggregate.make_query("enriched", [], MEASURES, NO_ROWS))
+    assert len(out) == 1
+    assert out.loc[0, "deals"] == 0 and out.loc[0, "products"] == 0
+
+
+def test_engines_agree(local_engine, scatter_engine):
+    query = aggregate.make_query("enriched", ["sales_agent"], MEASURES, {"office_location": ["Panama"]})
+    local, remote = local_engine.query(query), scatter_engine.query(query)
+    assert local.equals(remote)
+    assert local["deals"].sum() > 0
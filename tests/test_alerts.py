@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import alerts
+import data_model
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+def state(monitor):
+    # detector state per series name, independent of the position order
+    out = {}
+    for (grain, scope, key, metric), pos in monitor.series.items():
+        bank = monitor.banks[grain]
+        out[(grain, scope, key, metric)] = (bank.mean[pos], bank.mad[pos], bank.count[pos])
+    return out
+
+
+def test_incremental_ingest_equals_one_ingest(enriched):
+    full = alerts.AlertMonitor()
+    full.ingest(enriched)
+
+    # each data version holds every row closed so far, cut mid-week and mid-month
+    stream = alerts.AlertMonitor()
+    for cutoff in pd.date_range("2017-02-10", "2017-12-31", freq="17D").append(pd.DatetimeIndex(["2018-01-01"])):
+        stream.ingest(enriched[~(enriched["close_date"] >= cutoff)])
+
+    assert stream.scored_through == full.scored_through
+    assert state(stream).keys() == state(full).keys()
+    for name, (mean, mad, count) in state(full).items():
+        assert np.isclose(state(stream)[name][0], mean) and np.isclose(state(stream)[name][1], mad)
+        assert state(stream)[name][2] == count
+    pd.testing.assert_frame_equal(stream.recent(), full.recent())
+    assert len(full.recent()) > 0
+
+
+def test_version_ingested_once(enriched):
+    monitor = alerts.AlertMonitor()
+    assert monitor.ingest(enriched, version="v1") > 0
+    assert monitor.ingest(enriched, version="v1") == 0
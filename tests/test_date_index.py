@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+import aggregate
+import data_model
+import date_index
+import queries
+
+FILTERS = [
+    {"close_date": date_index.date_range("2017-03-01", "2017-05-31")},
+    {"close_date": date_index.date_range(None, "2017-03-15"), "product": ["GTX Pro", "MG Special"]},
+    {"close_date": date_index.date_range("2017-06-01", None),
+     "engage_date": date_index.date_range("2017-04-01", "2017-07-31"), "office_location": ["Panama"]},
+    {"engage_date": date_index.date_range("2017-01-01", "2017-01-01")},
+    {"product": ["GTK 500"]},
+]
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_indexed_rows_match_scan(enriched, filters):
+    index = date_index.TableIndex(enriched)
+    expected = queries.filter_mask(enriched, filters)
+    assert np.array_equal(queries.filter_mask(enriched, filters, index), expected)
+    assert np.array_equal(queries.filter_rows(enriched, filters, index), np.flatnonzero(expected))
+    assert np.array_equal(aggregate._mask(enriched, filters, index), expected)
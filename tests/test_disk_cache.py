@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_store
+import disk_cache
+import queries
+import shared_data
+
+MARCH = {"month_year": ("Mar 2017",), "product": None, "office_location": None}
+
+
+@pytest.fixture(scope="module")
+def snapshots(tmp_path_factory):
+    # a cold build fills an empty cache, a restarted replica reads it back
+    patch = pytest.MonkeyPatch()
+    patch.setattr(shared_data, "SHARED_ENABLED", False)
+    patch.setattr(disk_cache, "CACHE_ENABLED", True)
+    patch.setattr(disk_cache, "_cache", disk_cache.DiskCache(str(tmp_path_factory.mktemp("artifacts"))))
+    try:
+        cold = data_store.build_snapshot()
+        warm = data_store.build_snapshot()
+        yield cold, warm
+    finally:
+        patch.undo()
+
+
+def assert_same_bundle(cold, warm):
+    assert cold.keys() == warm.keys()
+    for name, value in cold.items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(value, warm[name])
+            # None and NaN compare equal above, but isin / == only match NaN
+            for col in value.columns[value.dtypes == object]:
+                assert value[col].map(type).equals(warm[name][col].map(type)), f"{name}.{col}"
+        elif isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(value, warm[name])
+        else:
+            assert value == warm[name]
+
+
+def test_tables_round_trip(snapshots):
+    cold, warm = snapshots
+    assert_same_bundle(cold.tables, warm.tables)
+
+
+@pytest.mark.parametrize("name", list(data_store.PERSISTED))
+def test_persisted_round_trip(snapshots, name):
+    cold, warm = snapshots
+    encode, _ = data_store.PERSISTED[name]
+    assert_same_bundle(encode(cold.get(name)), encode(warm.get(name)))
+
+
+def test_warm_distinct_counts(snapshots):
+    cold, warm = snapshots
+    assert queries.distinct_counts(cold, MARCH) == queries.distinct_counts(warm, MARCH)
+
+
+def test_exists(tmp_path):
+    cache = disk_cache.DiskCache(str(tmp_path))
+    assert not cache.exists("won_deals", "v1")
+    cache.store("won_deals", "v1", {"frame": pd.DataFrame({"a": [1]})})
+    assert cache.exists("won_deals", "v1") and not cache.exists("won_deals", "v2")
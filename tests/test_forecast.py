@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_model
+import forecast
+from data_model import OPEN_STAGES
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    df = data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+    return forecast.PipelineModel(df), df[df["deal_stage"].isin(OPEN_STAGES)], df["close_date"].max()
+
+
+def test_seeded_forecast_is_deterministic(pipeline):
+    model, deals, as_of = pipeline
+    codes, regions = pd.factorize(deals["office_location"], sort=True)
+    runs = [forecast.simulate(model, deals, as_of, codes, len(regions), trials=500, seed=7,
+                              chunk_cells=50_000, workers=workers) for workers in [1, 4, 4]]
+    assert np.array_equal(runs[0], runs[1]) and np.array_equal(runs[1], runs[2])
+    other = forecast.simulate(model, deals, as_of, codes, len(regions), trials=500, seed=8, chunk_cells=50_000)
+    assert not np.array_equal(runs[0], other)
+
+    frame = forecast.forecast_frame(model, deals, as_of, trials=500, seed=7)
+    pd.testing.assert_frame_equal(frame, forecast.forecast_frame(model, deals, as_of, trials=500, seed=7))
+
+
+def test_mean_revenue_matches_expected_value(pipeline):
+    model, deals, as_of = pipeline
+    inputs = model.deal_inputs(deals, as_of)
+    # win probability times the mean won value of the deal's product
+    prefix = np.r_[0, np.cumsum(model.values)]
+    mean_value = (prefix[inputs["value_hi"]] - prefix[inputs["value_lo"]]) / (inputs["value_hi"] - inputs["value_lo"])
+    expected = float((inputs["p"] * mean_value).sum())
+
+    runs = forecast.simulate(model, deals, as_of, np.zeros(len(deals), dtype=np.intp), 1, trials=2000, seed=1)
+    assert runs.sum(axis=(1, 2)).mean() == pytest.approx(expected, rel=0.01)
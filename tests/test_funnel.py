@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_model
+import funnel
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+def direct_funnel(df):
+    engaged = df["engage_date"].notna()
+    stage = df["deal_stage"]
+    days = (df["close_date"] - df["engage_date"]).dt.days
+    return pd.DataFrame({
+        "deals": [len(df), engaged.sum(), (stage == "Won").sum()],
+        "advanced": [engaged.sum(), (engaged & (stage == "Won")).sum(), np.nan],
+        "lost": [(~engaged & (stage == "Lost")).sum(), (engaged & (stage == "Lost")).sum(), 0],
+        "still_open": [(~engaged & (stage == "Prospecting")).sum(), (engaged & (stage == "Engaging")).sum(), 0],
+        "median_days": [np.nan, days[engaged].median(), np.nan],   # prospects have no entry date
+    }, index=funnel.FUNNEL_STAGES)
+
+
+@pytest.mark.parametrize("product", [None, "GTX Pro"])
+def test_funnel_matches_pandas(enriched, product):
+    rows = None if product is None else np.flatnonzero(enriched["product"] == product)
+    df = enriched if rows is None else enriched.iloc[rows]
+    got = funnel.StageFunnel(enriched).funnel(rows).set_index("stage")
+    expected = direct_funnel(df)
+    for col in ["deals", "advanced", "lost", "still_open", "median_days"]:
+        assert np.allclose(got[col].to_numpy(dtype="float64"), expected[col].to_numpy(dtype="float64"),
+                           equal_nan=True), col
+
+
+def test_by_group_matches_groupby(enriched):
+    got = funnel.StageFunnel(enriched).by_group("product").set_index("product").sort_index()
+    engaged = enriched[enriched["engage_date"].notna()]
+    per = engaged.groupby("product")["deal_stage"]
+    win_rate = per.apply(lambda s: (s == "Won").sum() / len(s) * 100)
+    drop_off = per.apply(lambda s: (s == "Lost").sum() / len(s) * 100)
+    assert got["deals"].tolist() == enriched.groupby("product").size().sort_index().tolist()
+    assert np.allclose(got["win_rate"], win_rate.sort_index())
+    assert np.allclose(got["drop_off"], drop_off.sort_index())
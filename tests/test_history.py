@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_model
+import funnel
+import history
+
+
+@pytest.fixture(scope="module")
+def export():
+    return data_model.read_sales_pipeline(os.path.join(data_model.RESOURCE_DIR, "sales_pipeline.csv"))
+
+
+def test_rejected_export_leaves_store_untouched(export):
+    store = history.HistoryStore()
+    store.append("2017-01-01", export)
+    ids, dictionaries = store.ids.copy(), {col: list(v) for col, v in store.dictionaries.items()}
+
+    changed = export.assign(account="Brand new account")
+    with pytest.raises(ValueError):
+        store.append("2017-01-01", changed)   # not after the last day
+    with pytest.raises(ValueError):
+        store.append("2017-01-02", pd.concat([changed, changed.head(1)]))   # duplicated id
+    assert np.array_equal(store.ids, ids)
+    assert store.dictionaries == dictionaries
+
+
+def test_record_export_feeds_the_funnel(export):
+    assert history.record_export(export, "2017-01-01") == len(export)
+    assert history.record_export(export, "2017-01-01") is None
+    assert history.load_transitions() is None
+
+    moved = export.copy()
+    prospects = moved.index[moved["deal_stage"] == "Prospecting"][:5]
+    moved.loc[prospects, "deal_stage"] = "Engaging"
+    assert history.record_export(moved, "2017-01-11") == 5
+
+    stages = funnel.StageFunnel(export, groups=["product"], transitions=history.load_transitions())
+    observed = stages.observed()
+    assert observed[["from_stage", "to_stage", "deals", "median_days"]].values.tolist() == \
+        [["Prospecting", "Engaging", 5, 10.0]]
+    assert stages.observed(prospects[:2])["deals"].tolist() == [2]
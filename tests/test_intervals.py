@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_model
+import intervals
+from data_model import OPEN_STAGES
+
+FILTERS = [None, {"product": ["GTX Pro", "MG Special"]}, {"office_location": ["United States"], "product": ["GTK 500"]}]
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+def open_on(df, date, filters):
+    # deals engaged on or before `date` that had not closed by its end
+    for col, vals in (filters or {}).items():
+        df = df[df[col].isin(vals)]
+    date = pd.Timestamp(date)
+    open_ = df[(df["engage_date"] <= date) & (df["close_date"].isna() | (df["close_date"] > date))]
+    outcome = open_["deal_stage"].where(~open_["deal_stage"].isin(OPEN_STAGES), "Open")
+    return open_.assign(outcome=outcome)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("date", ["2016-10-20", "2016-12-01", "2017-03-01", "2017-06-15", "2017-12-31"])
+def test_snapshot_matches_scan(enriched, filters, date):
+    index = intervals.PipelineIntervals(enriched)
+    expected = open_on(enriched, date, filters).groupby("outcome").agg(
+        deals=("opportunity_id", "size"), value=("sales_price", "sum")).reindex(intervals.OUTCOMES, fill_value=0)
+    got = index.snapshot(date, filters).set_index("outcome")
+    assert got["deals"].tolist() == expected["deals"].tolist()
+    assert np.allclose(got["value"], expected["value"])
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_daily_matches_scan(enriched, filters):
+    daily = intervals.PipelineIntervals(enriched).daily(filters).set_index("date")
+    for date in daily.index[::29]:
+        assert daily.loc[date, "deals"] == len(open_on(enriched, date, filters))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+import data_model
+import quantiles
+
+QS = [0.0, 0.01, 0.25, 0.5, 0.9, 0.99, 1.0]
+
+
+def exact(values, q):
+    # the value whose rank the sketch reports
+    values = np.sort(values)
+    return values[int(np.floor(q * (len(values) - 1)))]
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+@pytest.mark.parametrize("alpha", [0.01, 0.05])
+def test_relative_error_within_alpha(alpha):
+    values = np.random.default_rng(7).lognormal(8, 2, 50_000) + 1
+    sketch = quantiles.QuantileSketch.from_values(values, alpha)
+    for q in QS:
+        x = exact(values, q)
+        assert abs(sketch.quantile(q) - x) <= alpha * x * (1 + 1e-9)
+
+
+def test_merged_cells_within_alpha(enriched):
+    won = enriched[enriched["deal_stage"] == "Won"]
+    cube = quantiles.QuantileCube.from_frame(won, ["month_year", "product", "office_location"], "close_value")
+    for filters in [None, {"product": ["GTX Pro"]}, {"office_location": ["Panama"], "month_year": ["Jun 2017"]}]:
+        rows = won
+        for col, vals in (filters or {}).items():
+            rows = rows[rows[col].isin(vals)]
+        values = rows["close_value"].to_numpy(dtype="float64")
+        sketch = cube.sketch(filters)
+        assert sketch.count == len(values) > 0
+        for q in QS:
+            x = exact(values, q)
+            assert abs(sketch.quantile(q) - x) <= quantiles.RELATIVE_ACCURACY * x * (1 + 1e-9)
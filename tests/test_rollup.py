@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+import data_model
+import rollup
+from data_model import OPEN_STAGES
+
+FREQ = {"MoM": "M", "QoQ": "Q", "YoY": "Y"}
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+@pytest.fixture(scope="module")
+def index(enriched):
+    return rollup.CalendarRollup.from_frame(enriched, ["product", "office_location"])
+
+
+def groupby_totals(df, lo, hi):
+    # measures booked on close dates inside [lo, hi]
+    closed = df[df["close_date"].between(lo, hi)]
+    won = closed[closed["deal_stage"] == "Won"]
+    totals = {
+        "revenue": float(won["close_value"].sum()),
+        "won": float(len(won)),
+        "lost": float((closed["deal_stage"] == "Lost").sum()),
+    }
+    totals["open"] = float(df["deal_stage"].isin(OPEN_STAGES).sum())
+    return totals
+
+
+@pytest.mark.parametrize("comparison", list(FREQ))
+@pytest.mark.parametrize("as_of", ["2017-03-31", "2017-05-20", "2017-11-30", "2017-12-31"])
+@pytest.mark.parametrize("filters", [None, {"product": ["GTX Pro", "MG Advanced"], "office_location": ["United States", "Korea"]}])
+def test_compare_matches_date_filtered_groupby(enriched, index, comparison, as_of, filters):
+    df = enriched.dropna(subset=["product", "office_location"])
+    for col, vals in (filters or {}).items():
+        df = df[df[col].isin(vals)]
+    as_of = pd.Timestamp(as_of)
+    period = as_of.to_period(FREQ[comparison])
+    start = period.start_time
+    prev_start = (period - 1).start_time
+    prev_end = min(prev_start + (as_of - start), start - pd.Timedelta(days=1))
+
+    current, previous = index.compare(comparison, as_of, index.select(filters))
+    assert current == groupby_totals(df, start, as_of)
+    if prev_start < index.start:
+        assert previous is None
+    else:
+        assert previous == groupby_totals(df, prev_start, prev_end)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import data_model
+import sampling
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+def test_full_sample_is_exact(enriched):
+    sample = sampling.StratifiedSample.draw(enriched, 1.0)
+    mask = (enriched["office_location"] == "United States").to_numpy()
+    kpis = sampling.pipeline_kpis(sample, (sample.frame["office_location"] == "United States").to_numpy())
+    rows = enriched[mask]
+    won = rows[rows["deal_stage"] == "Won"]
+    closed = rows[rows["deal_stage"].isin(["Won", "Lost"])]
+    expected = {
+        "revenue": won["close_value"].sum(),
+        "total_opps": len(rows),
+        "won_opps": len(won),
+        "open_opps": rows["deal_stage"].isin(data_model.OPEN_STAGES).sum(),
+        "win_rate": len(won) / len(rows) * 100,
+        "avg_deal_value": won["close_value"].mean(),
+        "avg_sales_cycle": (closed["close_date"] - closed["engage_date"]).dt.days.mean(),
+    }
+    for name, value in expected.items():
+        assert kpis[name].value == pytest.approx(value), name
+        assert kpis[name].rel_error == pytest.approx(0, abs=1e-9), name
+
+
+def test_stratum_totals_exact_and_interval_coverage(enriched):
+    truth = enriched.loc[enriched["deal_stage"] == "Won", "close_value"].sum()
+    covered = 0
+    for seed in range(200):
+        sample = sampling.StratifiedSample.draw(enriched, 0.05, seed=seed)
+        stage = sample.frame["deal_stage"].to_numpy()
+        # deal stage is a stratum, so per-stage counts expand exactly
+        assert sample.count(stage == "Won").value == pytest.approx((enriched["deal_stage"] == "Won").sum())
+        est = sample.total(sample.frame["close_value"].to_numpy() * (stage == "Won"))
+        covered += est.low <= truth <= est.high
+    assert 0.9 <= covered / 200 <= 0.99
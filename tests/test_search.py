@@ -0,0 +1,10 @@
+import search
+
+
+def test_tiers_then_score():
+    index = search.TypeaheadIndex(
+        ["Big Konex", "Konex", "Konexa Labs", "Konnex", "Konnexo", "Kanexo"],
+        [50, 1, 2, 10, 40, 30])
+    # prefix, then word prefix, then fuzzy matches by score alone: the
+    # closer Konnex spelling does not outrank the bigger Konnexo
+    assert index.search("konex") == ["Konexa Labs", "Konex", "Big Konex", "Konnexo", "Konnex"]
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import data_model
+import data_store
+import shared_data
+
+
+@pytest.fixture(scope="module")
+def published(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp("shared"))
+    version = shared_data.publish_resources(root=root)
+    return root, version
+
+
+def test_attach_matches_parse(published):
+    root, version = published
+    parsed = data_model.load_all_tables(data_model.RESOURCE_DIR)
+    attached = shared_data.attach(version, root)
+    for name, df in parsed.items():
+        for col in df.columns:
+            expected, actual = df[col], attached[name][col]
+            if expected.dtype == object:
+                # strings stay in the mapped Arrow buffers
+                assert str(actual.dtype) == "large_string[pyarrow]", f"{name}.{col}"
+                pd.testing.assert_series_equal(actual.astype(object).where(actual.notna(), None),
+                                               expected.where(expected.notna(), None), check_names=False)
+            else:
+                pd.testing.assert_series_equal(actual, expected, check_names=False)
+
+
+def test_fallback_keeps_its_own_version(published, monkeypatch):
+    root, _ = published
+    monkeypatch.setattr(shared_data, "SHARED_ENABLED", True)
+    monkeypatch.setattr(shared_data, "SHARED_DIR", root)
+    snapshot = data_store.build_snapshot(version="not-published")
+    assert not snapshot.shared
+    assert snapshot.version == data_model.data_version(data_model.RESOURCE_DIR)
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_model
+import survival
+
+
+def direct_km(days, closed):
+    # textbook product-limit estimate, one duration at a time
+    rows, s = [], 1.0
+    for t in sorted(set(days)):
+        at_risk = sum(d >= t for d in days)
+        events = sum(d == t and c for d, c in zip(days, closed))
+        ended = sum(d == t for d in days)
+        s *= 1 - events / at_risk
+        rows.append((int(t), at_risk, events, ended - events, s))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def enriched():
+    return data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+
+
+def test_matches_direct_loop(enriched):
+    days, closed = survival.cycle_durations(enriched)
+    groups = enriched["product"].to_numpy()
+    curves = survival.kaplan_meier(days, closed, groups)
+    for group, curve in curves.groupby("group"):
+        keep = (groups == group) & ~np.isnan(days)
+        expected = direct_km(days[keep].tolist(), closed[keep].tolist())
+        got = curve[["days", "at_risk", "closed", "censored"]].values.tolist()
+        assert got == [list(row[:4]) for row in expected]
+        assert np.allclose(curve["survival"], [row[4] for row in expected])
+
+
+def test_ties_and_full_close():
+    days = np.array([3, 3, 5, 5, 5, 8, 9, 9], dtype="float64")
+    closed = np.array([1, 0, 1, 1, 0, 1, 1, 1], dtype=bool)
+    curve = survival.kaplan_meier(days, closed)
+    expected = direct_km(days.tolist(), closed.tolist())
+    assert curve[["days", "at_risk", "closed", "censored"]].values.tolist() == [list(r[:4]) for r in expected]
+    assert np.allclose(curve["survival"], [r[4] for r in expected])
+    assert curve["survival"].iloc[-1] == 0.0
+    assert survival.median_cycles(curve)["median_days"].iloc[0] == 8
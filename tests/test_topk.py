@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_model
+import topk
+
+CONTEXTS = [
+    {"month_year": None, "product": None, "office_location": None},
+    {"month_year": ("Mar 2017", "Apr 2017"), "product": None, "office_location": None},
+    {"month_year": None, "product": ("GTX Pro", "MG Special"), "office_location": ("United States",)},
+]
+
+
+@pytest.fixture(scope="module")
+def won():
+    df = data_model.load_all_tables(data_model.RESOURCE_DIR)["enriched"]
+    return df[df["deal_stage"] == "Won"].reset_index(drop=True)
+
+
+def test_advance_matches_rebuild(won):
+    # the next version drops some deals, re-values others and adds new ones
+    rng = np.random.default_rng(7)
+    old = won.drop(index=rng.choice(len(won), 200, replace=False)).reset_index(drop=True)
+    new = won.copy()
+    new.loc[rng.choice(len(new), 50, replace=False), "close_value"] *= 3
+    new = new.drop(index=rng.choice(len(new), 100, replace=False)).reset_index(drop=True)
+
+    index = topk.LeaderboardIndex("account", "close_value", k=10)
+    for filters in CONTEXTS:
+        index.leaderboard(old, filters)
+    advanced = index.advance(old, new)
+
+    for filters in CONTEXTS:
+        expected = topk.TopKLeaderboard.from_frame(new[topk.LeaderboardIndex._mask(new, filters)],
+                                                   "account", "close_value").to_frame()
+        pd.testing.assert_frame_equal(advanced.leaderboard(new, filters).to_frame(), expected)
+        # the previous version keeps serving its own leaderboards
+        previous = topk.TopKLeaderboard.from_frame(old[topk.LeaderboardIndex._mask(old, filters)],
+                                                   "account", "close_value").to_frame()
+        pd.testing.assert_frame_equal(index.leaderboard(old, filters).to_frame(), previous)
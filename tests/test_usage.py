@@ -0,0 +1,30 @@
+import time
+
+import usage
+
+
+def key(i):
+    return "executive", (("month_year", (f"m{i}",)),), ()
+
+
+def test_save_prunes_decayed_and_caps(tmp_path):
+    path = str(tmp_path / "usage.json")
+    tracker = usage.UsageTracker(path)
+    now = time.time()
+    for i in range(usage.MAX_ENTRIES + 500):
+        tracker._counts[key(i)] = (1.0, now - i)
+    tracker._counts[key(-1)] = (1.0, now - 60 * 24 * 3600)   # two months old
+    tracker._dirty = True
+    tracker.save()
+
+    reloaded = usage.UsageTracker(path)._counts
+    assert len(reloaded) == usage.MAX_ENTRIES
+    assert key(-1) not in reloaded
+    assert key(0) in reloaded and key(usage.MAX_ENTRIES) not in reloaded
+
+
+def test_forget(tmp_path):
+    tracker = usage.UsageTracker(str(tmp_path / "usage.json"))
+    tracker.record("executive", {"month_year": ("Mar 2017",)})
+    tracker.forget(tracker.popular()[0])
+    assert tracker.popular() == []
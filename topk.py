@@ -0,0 +1,222 @@
+import copy
+import heapq
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import date_index
+
+
+# ----------------------------
+# PARTIAL SELECTION
+# ----------------------------
+def top_k_indices(scores, k):
+    """Positions of the k largest scores, largest first (argpartition + sort of k)."""
+    scores = np.asarray(scores)
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(n)
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def grouped_totals(keys, values):
+    # hash-free groupby-sum: factorize once, bincount per value column
+    codes, uniques = pd.factorize(pd.Series(keys), sort=False)
+    valid = codes >= 0
+    values = np.asarray(values, dtype="float64")
+    if values.ndim == 1:
+        values = values[:, None]
+    values = np.nan_to_num(values)
+
+    totals = np.column_stack([
+        np.bincount(codes[valid], weights=values[valid, i], minlength=len(uniques))
+        for i in range(values.shape[1])
+    ]) if values.shape[1] else np.empty((len(uniques), 0))
+    return uniques, totals
+
+
+def top_k_frame(df, key, value_cols, by=None, k=10, ascending=True):
+    """
+    Top-k keys of `df` by the summed `by` column, without a full sort.
+    Rows come back ascending by default, ready for horizontal bar charts.
+    """
+    if isinstance(value_cols, str):
+        value_cols = [value_cols]
+    by = by or value_cols[0]
+
+    uniques, totals = grouped_totals(df[key].to_numpy(), df[value_cols].to_numpy())
+    idx = top_k_indices(totals[:, value_cols.index(by)], k)
+
+    out = pd.DataFrame(totals[idx], columns=value_cols)
+    for col in value_cols:
+        if pd.api.types.is_integer_dtype(df[col]):
+            out[col] = out[col].astype("int64")
+    out.insert(0, key, np.asarray(uniques)[idx])
+    return out.iloc[::-1].reset_index(drop=True) if ascending else out
+
+
+# ----------------------------
+# INCREMENTAL LEADERBOARD
+# ----------------------------
+class TopKLeaderboard:
+    """
+    Running per-key totals plus a bounded min-heap of the current leaders.
+
+    Updates with non-negative amounts (won deals) are O(log k) per touched key;
+    a negative amount can demote a leader, so the heap is rebuilt from the
+    totals with argpartition in that case.
+    """
+
+    def __init__(self, k=10):
+        self.k = k
+        self.totals = {}
+        self._heap = []
+        self._members = set()
+
+    @classmethod
+    def from_frame(cls, df, key, value, k=10):
+        board = cls(k)
+        uniques, totals = grouped_totals(df[key].to_numpy(), df[value].to_numpy())
+        board.totals = dict(zip(uniques, totals[:, 0]))
+        board._rebuild()
+        return board
+
+    def update(self, keys, values):
+        uniques, totals = grouped_totals(keys, values)
+        rebuild = False
+        for key, amount in zip(uniques, totals[:, 0]):
+            self.totals[key] = self.totals.get(key, 0.0) + amount
+            if amount < 0:
+                rebuild = True
+            elif not rebuild:
+                self._offer(key)
+        if rebuild:
+            self._rebuild()
+
+    def top(self):
+        # (key, total) pairs, largest first
+        return sorted(((key, self.totals[key]) for key in self._members), key=lambda kv: -kv[1])
+
+    def to_frame(self, key="key", value="value", ascending=True):
+        out = pd.DataFrame(self.top(), columns=[key, value])
+        return out.iloc[::-1].reset_index(drop=True) if ascending else out
+
+    def _offer(self, key):
+        total = self.totals[key]
+        if key in self._members:
+            # the old heap entry for this key becomes stale
+            heapq.heappush(self._heap, (total, key))
+        elif len(self._members) < self.k:
+            self._members.add(key)
+            heapq.heappush(self._heap, (total, key))
+        else:
+            min_total, min_key = self._peek_min()
+            if total > min_total:
+                heapq.heappop(self._heap)
+                self._members.discard(min_key)
+                self._members.add(key)
+                heapq.heappush(self._heap, (total, key))
+
+        if len(self._heap) > 4 * max(self.k, 1):
+            self._heap = [(self.totals[m], m) for m in self._members]
+            heapq.heapify(self._heap)
+
+    def _peek_min(self):
+        # drop stale entries left behind by in-place leader updates
+        while True:
+            total, key = self._heap[0]
+            if key in self._members and self.totals[key] == total:
+                return total, key
+            heapq.heappop(self._heap)
+
+    def _rebuild(self):
+        keys = list(self.totals)
+        scores = np.fromiter(self.totals.values(), dtype="float64", count=len(keys))
+        self._members = {keys[i] for i in top_k_indices(scores, self.k)}
+        self._heap = [(self.totals[m], m) for m in self._members]
+        heapq.heapify(self._heap)
+
+
+# ----------------------------
+# LEADERBOARDS PER FILTER CONTEXT
+# ----------------------------
+class LeaderboardIndex:
+    """
+    One TopKLeaderboard per filter context over a fact table.
+
+    A context is a mapping column -> allowed values (None means all). New
+    won deals passed to `ingest` are routed to every context they match;
+    `advance` carries the leaderboards over to the next data version.
+    """
+
+    def __init__(self, key, value, k=10, max_contexts=256):
+        self.key = key
+        self.value = value
+        self.k = k
+        self.max_contexts = max_contexts
+        self._boards = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def context_key(filters):
+        return tuple(sorted(
+            (col, None if vals is None else tuple(sorted(map(str, vals))))
+            for col, vals in filters.items()
+        ))
+
+    @staticmethod
+    def _mask(df, filters):
+        mask = np.ones(len(df), dtype=bool)
+        for col, vals in filters.items():
+            if date_index.is_range(vals):
+                mask &= date_index.range_mask(df, col, vals)
+            elif vals is not None:
+                mask &= df[col].isin(vals).to_numpy()
+        return mask
+
+    def leaderboard(self, df, filters):
+        ctx = self.context_key(filters)
+        with self._lock:
+            if ctx in self._boards:
+                self._boards.move_to_end(ctx)
+                return self._boards[ctx][1]
+
+        board = TopKLeaderboard.from_frame(df[self._mask(df, filters)], self.key, self.value, self.k)
+        with self._lock:
+            self._boards[ctx] = (dict(filters), board)
+            while len(self._boards) > self.max_contexts:
+                self._boards.popitem(last=False)
+        return board
+
+    def ingest(self, rows):
+        with self._lock:
+            for filters, board in self._boards.values():
+                matched = rows[self._mask(rows, filters)]
+                if len(matched):
+                    board.update(matched[self.key].to_numpy(), matched[self.value].to_numpy())
+
+    def advance(self, old_rows, new_rows):
+        """
+        A copy for the next data version. Won deals that left `old_rows`
+        (removed or changed) are ingested with negated values and the ones
+        that entered `new_rows` as they are, so cached leaderboards are
+        updated by the difference instead of rebuilt.
+        """
+        rows = pd.concat([old_rows, new_rows], ignore_index=True)
+        changed = ~rows.duplicated(keep=False).to_numpy()
+        sign = np.r_[-np.ones(len(old_rows)), np.ones(len(new_rows))]
+        values = rows[self.value].to_numpy(dtype="float64", na_value=np.nan) * sign
+        delta = rows[changed].assign(**{self.value: values[changed]})
+
+        out = LeaderboardIndex(self.key, self.value, self.k, self.max_contexts)
+        with self._lock:
+            out._boards = OrderedDict(
+                (ctx, (filters, copy.deepcopy(board))) for ctx, (filters, board) in self._boards.items())
+        out.ingest(delta)
+        return out
@@ -0,0 +1,184 @@
+import json
+import os
+import threading
+import time
+
+import memo
+import queries
+import scheduler
+
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+USAGE_FILE = os.environ.get("CRM_USAGE_FILE", os.path.join(".cache", "usage.json"))
+
+# how many of the most used filter combinations are precomputed per refresh
+PRECOMPUTE_TOP = int(os.environ.get("CRM_PRECOMPUTE_TOP", "24"))
+
+# usage counts halve every week, so last Monday's review weighs more than
+# a one-off selection from last month
+HALF_LIFE = 7 * 24 * 3600
+
+# saved counts keep combinations whose decayed count is at least MIN_SCORE
+# (a single use lasts about a month) and at most MAX_ENTRIES of them; date
+# ranges make the key space unbounded otherwise
+MIN_SCORE = 0.05
+MAX_ENTRIES = 2000
+
+# seconds between two background precomputations, keeps the worker
+# responsive for interactive reruns
+PRECOMPUTE_PAUSE = 0.05
+
+
+# ----------------------------
+# USAGE TRACKER
+# ----------------------------
+def _encode(key):
+    page, filters, extra = key
+    return {"page": page, "filters": [[col, None if vals is None else list(vals)] for col, vals in filters],
+            "extra": list(extra)}
+
+
+def _decode(item):
+    filters = tuple((col, None if vals is None else tuple(vals)) for col, vals in item["filters"])
+    return item["page"], filters, tuple(item["extra"])
+
+
+class UsageTracker:
+    """
+    Decayed counts of the normalized sidebar selections made on each page.
+
+    Keys are (page, filter key, extra) exactly as passed to the filter memo, so
+    `popular()` returns combinations that can be recomputed as they were seen.
+    Counts are saved to `path` so they survive restarts.
+    """
+
+    def __init__(self, path=USAGE_FILE, half_life=HALF_LIFE):
+        self.path = path
+        self.half_life = half_life
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = 0.0
+        self._load()
+
+    def _decayed(self, score, seen, now):
+        return score * 0.5 ** ((now - seen) / self.half_life)
+
+    def record(self, page, filters, *extra):
+        if page not in queries.PAGE_VIEWS:
+            return
+        key = (page, queries.filter_key(filters), extra)
+        now = time.time()
+        with self._lock:
+            score, seen = self._counts.get(key, (0.0, now))
+            self._counts[key] = (self._decayed(score, seen, now) + 1.0, now)
+            self._dirty = True
+        if now - self._saved_at > 60:
+            self.save()
+
+    def popular(self, n=PRECOMPUTE_TOP):
+        now = time.time()
+        with self._lock:
+            ranked = sorted(self._counts.items(), key=lambda kv: -self._decayed(kv[1][0], kv[1][1], now))
+        return [key for key, _ in ranked[:n]]
+
+    def forget(self, key):
+        # a combination that can no longer be recomputed, e.g. an old filter layout
+        with self._lock:
+            if self._counts.pop(key, None) is not None:
+                self._dirty = True
+
+    def _prune(self, now):
+        decayed = {key: self._decayed(score, seen, now) for key, (score, seen) in self._counts.items()}
+        kept = sorted((key for key in decayed if decayed[key] >= MIN_SCORE), key=lambda key: -decayed[key])
+        self._counts = {key: self._counts[key] for key in kept[:MAX_ENTRIES]}
+
+    def _load(self):
+        try:
+            with open(self.path) as file:
+                items = json.load(file)
+            self._counts = {_decode(item): (item["score"], item["seen"]) for item in items}
+        except (OSError, ValueError, KeyError, TypeError):
+            self._counts = {}
+        self._prune(time.time())
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._prune(time.time())
+            items = [dict(_encode(key), score=score, seen=seen) for key, (score, seen) in self._counts.items()]
+            self._dirty = False
+            self._saved_at = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as file:
+                json.dump(items, file, default=lambda v: v.item())  # numpy scalars
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # usage stats are best effort
+
+
+# ----------------------------
+# BACKGROUND PRECOMPUTE
+# ----------------------------
+def _lower_priority():
+    # nice only this thread (Linux), the server threads keep their priority
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+def precompute(snapshot, tracker, n=PRECOMPUTE_TOP, pause=PRECOMPUTE_PAUSE):
+    """Warm the filter memo with the `n` most used combinations; returns how many were computed."""
+    results = memo.get_memo()
+    computed = 0
+    for page, key, extra in tracker.popular(n):
+        filters = dict(key)
+        if results.key(page, snapshot.version, filters, *extra) in results:
+            continue
+        view = queries.PAGE_VIEWS[page]
+        try:
+            results.get_or_compute(page, snapshot.version, filters, lambda: view(snapshot, filters, *extra), *extra,
+                                   priority=scheduler.BACKGROUND)
+        except Exception:
+            tracker.forget((page, key, extra))   # recorded under an older filter layout
+            continue
+        computed += 1
+        time.sleep(pause)
+    return computed
+
+
+def schedule_precompute(snapshot):
+    # runs after every snapshot swap, never blocks the caller
+    tracker = get_tracker()
+
+    def run():
+        _lower_priority()
+        tracker.save()
+        try:
+            precompute(snapshot, tracker)
+        except Exception:
+            pass  # a failed warm-up only means a cold first rerun
+
+    thread = threading.Thread(target=run, name="usage-precompute", daemon=True)
+    thread.start()
+    return thread
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    # one tracker per server process, shared by every session
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = UsageTracker()
+    return _tracker